@@ -1,15 +1,62 @@
-from flask import Flask, request, jsonify, render_template
-from pymongo import MongoClient
-from PIL import Image
+from flask import Flask, Request, request, jsonify, render_template
+from io import BytesIO
 import os
+import sys
+
+# The recognition pipeline lives in the backend directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from model_registry import get_processor
+from mongo_connection import LazyCollection
+from image_ledger import IMAGE_EXTENSIONS
+from product_writes import write_products, written_products
+from inventory_pages import PageRequestError, fetch_page, page_args
+from batch_dates import DEFAULT_EXPIRING_DAYS, expiring_batches, serialize_dates
+from result_cache import ResultCache
+from embedding_store import EmbeddingStore
+from product_index import ProductIndex
+from precision import FULL_PRECISION
+
+
+class InMemoryRequest(Request):
+    """Uploaded files are buffered in memory instead of being spooled to a temporary file."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return BytesIO()
+
 
 app = Flask(__name__)
-mongo_uri = "mongodb://localhost:27017/"
-database_name = "inventory_db"
-collection_name = "products"
-client = MongoClient(mongo_uri)
-db = client[database_name]
-collection = db[collection_name]
+app.request_class = InMemoryRequest
+# Uploads are held in memory, so the request size is capped
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_UPLOAD_BYTES", 64 * 1024 * 1024))
+# Same connection settings (MONGO_URI, pool size, timeouts) as the backend; connects on first use
+collection = LazyCollection("products")
+
+# Uploads are only written here when the request asks for it (persist=1)
+upload_folder = "inventory_images"
+# Same caches and model settings as the backend app, so both share warm results
+result_cache = ResultCache()
+embedding_store = EmbeddingStore()
+product_index = ProductIndex()
+model_precision = os.environ.get("MODEL_PRECISION", FULL_PRECISION)
+
+
+def persist_upload(data, content_hash, filename):
+    """
+    Save upload bytes as <content hash><ext>. A re-upload of the same image maps to the
+    existing file, which is detected by the exclusive create itself. Returns the path.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+        extension = ".jpg"
+    os.makedirs(upload_folder, exist_ok=True)
+    path = os.path.join(upload_folder, content_hash + extension)
+    try:
+        with open(path, "xb") as file:
+            file.write(data)
+    except FileExistsError:
+        pass
+    return path
 
 @app.route('/')
 def index():
@@ -17,20 +64,58 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload_image():
-    if 'image' not in request.files:
+    # One request may carry several files under "image"
+    uploads = [upload for upload in request.files.getlist('image') if upload.filename]
+    if not uploads:
         return jsonify({'error': 'No image uploaded'}), 400
-    image = request.files['image']
-    image_path = os.path.join('inventory_images', image.filename)
-    image.save(image_path)
-    # Process the image and update the database (pseudo-code)
-    # product_details = process_image(image_path)
-    # collection.insert_one(product_details)
-    return jsonify({'message': 'Image uploaded successfully'})
+    persist = request.form.get('persist', request.args.get('persist', '')).lower() in ('1', 'true', 'yes')
+
+    processor = get_processor(
+        result_cache=result_cache, embedding_store=embedding_store, product_index=product_index, precision=model_precision
+    )
+    results = []
+    items = []
+    for upload in uploads:
+        data = upload.read()
+        content_hash, response = processor.process_image_data(data, upload.filename)
+        result = {'filename': upload.filename, 'hash': content_hash, 'product': response}
+        if response:
+            # The content hash makes the write idempotent: uploading the same photo twice adds nothing
+            items.append({**response, 'ImageHash': content_hash})
+            result['item'] = len(items) - 1
+        if persist:
+            result['path'] = persist_upload(data, content_hash, upload.filename)
+        results.append(result)
+
+    # All uploads of the request go to the database in one bulk write
+    outcomes = write_products(collection, items)
+    for result in results:
+        if 'item' in result:
+            outcome = outcomes[result.pop('item')]
+            result['status'] = outcome['Status']
+            # New products join the product index only once they are in the inventory
+            product_index.commit(result['hash'], written_products([outcome]))
+
+    recognized = sum(1 for result in results if result['product'])
+    return jsonify({
+        'message': f'Processed {len(results)} images, recognized {recognized}',
+        'results': results,
+    })
 
 @app.route('/inventory', methods=['GET'])
 def get_inventory():
-    products = list(collection.find({}, {'_id': 0}))
-    return jsonify(products)
+    # ?sort=&order=asc|desc&limit=&after=<next from the previous page>&batches=1, or summary=1 for batch summaries
+    try:
+        products, next_cursor = fetch_page(collection, **page_args(request.args))
+    except PageRequestError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'products': serialize_dates(products), 'next': next_cursor})
+
+@app.route('/inventory/expiring', methods=['GET'])
+def get_expiring():
+    # ?days=N: batches expiring from today up to N days ahead, read through the Batches.ExpirationTime index
+    days = request.args.get('days', DEFAULT_EXPIRING_DAYS, type=int)
+    return jsonify({'days': days, 'batches': serialize_dates(expiring_batches(collection, days))})
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,159 @@
+import json
+import re
+
+# Accepted spellings for each field of a structured answer
+FIELD_ALIASES = {
+    "Product": ("product", "product type", "product_type", "type"),
+    "Brand": ("brand", "brand name", "brand_name"),
+    "Quantity": ("quantity", "count", "number"),
+}
+
+# "Product: Milk; Brand: Oatly; Quantity: 2" style answers
+KEY_VALUE_PATTERN = re.compile(
+    r"(product[ _]type|product|type|brand[ _]name|brand|quantity|count|number)\s*[:=]\s*([^,;|\n}]+)",
+    re.IGNORECASE,
+)
+
+
+def _field_for_key(key):
+    key = key.strip().strip("\"'").lower()
+    for field, aliases in FIELD_ALIASES.items():
+        if key in aliases:
+            return field
+    return None
+
+
+def _clean_text(value):
+    return str(value).strip().strip("\"'").strip().rstrip(".").strip()
+
+
+# Number words understood in quantity answers
+SMALL_NUMBERS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+SCALES = {"dozen": 12, "hundred": 100}
+# Only used when the answer has no explicit number ("a bottle", "a pair of ...", "none")
+IMPLIED_NUMBERS = {"a": 1, "an": 1, "single": 1, "pair": 2, "couple": 2, "no": 0, "none": 0}
+
+QUANTITY_TOKEN = re.compile(r"\d+(?:\.\d+)?|[a-z]+")
+
+
+def _number_at(tokens, start):
+    """Value of the number (digits or number words) starting at tokens[start], or None."""
+    token = tokens[start]
+    if token[0].isdigit():
+        number = float(token)
+        if not number.is_integer():
+            # "1.5 liters" is a size, not a count
+            return None
+        total = int(number)
+        if start + 1 < len(tokens) and tokens[start + 1] in SCALES:
+            total *= SCALES[tokens[start + 1]]
+        return total
+
+    total = None
+    for word in tokens[start:]:
+        if word in SMALL_NUMBERS:
+            total = (total or 0) + SMALL_NUMBERS[word]
+        elif word in TENS:
+            total = (total or 0) + TENS[word]
+        elif word in SCALES:
+            total = (total or 1) * SCALES[word]
+        elif word == "and" and total is not None and total >= 100:
+            continue
+        else:
+            break
+    return total
+
+
+def parse_quantity(value):
+    """
+    Parse a quantity answer into an int, or return None if no count can be found.
+    Accepts plain numbers, number words ("three", "twenty-one", "two dozen") and numbers
+    followed by units ("3 bottles"). Ranges ("2-3", "2 to 3", "between 2 and 3") count
+    their lower bound, which is the first number in the answer.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+
+    tokens = QUANTITY_TOKEN.findall(str(value).lower())
+    for i in range(len(tokens)):
+        number = _number_at(tokens, i)
+        if number is not None:
+            return number
+    for token in tokens:
+        if token in IMPLIED_NUMBERS:
+            return IMPLIED_NUMBERS[token]
+    return None
+
+
+def _build_response(fields):
+    product = _clean_text(fields.get("Product", ""))
+    brand = _clean_text(fields.get("Brand", ""))
+    quantity = parse_quantity(fields.get("Quantity", ""))
+    if not product or not brand or quantity is None:
+        return None
+    return {"Product": product, "Brand": brand, "Quantity": quantity}
+
+
+def _parse_json(answer):
+    start = answer.find("{")
+    end = answer.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(answer[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    fields = {}
+    for key, value in data.items():
+        field = _field_for_key(key)
+        if field and field not in fields:
+            fields[field] = value
+    return _build_response(fields)
+
+
+def _parse_key_values(answer):
+    fields = {}
+    for key, value in KEY_VALUE_PATTERN.findall(answer):
+        field = _field_for_key(key)
+        if field and field not in fields:
+            fields[field] = value
+    return _build_response(fields)
+
+
+def _parse_delimited(answer):
+    # "Milk | Oatly | 2" in the order the prompt asks for
+    for delimiter in ("|", ";", ","):
+        parts = answer.strip().split(delimiter)
+        if len(parts) == 3:
+            response = _build_response(dict(zip(("Product", "Brand", "Quantity"), parts)))
+            if response:
+                return response
+    return None
+
+
+def parse_structured_answer(answer):
+    """
+    Parse a single-prompt answer into {"Product", "Brand", "Quantity"}.
+    Accepts JSON (possibly wrapped in other text), "key: value" pairs or
+    three delimited values. Returns None when the answer can't be parsed.
+    """
+    if not answer:
+        return None
+    for parser in (_parse_json, _parse_key_values, _parse_delimited):
+        response = parser(answer)
+        if response:
+            return response
+    return None
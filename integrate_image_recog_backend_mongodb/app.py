@@ -1,124 +1,74 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from PIL import Image
-from time import time
-from pymongo import MongoClient
-import hashlib
-from datetime import datetime, timedelta
+from time import time, sleep
 import os
-from flask import Flask, request, render_template, redirect, url_for
+import sys
+import json
+from flask import Flask, Response, jsonify, request, render_template, redirect, url_for, stream_with_context
 
-app = Flask(__name__)
+# Allow sibling modules to be imported when app is loaded as a package module (e.g. from tests)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-class ProductImageProcessor:
-    def __init__(self, model_id, revision, inventory_folder):
-        self.model_id = model_id
-        self.revision = revision
-        self.inventory_folder = inventory_folder
-        self.tokenizer = AutoTokenizer.from_pretrained(model_id, revision=revision)
-        self.model = AutoModelForCausalLM.from_pretrained(model_id, trust_remote_code=True, revision=revision)
-
-    def process_images(self):
-        folder_dir = os.path.join(os.curdir, self.inventory_folder)
-        results = []
-        for image_file in os.listdir(folder_dir):
-            if image_file.lower().endswith((".png", ".jpg", ".jpeg")):
-                image_path = os.path.join(self.inventory_folder, image_file)
-                print(f"Processing image: {image_path}")
-                response = self._process_image(image_path)
-                if response:
-                    results.append(response)
-        return results
-
-    def _process_image(self, image_path):
-        try:
-            image = Image.open(image_path)
-            enc_image = self.model.encode_image(image)
-
-            product_type = self._answer_question(
-                enc_image,
-                "Fill in the blank - Product Type in the picture is  _______."
-            )
-            product_brand = self._answer_question(
-                enc_image,
-                "Fill in the blank - Product brand name in the picture is  _______."
-            )
-            product_quantity = self._answer_question(
-                enc_image,
-                f"Fill in the blank - Number of {product_brand} in the picture is  _______."
-            )
+from model_registry import get_processor
+from mongo_connection import LazyCollection
+from result_cache import ResultCache
+from embedding_store import EmbeddingStore
+from product_index import ProductIndex
+from precision import FULL_PRECISION
+from inventory_pages import PageRequestError, fetch_page, page_args
+from batch_dates import format_date
+from product_writes import default_batch_times, generate_hash_id, iter_chunks, write_products, written_products
+from job_queue import (
+    JobQueue, InMemoryJobStore, SQLiteJobStore, DuplicateJob, JobQueueFull, DEFAULT_MAX_DEPTH, DONE, FAILED,
+)
 
-            response = {
-                "Product": product_type,
-                "Brand": product_brand,
-                "Quantity": int(product_quantity),
-            }
-            print(response)
-            return response
-        except Exception as e:
-            print(f"Error processing image {image_path}: {e}")
-            return None
+app = Flask(__name__)
+# Dates are stored as datetimes; pages show them as YYYY-MM-DD
+app.add_template_filter(format_date, "date")
 
-    def _answer_question(self, enc_image, question):
-        return self.model.answer_question(enc_image, question, self.tokenizer)
+# Recognition results and image embeddings shared by all requests, keyed by image content,
+# and the index of known products that lets repeat products skip most of the generation
+result_cache = ResultCache()
+embedding_store = EmbeddingStore()
+product_index = ProductIndex()
+# fp32, bf16 or int8; check a mode with precision_check.py before switching it on
+model_precision = os.environ.get("MODEL_PRECISION", FULL_PRECISION)
+# The inference backend (transformers, onnx or stub) comes from INFERENCE_BACKEND; see inference_backend.py
 
-# MongoDB Functions
-client = MongoClient("mongodb://localhost:27017/")
-db = client["inventory_db"]
-collection = db["products"]
+# How often a job's event stream checks for new progress
+JOB_EVENTS_POLL_SECONDS = 0.5
 
-def generate_hash_id(product, brand):
-    unique_string = f"{product}{brand}"
-    return hashlib.sha256(unique_string.encode()).hexdigest()
+# MongoDB Functions
+# Connects on first use with the MONGO_* settings of mongo_connection.py
+collection = LazyCollection("products")
 
 def insert_product(product, brand, quantity, purchase_time, expiration_time):
-    # # hash_id = generate_hash_id(product, brand)
-    # product_data = {
-    #     "HashID": hash_id,
-    #     "Product": product,
-    #     "Brand": brand,
-    #     "Quantity": quantity,
-    #     "PurchaseTime": purchase_time,
-    #     "ExpirationTime": expiration_time,
-    # }
-    # collection.insert_one(product_data)
-    # print(f"Inserted product: {product_data}")
-    # return product_data
-    hash_id = generate_hash_id(product, brand)
-    
-    # Create the new batch entry
-    new_batch = {
-        "Quantity": quantity,
-        "PurchaseTime": purchase_time,
-        "ExpirationTime": expiration_time,
-    }
+    """Add a batch to a product, creating it on first sight, in a single upsert; returns the outcome."""
+    item = {"Product": product, "Brand": brand, "Quantity": quantity}
+    return write_products(collection, [item], purchase_time, expiration_time)[0]
 
-    # Check if the HashID already exists
-    existing_product = collection.find_one({"HashID": hash_id})
-    if existing_product:
-        # Add the new batch and update the total quantity
-        collection.update_one(
-            {"HashID": hash_id},
-            {
-                "$push": {"Batches": new_batch},
-                "$inc": {"Quantity": quantity}
-            }
-        )
-        print(f"Updated product: {product} | Added new batch: {new_batch} | Updated TotalQuantity: {existing_product['Quantity'] + quantity}")
-    else:
-        # Insert a new product record
-        product_data = {
-            "HashID": hash_id,
-            "Product": product,
-            "Brand": brand,
-            "Quantity": quantity,
-            "Batches": [new_batch],
+
+def store_results(results, purchase_time=None, expiration_time=None):
+    """
+    Write a chunk of (image_path, response) pairs with one bulk write and return the row
+    shown to the user for each recognized image: its fields, dates and write Status.
+    Products new to the product index are added to it once they are written.
+    """
+    if purchase_time is None or expiration_time is None:
+        purchase_time, expiration_time = default_batch_times()
+    items = [{**response, "ImagePath": image_path} for image_path, response in results if response]
+    outcomes = write_products(collection, items, purchase_time, expiration_time)
+    for outcome in outcomes:
+        product_index.commit(outcome["ImagePath"], written_products([outcome]))
+    return {
+        outcome.pop("ImagePath"): {
+            **outcome, "PurchaseTime": format_date(purchase_time), "ExpirationTime": format_date(expiration_time),
         }
-        collection.insert_one(product_data)
-        print(f"Inserted new product: {product_data}")
+        for outcome in outcomes
+    }
 
 
-def get_all_products():
-    return list(collection.find())
+def get_products_page(**options):
+    """One page of products without their batches (see inventory_pages.fetch_page); returns (products, next_cursor)."""
+    return fetch_page(collection, **options)
 
 def update_product(hash_id, product, brand, quantity, purchase_time, expiration_time):
     # #  print(f"Updating product with HashID: {hash_id}")
@@ -146,85 +96,144 @@ def update_product(hash_id, product, brand, quantity, purchase_time, expiration_
     # )
     
     # print(f"Matched count: {result.matched_count}, Modified count: {result.modified_count}")
-    hash_id = generate_hash_id(product, brand)
-    
-    # Create the new batch entry
-    new_batch = {
-        "Quantity": quantity,
-        "PurchaseTime": purchase_time,
-        "ExpirationTime": expiration_time,
-    }
-
-    # Check if the HashID already exists
-    existing_product = collection.find_one({"HashID": hash_id})
-    if existing_product:
-        # Add the new batch and update the total quantity
-        collection.update_one(
-            {"HashID": hash_id},
-            {
-                "$push": {"Batches": new_batch},
-                "$inc": {"Quantity": quantity}
-            }
-        )
-        print(f"Updated product: {product} | Added new batch: {new_batch} | Updated TotalQuantity: {existing_product['Quantity'] + quantity}")
-    else:
-        # Insert a new product record
-        product_data = {
-            "HashID": hash_id,
-            "Product": product,
-            "Brand": brand,
-            "Quantity": quantity,
-            "Batches": [new_batch],
-        }
-        collection.insert_one(product_data)
-        print(f"Inserted new product: {product_data}")
-
+    item = {"Product": product, "Brand": brand, "Quantity": quantity}
+    return write_products(collection, [item], purchase_time, expiration_time)[0]
 
 
 def delete_product(hash_id):
     collection.delete_one({"HashID": hash_id})
 
 
-# Route 1: Page to process images and update database
+def run_processing_job(folder_path, recorder):
+    """Job body: recognize every image in the folder with the shared model, writing each result as it arrives."""
+    start_time = time()
+    processor = get_processor(
+        result_cache=result_cache, embedding_store=embedding_store, product_index=product_index, precision=model_precision
+    )
+    recorder.set_total(len(processor.list_images(folder_path)))
+
+    def timed_results():
+        image_start = time()
+        for image_path, response in processor.iter_process_images(folder_path):
+            yield image_path, response, time() - image_start
+            image_start = time()
+
+    # Results are written in chunks, one bulk write each, then reported with their outcome
+    for chunk in iter_chunks(timed_results()):
+        products = store_results([(image_path, response) for image_path, response, _ in chunk])
+        for image_path, response, seconds in chunk:
+            recorder.image_done(
+                image_path,
+                seconds,
+                product=products.get(image_path),
+                error=None if response else "No product recognized",
+            )
+
+    execution_time = time() - start_time
+    print(f"Execution time: {execution_time:.2f} seconds")
+
+
+# Folder processing runs on background workers that share the warm model.
+# Set JOB_DB_PATH to keep the queue in SQLite so queued jobs survive a restart.
+job_store = SQLiteJobStore(os.environ["JOB_DB_PATH"]) if os.environ.get("JOB_DB_PATH") else InMemoryJobStore()
+job_queue = JobQueue(run_processing_job, store=job_store, max_depth=int(os.environ.get("JOB_QUEUE_DEPTH", DEFAULT_MAX_DEPTH)))
+
+
+def submit_job(folder_path):
+    """Queue a folder; returns (job_id, error message, HTTP status)."""
+    if not folder_path:
+        return None, "Please provide a folder path.", 400
+    if not os.path.isdir(folder_path):
+        return None, f"Folder not found: {folder_path}", 400
+    try:
+        return job_queue.submit(folder_path), None, 202
+    except DuplicateJob as e:
+        return e.job_id, f"This folder is already being processed (job {e.job_id}).", 409
+    except JobQueueFull:
+        return None, "Too many folders are queued. Please try again later.", 503
+
+
+# Route 1: Page to queue a folder of images for processing
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
         folder_path = request.form.get("folder_path")
-        if not folder_path:
-            return render_template("index.html", message="Please provide a folder path.")
-
-        start_time = time()
-        
-        model_id = "vikhyatk/moondream2"
-        revision = "2024-08-26"
-
-        processor = ProductImageProcessor(model_id, revision, folder_path)
-        responses = processor.process_images()
-
-        inserted_products = []
-        for response in responses:
-            product = response["Product"]
-            brand = response["Brand"]
-            quantity = response["Quantity"]
-            purchase_time = datetime.now().strftime("%Y-%m-%d")
-            expiration_time = (datetime.now() + timedelta(days=730)).strftime("%Y-%m-%d")
-            
-            inserted_product = insert_product(product, brand, quantity, purchase_time, expiration_time)
-            inserted_products.append(inserted_product)
-
-        end_time = time()
-        execution_time = end_time - start_time
-        print(f"Execution time: {execution_time:.2f} seconds")
-
-        return render_template("index.html", message="Images processed and database updated.", products=inserted_products)
+        job_id, error, _ = submit_job(folder_path)
+        if error:
+            return render_template("index.html", message=error, job_id=job_id)
+        return render_template("index.html", message=f"Job {job_id} queued.", job_id=job_id)
     return render_template("index.html")
 
 
+# Route 1b: JSON API to queue a folder
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    data = request.get_json(silent=True) or request.form
+    job_id, error, status_code = submit_job(data.get("folder_path"))
+    if error:
+        return jsonify({"error": error, "job_id": job_id}), status_code
+    return jsonify({"job_id": job_id, "status_url": url_for("job_status", job_id=job_id)}), status_code
+
+
+# Route 1c: Job progress, per-image timings and errors
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    status = job_queue.status(job_id, since=request.args.get("since", 0, type=int))
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Route 1d: Follow a job's progress as server-sent events
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    if job_queue.status(job_id) is None:
+        return "Job not found", 404
+
+    def events():
+        since = 0
+        status = job_queue.status(job_id)
+        yield sse_event("start", {"job_id": job_id, "folder": status["folder"], "total": status["total"]})
+        while True:
+            status = job_queue.status(job_id, since)
+            for image in status["images"]:
+                since += 1
+                yield sse_event("image", {**image, "done": since, "total": status["total"]})
+            if status["status"] in (DONE, FAILED):
+                seconds = (status["finished"] or time()) - (status["started"] or status["created"])
+                yield sse_event("done", {
+                    "status": status["status"],
+                    "error": status["error"],
+                    "done": since,
+                    "total": status["total"],
+                    "seconds": round(seconds, 2),
+                })
+                return
+            sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Route 2: View Inventory
 @app.route("/inventory")
 def view_inventory():
-    products = get_all_products()
-    return render_template("inventory.html", products=products)
+    # ?sort=Product&order=desc&limit=100; the "Next" link carries the cursor of the last row
+    try:
+        options = page_args(request.args)
+        # The table shows each product's batch summary, computed by MongoDB
+        products, next_cursor = get_products_page(**{**options, "summary": True})
+    except PageRequestError as e:
+        return str(e), 400
+    return render_template("inventory.html", products=products, next_cursor=next_cursor, page=options)
 
 # Route 3: Update Inventory
 @app.route("/update", methods=["GET", "POST"])
@@ -251,4 +260,12 @@ def delete_product_route(hash_id):
     return redirect(url_for("view_inventory"))
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    # python app.py --preload loads the model before serving the first request
+    preload = "--preload" in sys.argv
+    if preload:
+        get_processor(
+            result_cache=result_cache, embedding_store=embedding_store, product_index=product_index,
+            precision=model_precision,
+        )
+    # The reloader would start a second process and load the model again
+    app.run(debug=True, use_reloader=not preload)
\ No newline at end of file
@@ -0,0 +1,140 @@
+import argparse
+from datetime import date, datetime, timedelta
+
+from mongo_connection import LazyCollection, ensure_index
+
+# Format of the date strings in inventory.csv, forms and older documents
+DATE_FORMAT = "%Y-%m-%d"
+# Days ahead listed by the expiring query
+DEFAULT_EXPIRING_DAYS = 7
+
+def to_datetime(value):
+    """
+    Batch dates are stored as BSON datetimes (midnight of the day). Accepts a datetime, a date
+    or a "YYYY-MM-DD" string; None stays None.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def format_date(value):
+    """A stored date as "YYYY-MM-DD" for pages, JSON and forms; strings pass through."""
+    if isinstance(value, (datetime, date)):
+        return value.strftime(DATE_FORMAT)
+    return value
+
+
+def serialize_dates(value):
+    """Copy of a document (or a list of them) with every datetime formatted by format_date."""
+    if isinstance(value, dict):
+        return {key: serialize_dates(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [serialize_dates(item) for item in value]
+    return format_date(value)
+
+
+def start_of_today():
+    return to_datetime(date.today())
+
+
+def ensure_expiration_index(collection):
+    """
+    Index on Batches.ExpirationTime, created once per collection. Batches is an array, so
+    MongoDB makes it a multikey index with one entry per batch: a date range finds the
+    products holding a matching batch without reading any other product.
+    """
+    return ensure_index(collection, "Batches.ExpirationTime")
+
+
+def _string_to_date(field):
+    # Converts a "YYYY-MM-DD" string field inside an update pipeline and leaves any other value alone
+    return {"$cond": [
+        {"$eq": [{"$type": field}, "string"]},
+        {"$dateFromString": {"dateString": field, "format": DATE_FORMAT}},
+        field,
+    ]}
+
+
+def migrate_string_dates(collection):
+    """
+    Convert "YYYY-MM-DD" strings to datetimes in place, in the batches and in the top-level
+    dates of products from before batches. Each step is a single update_many with an update
+    pipeline, so the conversion runs inside MongoDB without sending documents back and forth,
+    and running it again only touches documents that still have strings.
+    Returns the number of documents changed.
+    """
+    string_batch = {"$elemMatch": {"$or": [
+        {"PurchaseTime": {"$type": "string"}},
+        {"ExpirationTime": {"$type": "string"}},
+    ]}}
+    batches = collection.update_many({"Batches": string_batch}, [{"$set": {"Batches": {"$map": {
+        "input": "$Batches",
+        "as": "batch",
+        "in": {"$mergeObjects": ["$$batch", {
+            "PurchaseTime": _string_to_date("$$batch.PurchaseTime"),
+            "ExpirationTime": _string_to_date("$$batch.ExpirationTime"),
+        }]},
+    }}}}])
+    print(f"Converted the batch dates of {batches.modified_count} products")
+
+    modified = batches.modified_count
+    for field in ("PurchaseTime", "ExpirationTime"):
+        result = collection.update_many(
+            {field: {"$type": "string"}}, [{"$set": {field: _string_to_date(f"${field}")}}],
+        )
+        print(f"Converted {field} of {result.modified_count} products")
+        modified += result.modified_count
+    return modified
+
+
+def expiring_batches(collection, days=DEFAULT_EXPIRING_DAYS, now=None):
+    """
+    Batches expiring from today up to days ahead (inclusive), soonest first, as rows with the
+    product's HashID, Product, Brand and the batch fields. The first stage is a range on the
+    multikey Batches.ExpirationTime index, so only products with such a batch are read; their
+    other batches are dropped before anything is returned.
+    """
+    start = to_datetime(now) if now else start_of_today()
+    end = start + timedelta(days=days + 1)
+    window = {"$gte": start, "$lt": end}
+    ensure_expiration_index(collection)
+    return list(collection.aggregate([
+        {"$match": {"Batches.ExpirationTime": window}},
+        {"$project": {"_id": 0, "HashID": 1, "Product": 1, "Brand": 1, "Batches": 1}},
+        {"$unwind": "$Batches"},
+        {"$match": {"Batches.ExpirationTime": window}},
+        {"$sort": {"Batches.ExpirationTime": 1, "HashID": 1}},
+        {"$project": {
+            "HashID": 1,
+            "Product": 1,
+            "Brand": 1,
+            "Quantity": "$Batches.Quantity",
+            "PurchaseTime": "$Batches.PurchaseTime",
+            "ExpirationTime": "$Batches.ExpirationTime",
+        }},
+    ]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List batches expiring soon, or convert string dates to datetimes.")
+    parser.add_argument("--days", type=int, default=DEFAULT_EXPIRING_DAYS, help="list batches expiring within this many days")
+    parser.add_argument("--migrate", action="store_true", help="convert YYYY-MM-DD strings to datetimes and build the index")
+    args = parser.parse_args()
+
+    collection = LazyCollection("products")
+    if args.migrate:
+        migrate_string_dates(collection)
+        ensure_expiration_index(collection)
+        return
+
+    rows = expiring_batches(collection, args.days)
+    print(f"{len(rows)} batches expire within {args.days} days")
+    for row in rows:
+        print(f"{format_date(row['ExpirationTime'])}  {row['Quantity']:>5}  {row['Product']} ({row['Brand']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import json
+from time import time, perf_counter
+
+from PIL import Image
+
+from insert_update_from_image import ProductImageProcessor, list_image_files, write_results
+from mongo_connection import LazyCollection
+from model_registry import DEFAULT_MODEL_ID, DEFAULT_REVISION, get_processor
+from precision import FULL_PRECISION, PRECISIONS
+from stage_timer import StageTimer
+from product_writes import iter_chunks
+
+
+def benchmark_encoding(processor, image_paths, batch_sizes=(1, 8), repeats=1):
+    """
+    Time processor.encode_images over the same decoded images for each batch size.
+    Returns {batch_size: images_per_second}.
+    """
+    images = [Image.open(image_path).convert("RGB") for image_path in image_paths]
+    if not images:
+        return {}
+
+    # Warm-up pass so the first measured batch size doesn't pay one-off allocation costs
+    processor.encode_images(images[:1], batch_size=1)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        start_time = time()
+        for _ in range(repeats):
+            processor.encode_images(images, batch_size=batch_size)
+        elapsed = time() - start_time
+        throughput[batch_size] = len(images) * repeats / elapsed
+    return throughput
+
+
+def compare_batch_sizes(folder, batch_sizes, repeats=1):
+    batch_sizes = [int(size) for size in batch_sizes.split(",")]
+    processor = get_processor()
+    image_paths = processor.list_images(folder)
+    print(f"Encoding {len(image_paths)} images from {folder}")
+
+    throughput = benchmark_encoding(processor, image_paths, batch_sizes, repeats)
+    baseline = throughput.get(1)
+    for batch_size, images_per_second in throughput.items():
+        line = f"batch size {batch_size:>3}: {images_per_second:.2f} images/second"
+        if baseline and batch_size != 1:
+            line += f" ({images_per_second / baseline:.2f}x batch size 1)"
+        print(line)
+
+
+
+def benchmark_pipeline(image_paths, model_id=DEFAULT_MODEL_ID, revision=DEFAULT_REVISION, batch_size=1,
+                       precision=FULL_PRECISION, workers=1, db_collection="benchmark_products"):
+    """
+    Run the full recognition pipeline over image_paths with the given settings and time each stage:
+    model load, decode, encode_image, every answer_question prompt and the DB write.
+    Result and embedding caches are left off so every image pays the real model cost.
+    With workers > 1 the model stages run in the worker processes and only the end-to-end
+    throughput and DB writes are timed. db_collection=None skips the DB write stage.
+    Returns a JSON-serializable report.
+    """
+    timer = StageTimer()
+    # Writes go to a scratch collection, so the benchmark never touches the real inventory and
+    # other writers in the process keep writing to theirs
+    scratch = LazyCollection(db_collection) if db_collection else None
+
+    processor = None
+    try:
+        start_time = perf_counter()
+        if workers == 1:
+            with timer.measure("model_load"):
+                processor = ProductImageProcessor(
+                    model_id, revision, batch_size=batch_size, precision=precision, stage_timer=timer
+                )
+            precision = processor.precision
+            results = processor.iter_process_images(image_paths=image_paths)
+        else:
+            from worker_pool import iter_process_images_parallel
+
+            results = iter_process_images_parallel(
+                image_paths, workers, model_id=model_id, revision=revision, precision=precision,
+                use_result_cache=False, use_embedding_store=False,
+            )
+        pipeline_start = perf_counter()
+
+        recognized = 0
+        # Same write stage as insert_update_from_image: one bulk write per chunk of results
+        for chunk in iter_chunks(results):
+            chunk_recognized = sum(1 for _, response in chunk if response)
+            recognized += chunk_recognized
+            if db_collection and chunk_recognized:
+                with timer.measure("db_write", chunk_recognized):
+                    write_results(chunk, target=scratch)
+        end_time = perf_counter()
+    finally:
+        if scratch is not None:
+            scratch.drop()
+
+    pipeline_seconds = end_time - pipeline_start
+    return {
+        "settings": {
+            "model_id": model_id,
+            "revision": revision,
+            "batch_size": batch_size,
+            "precision": precision,
+            "workers": workers,
+        },
+        "images": len(image_paths),
+        "recognized": recognized,
+        "total_seconds": end_time - start_time,
+        "pipeline_seconds": pipeline_seconds,
+        "images_per_second": len(image_paths) / pipeline_seconds if pipeline_seconds else None,
+        "stages": timer.summary(),
+        # Only available when the model runs in this process
+        "quantity_parsing": processor.parse_stats() if processor else None,
+    }
+
+
+def print_report(report):
+    settings = report["settings"]
+    print(
+        f"batch size {settings['batch_size']}, {settings['precision']}, {settings['workers']} worker(s): "
+        f"{report['images']} images in {report['pipeline_seconds']:.2f} s "
+        f"({report['images_per_second'] or 0:.2f} images/second, {report['recognized']} recognized)"
+    )
+    print(f"{'stage':<20} {'calls':>6} {'total s':>9} {'p50 s':>8} {'p95 s':>8} {'max s':>8} {'items/s':>8}")
+    for stage, stats in report["stages"].items():
+        print(
+            f"{stage:<20} {stats['calls']:>6} {stats['total_seconds']:>9.3f} {stats['p50']:>8.3f} "
+            f"{stats['p95']:>8.3f} {stats['max']:>8.3f} {stats['items_per_second'] or 0:>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of the recognition pipeline on an image folder.")
+    parser.add_argument("folder", nargs="?", default="inventory_images")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--precision", choices=PRECISIONS, default=FULL_PRECISION)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--no-db", action="store_true", help="skip the DB write stage")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file the report is written to")
+    parser.add_argument("--batch-sizes", help="instead compare encode_image throughput between these batch sizes")
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.batch_sizes:
+        compare_batch_sizes(args.folder, args.batch_sizes, args.repeats)
+        return
+
+    image_paths = list_image_files(args.folder)
+    print(f"Benchmarking {len(image_paths)} images from {args.folder}")
+    report = benchmark_pipeline(
+        image_paths, batch_size=args.batch_size, precision=args.precision, workers=args.workers,
+        db_collection=None if args.no_db else "benchmark_products",
+    )
+    report["folder"] = args.folder
+    print_report(report)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
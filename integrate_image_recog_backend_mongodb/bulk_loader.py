@@ -0,0 +1,122 @@
+import json
+from itertools import islice
+from time import perf_counter
+
+from pymongo.errors import BulkWriteError
+
+from batch_dates import to_datetime
+from mongo_connection import ensure_index
+from product_writes import DUPLICATE_KEY_ERROR, generate_hash_id, row_hash
+
+# Documents sent per insert_many
+LOAD_CHUNK_SIZE = 1000
+# Bytes read from the file at a time while streaming JSON
+READ_SIZE = 64 * 1024
+
+
+def iter_json_records(path, read_size=READ_SIZE):
+    """
+    Stream the records of a JSON file without loading it whole: either one top-level array
+    (products.json) or one object per line (NDJSON). Only the current read buffer and the
+    record being decoded are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as file:
+        buffer = ""
+        position = 0
+        in_array = None
+        while True:
+            # Skip whitespace and, inside an array, the separating commas
+            while position < len(buffer) and (buffer[position].isspace() or (in_array and buffer[position] == ",")):
+                position += 1
+            if position == len(buffer):
+                chunk = file.read(read_size)
+                if not chunk:
+                    break
+                buffer, position = chunk, 0
+                continue
+
+            if in_array is None:
+                in_array = buffer[position] == "["
+                if in_array:
+                    position += 1
+                continue
+            if in_array and buffer[position] == "]":
+                break
+
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The record continues in the next read
+                chunk = file.read(read_size)
+                if not chunk:
+                    raise
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield record
+            position = end
+
+
+def product_document(item):
+    """
+    Product document for a catalog row: the row's quantity becomes the first batch, with the
+    same RowHash ingest_catalog.py gives the row, so importing the CSV later skips it.
+    """
+    quantity = int(item["Quantity"])
+    return {
+        "HashID": item.get("HashID") or generate_hash_id(item["Product"], item["Brand"]),
+        "Product": item["Product"],
+        "Brand": item["Brand"],
+        "Quantity": quantity,
+        "Batches": [
+            {
+                "Quantity": quantity,
+                "PurchaseTime": to_datetime(item["PurchaseTime"]),
+                "ExpirationTime": to_datetime(item["ExpirationTime"]),
+                "RowHash": row_hash(
+                    item["Product"], item["Brand"], quantity, item["PurchaseTime"], item["ExpirationTime"],
+                ),
+            }
+        ],
+    }
+
+
+def load_documents(collection, documents, chunk_size=LOAD_CHUNK_SIZE):
+    """
+    Insert a stream of documents with one unordered insert_many per chunk. Documents whose
+    HashID is already in the collection (unique index from an earlier load) are rejected by
+    the server and counted as skipped, so loading the same file again adds nothing.
+    Returns (inserted, skipped, seconds).
+    """
+    documents = iter(documents)
+    inserted = skipped = 0
+    start_time = perf_counter()
+    while True:
+        chunk = list(islice(documents, chunk_size))
+        if not chunk:
+            break
+        try:
+            inserted += len(collection.insert_many(chunk, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            duplicates = sum(1 for error in errors if error.get("code") == DUPLICATE_KEY_ERROR)
+            if duplicates < len(errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+            skipped += duplicates
+        seconds = perf_counter() - start_time
+        print(f"Loaded {inserted + skipped} documents ({inserted / seconds if seconds else 0:.0f} inserted/s)")
+    return inserted, skipped, perf_counter() - start_time
+
+
+def create_hash_index(collection):
+    """
+    Unique HashID index, built once after the bulk load: building it over the loaded data
+    is much cheaper than maintaining it on every insert. Returns False if duplicates in the
+    data prevent it.
+    """
+    start_time = perf_counter()
+    if not ensure_index(collection, "HashID", unique=True):
+        return False
+    print(f"Created unique HashID index in {perf_counter() - start_time:.2f} seconds")
+    return True
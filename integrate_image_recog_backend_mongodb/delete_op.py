@@ -1,10 +1,9 @@
 import hashlib
-from pymongo import MongoClient
 
-# Connect to MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client["inventory_db"]
-collection = db["products"]
+from mongo_connection import LazyCollection
+
+# Connects to MongoDB on first use
+collection = LazyCollection("products")
 
 # Function to generate HashID based on Product and Brand
 def generate_hash_id(product, brand):
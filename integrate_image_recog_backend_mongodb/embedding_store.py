@@ -0,0 +1,78 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+from result_cache import file_sha256
+
+DEFAULT_STORE_DIR = ".embedding_store"
+
+
+class EmbeddingStore:
+    """
+    On-disk store of vision-encoder outputs, one .npy file per image keyed by the image
+    content hash plus model id/revision. Files are opened memory-mapped, so re-asking
+    questions about a large historical folder doesn't read every embedding into RAM up front
+    and never runs the vision encoder again.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(content_hash, model_id, revision):
+        return hashlib.sha256(f"{model_id}@{revision}|{content_hash}".encode()).hexdigest()
+
+    def _path(self, key):
+        # Fan out into subdirectories so one folder doesn't hold every embedding
+        return os.path.join(self.store_dir, key[:2], f"{key}.npy")
+
+    def get(self, image_path, model_id, revision, content_hash=None, dtype=None):
+        """Return (embedding or None, key). dtype casts the loaded tensor back to the model's dtype."""
+        key = self.make_key(content_hash or file_sha256(image_path), model_id, revision)
+        path = self._path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None, key
+        try:
+            # Copy-on-write mapping: pages are read lazily and the file is never modified
+            array = np.load(path, mmap_mode="c")
+        except (OSError, ValueError):
+            self.misses += 1
+            return None, key
+        self.hits += 1
+        torch = _loaded_torch()
+        if torch is None:
+            return array, key
+        tensor = torch.from_numpy(array)
+        if isinstance(dtype, torch.dtype) and tensor.dtype != dtype:
+            tensor = tensor.to(dtype)
+        return tensor, key
+
+    def put(self, key, embedding):
+        torch = _loaded_torch()
+        if torch is not None and isinstance(embedding, torch.Tensor):
+            embedding = embedding.detach().cpu()
+            # NumPy has no bfloat16; store it as float32 and cast back on load
+            if embedding.dtype == torch.bfloat16:
+                embedding = embedding.float()
+            embedding = embedding.numpy()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so readers never map a half-written embedding
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.save(file, np.asarray(embedding))
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def _loaded_torch():
+    # The store itself only needs NumPy. Tensors only exist once a model has imported torch,
+    # so it is never imported here: that would cost every process reading the store seconds
+    return sys.modules.get("torch")
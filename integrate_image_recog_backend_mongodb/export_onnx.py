@@ -0,0 +1,127 @@
+import argparse
+import os
+from time import time
+
+import numpy as np
+
+from inference_backend import DEFAULT_ONNX_MODEL_DIR, VISION_INPUT_SIZE, OnnxBackend, TransformersBackend
+from model_registry import DEFAULT_MODEL_ID, DEFAULT_REVISION
+from precision import PRECISIONS
+
+try:
+    import torch
+except ImportError:  # needed for the export only, not for running the ONNX backend
+    torch = None
+
+ONNX_OPSET = 17
+
+
+class VisionEncoderExport(torch.nn.Module if torch else object):
+    """moondream2's vision encoder on one 378 px crop per image (no high-resolution crops)."""
+
+    def __init__(self, vision_encoder):
+        super().__init__()
+        self.encoder = vision_encoder.encoder
+        self.projection = vision_encoder.projection
+
+    def forward(self, pixel_values):
+        features = self.encoder(pixel_values)
+        # Without high-resolution crops the global features stand in for the local ones
+        return self.projection(torch.cat([features, features], dim=-1))
+
+
+class TextDecoderExport(torch.nn.Module if torch else object):
+    """
+    Text decoder step with a KV cache: takes the new input embeddings and the keys and values
+    of every earlier position (past_key_i / past_value_i, one pair per layer, empty on the first
+    step) and returns the next-token logits plus the updated cache (present_key_i /
+    present_value_i). The prompt is run once and every generated token after it costs a
+    one-position forward pass.
+    """
+
+    def __init__(self, text_model):
+        super().__init__()
+        self.text_model = text_model
+
+    def forward(self, inputs_embeds, *past):
+        past_key_values = tuple((past[i], past[i + 1]) for i in range(0, len(past), 2))
+        output = self.text_model(inputs_embeds=inputs_embeds, past_key_values=past_key_values, use_cache=True)
+        present = output.past_key_values
+        if hasattr(present, "to_legacy_cache"):
+            present = present.to_legacy_cache()
+        return (output.logits[:, -1, :], *(tensor for layer in present for tensor in layer))
+
+
+def cache_names(layers):
+    """Input and output names of the decoder's KV cache, in the order the tensors are passed."""
+    past = [f"past_{kind}_{layer}" for layer in range(layers) for kind in ("key", "value")]
+    return past, [name.replace("past_", "present_", 1) for name in past]
+
+
+def export(output_dir=DEFAULT_ONNX_MODEL_DIR, model_id=DEFAULT_MODEL_ID, revision=DEFAULT_REVISION, int8=False):
+    """Write the files OnnxBackend loads: vision_encoder.onnx, text_decoder.onnx and token_embeddings.npy."""
+    if torch is None:
+        raise ImportError("Exporting to ONNX needs torch")
+    os.makedirs(output_dir, exist_ok=True)
+    # A new export has to pass precision_check.py again before OnnxBackend loads it
+    for precision in PRECISIONS:
+        if os.path.exists(OnnxBackend.check_path(output_dir, precision)):
+            os.remove(OnnxBackend.check_path(output_dir, precision))
+    model = TransformersBackend(model_id, revision).model.eval()
+
+    embeddings = model.text_model.get_input_embeddings().weight.detach().float()
+    np.save(os.path.join(output_dir, "token_embeddings.npy"), embeddings.numpy())
+
+    vision_path = os.path.join(output_dir, "vision_encoder.onnx")
+    decoder_path = os.path.join(output_dir, "text_decoder.onnx")
+    config = model.text_model.config
+    layers = config.num_hidden_layers
+    heads = config.num_attention_heads
+    head_dim = config.hidden_size // heads
+    past_names, present_names = cache_names(layers)
+    # Traced with a short cache; sequence and cache lengths are dynamic in the exported graph
+    past = tuple(torch.zeros(1, heads, 2, head_dim) for _ in past_names)
+    cache_axes = {name: {0: "batch", 2: "past_sequence"} for name in past_names}
+    cache_axes.update({name: {0: "batch", 2: "sequence"} for name in present_names})
+
+    with torch.no_grad():
+        torch.onnx.export(
+            VisionEncoderExport(model.vision_encoder),
+            (torch.zeros(1, 3, VISION_INPUT_SIZE, VISION_INPUT_SIZE),),
+            vision_path,
+            input_names=["pixel_values"],
+            output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+            opset_version=ONNX_OPSET,
+        )
+        torch.onnx.export(
+            TextDecoderExport(model.text_model),
+            (torch.zeros(1, 8, embeddings.shape[1]), *past),
+            decoder_path,
+            input_names=["inputs_embeds", *past_names],
+            output_names=["logits", *present_names],
+            dynamic_axes={"inputs_embeds": {0: "batch", 1: "new_sequence"}, "logits": {0: "batch"}, **cache_axes},
+            opset_version=ONNX_OPSET,
+        )
+
+    if int8:
+        # Dynamically quantized copies for OnnxBackend(precision="int8")
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        for path in (vision_path, decoder_path):
+            quantize_dynamic(path, path.replace(".onnx", "_int8.onnx"), weight_type=QuantType.QInt8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export moondream2 for the ONNX Runtime backend.")
+    parser.add_argument("--output", default=DEFAULT_ONNX_MODEL_DIR, help="directory for the exported files")
+    parser.add_argument("--int8", action="store_true", help="also write int8 (dynamically quantized) copies")
+    args = parser.parse_args()
+
+    start_time = time()
+    export(args.output, int8=args.int8)
+    print(f"Exported to {args.output} in {time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from result_cache import file_sha256
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+class ImageLedger:
+    """
+    Record of images already written to the inventory, stored in a MongoDB collection keyed
+    by image content hash. scan() returns only new or changed files: a file whose size and
+    mtime match its ledger entry is skipped without being read, and a touched or renamed
+    file whose content hash is already known is skipped after hashing.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        # path -> (content_hash, size, mtime_ns) for files returned by the last scan
+        self._pending = {}
+
+    def scan(self, folder, retry_failed=False):
+        """Return the image paths in folder that still need processing."""
+        known_paths = {}
+        known_hashes = {}
+        # One query loads the whole ledger; entries are small
+        for entry in self.collection.find({}, {"Path": 1, "Size": 1, "MTime": 1, "Recognized": 1}):
+            known_hashes[entry["_id"]] = entry
+            if "Path" in entry:
+                known_paths[entry["Path"]] = entry
+
+        to_process = []
+        skipped = 0
+        with os.scandir(folder) as entries:
+            for dir_entry in sorted(entries, key=lambda e: e.name):
+                if not dir_entry.is_file() or not dir_entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                image_path = os.path.join(folder, dir_entry.name)
+                stat = dir_entry.stat()
+
+                # Fast path: unchanged size and mtime means unchanged content
+                known = known_paths.get(image_path)
+                if known and known.get("Size") == stat.st_size and known.get("MTime") == stat.st_mtime_ns:
+                    if known.get("Recognized", True) or not retry_failed:
+                        skipped += 1
+                        continue
+
+                content_hash = file_sha256(image_path)
+                known = known_hashes.get(content_hash)
+                if known and (known.get("Recognized", True) or not retry_failed):
+                    # Same content under a new name or mtime: remember it so the next scan takes the fast path
+                    self.collection.update_one(
+                        {"_id": content_hash},
+                        {"$set": {"Path": image_path, "Size": stat.st_size, "MTime": stat.st_mtime_ns}},
+                    )
+                    skipped += 1
+                    continue
+
+                self._pending[image_path] = (content_hash, stat.st_size, stat.st_mtime_ns)
+                to_process.append(image_path)
+
+        print(f"Ledger: {len(to_process)} new or changed images, {skipped} already processed")
+        return to_process
+
+    def content_hash(self, image_path):
+        pending = self._pending.get(image_path)
+        return pending[0] if pending else None
+
+    def record(self, image_path, response):
+        """
+        Mark an image as processed once its result has been written (or nothing was recognized).
+        Images whose write failed must not be recorded, or later runs would skip them.
+        """
+        operation = self._record_operation(image_path, response)
+        if operation is not None:
+            self.collection.update_one(*operation, upsert=True)
+
+    def record_many(self, results):
+        """record() for a chunk of (image_path, response) pairs, in one bulk write."""
+        operations = [
+            UpdateOne(*operation, upsert=True)
+            for operation in (self._record_operation(image_path, response) for image_path, response in results)
+            if operation is not None
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+    def _record_operation(self, image_path, response):
+        # (filter, update) for the ledger entry, or None for images this ledger didn't scan
+        pending = self._pending.pop(image_path, None)
+        if pending is None:
+            return None
+        content_hash, size, mtime = pending
+        fields = {
+            "Path": image_path,
+            "Size": size,
+            "MTime": mtime,
+            "Recognized": bool(response),
+            "ProcessedAt": datetime.now(),
+        }
+        if isinstance(response, list):
+            # Shelf photo with several products
+            fields["Products"] = [{"Product": item["Product"], "Brand": item["Brand"]} for item in response]
+        elif response:
+            fields["Product"] = response["Product"]
+            fields["Brand"] = response["Brand"]
+        return {"_id": content_hash}, {"$set": fields}
@@ -0,0 +1,75 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from PIL import Image, ImageOps
+
+# Longest side kept after decoding. The vision encoder works on much smaller crops,
+# so multi-megapixel phone photos lose nothing the model would have seen.
+DEFAULT_MAX_SIZE = 1024
+
+
+def load_image(image_path, max_size=DEFAULT_MAX_SIZE):
+    """
+    Decode an image for the model: JPEGs are downscaled by the decoder itself (draft mode),
+    the EXIF orientation is applied, and the result is an RGB image no larger than max_size.
+    """
+    image = Image.open(image_path)
+    if max_size and image.format == "JPEG":
+        # Decode at 1/2, 1/4 or 1/8 scale while staying at least max_size on each side
+        image.draft("RGB", (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("RGB")
+    if max_size and max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+    return image
+
+
+class ImagePrefetcher:
+    """
+    Iterate over (image_path, image, error) with decoding done ahead of time by a thread pool,
+    so JPEG decode and resizing overlap with model inference on the current image.
+    At most `depth` decoded images are held at once. Results keep the input order;
+    error is the exception raised while decoding (image is then None).
+    With workers=0 images are decoded in the calling thread.
+    An optional StageTimer records each decode under "decode".
+    """
+
+    def __init__(self, image_paths, workers=2, depth=4, max_size=DEFAULT_MAX_SIZE, stage_timer=None):
+        self.image_paths = image_paths
+        self.workers = workers
+        self.depth = max(depth, 1)
+        self.max_size = max_size
+        self.stage_timer = stage_timer
+
+    def _load(self, image_path):
+        with self.stage_timer.measure("decode") if self.stage_timer else nullcontext():
+            return load_image(image_path, self.max_size)
+
+    def __iter__(self):
+        if self.workers <= 0:
+            for image_path in self.image_paths:
+                try:
+                    yield image_path, self._load(image_path), None
+                except Exception as e:
+                    yield image_path, None, e
+            return
+
+        paths = iter(self.image_paths)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-prefetch") as pool:
+            def submit_next():
+                for image_path in paths:
+                    pending.append((image_path, pool.submit(self._load, image_path)))
+                    return
+
+            for _ in range(self.depth):
+                submit_next()
+            while pending:
+                image_path, future = pending.popleft()
+                # Keep the queue full while the caller works on this image
+                submit_next()
+                try:
+                    yield image_path, future.result(), None
+                except Exception as e:
+                    yield image_path, None, e
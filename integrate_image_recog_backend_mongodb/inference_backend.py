@@ -0,0 +1,255 @@
+import json
+import os
+
+import numpy as np
+from PIL import Image
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+try:
+    import onnxruntime
+except ImportError:  # only needed for the ONNX backend
+    onnxruntime = None
+
+from precision import FULL_PRECISION, INT8_PRECISION, resolve_precision, load_options, apply_precision, model_size_bytes
+
+# Backend names, selected with ProductImageProcessor(backend=...) or the INFERENCE_BACKEND variable
+TRANSFORMERS_BACKEND = "transformers"
+ONNX_BACKEND = "onnx"
+STUB_BACKEND = "stub"
+BACKENDS = (TRANSFORMERS_BACKEND, ONNX_BACKEND, STUB_BACKEND)
+
+# Where export_onnx.py writes the exported model; override with ONNX_MODEL_DIR
+DEFAULT_ONNX_MODEL_DIR = "onnx_model"
+# Input resolution of moondream2's vision encoder
+VISION_INPUT_SIZE = 378
+# Default generation limit of moondream2's answer_question
+DEFAULT_MAX_NEW_TOKENS = 256
+# Written next to the exported model by precision_check.py once the ONNX backend has passed
+# against transformers, one file per precision
+ONNX_CHECK_FILE = "precision_check_{precision}.json"
+
+
+class UncheckedBackendError(RuntimeError):
+    """The ONNX export has not passed precision_check.py --backend onnx yet."""
+
+
+def default_backend_name():
+    return os.environ.get("INFERENCE_BACKEND", TRANSFORMERS_BACKEND)
+
+
+def create_backend(name, model_id, revision, precision=FULL_PRECISION):
+    """Build the inference backend called name for a model."""
+    if name == TRANSFORMERS_BACKEND:
+        return TransformersBackend(model_id, revision, precision)
+    if name == ONNX_BACKEND:
+        return OnnxBackend(os.environ.get("ONNX_MODEL_DIR", DEFAULT_ONNX_MODEL_DIR), model_id, revision, precision)
+    if name == STUB_BACKEND:
+        return StubBackend()
+    raise ValueError(f"Unknown inference backend {name!r}, expected one of {', '.join(BACKENDS)}")
+
+
+class TransformersBackend:
+    """
+    moondream2 through transformers (trust_remote_code). Every backend offers the same two calls:
+    encode_image(image or list of images) and answer_question(enc_image, question, max_new_tokens,
+    stop_sequences), plus the precision it actually runs at.
+    """
+
+    name = TRANSFORMERS_BACKEND
+
+    def __init__(self, model_id, revision, precision=FULL_PRECISION):
+        self.precision = resolve_precision(precision)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id, revision=revision)
+        model = AutoModelForCausalLM.from_pretrained(
+            model_id, trust_remote_code=True, revision=revision, **load_options(self.precision)
+        )
+        self.model = apply_precision(model, self.precision)
+        self._stop_ids = {}
+
+    @property
+    def dtype(self):
+        return getattr(self.model, "dtype", None)
+
+    def encode_image(self, images):
+        return self.model.encode_image(images)
+
+    def answer_question(self, enc_image, question, max_new_tokens=DEFAULT_MAX_NEW_TOKENS, stop_sequences=()):
+        return self.model.answer_question(
+            enc_image, question, self.tokenizer,
+            max_new_tokens=max_new_tokens, eos_token_id=self._stop_token_ids(tuple(stop_sequences)),
+        )
+
+    def _stop_token_ids(self, stop_sequences):
+        # answer_question forwards extra arguments to generate(), so stop sequences are passed
+        # as additional end-of-sequence tokens; only sequences that are a single token qualify
+        if stop_sequences not in self._stop_ids:
+            token_ids = [self.tokenizer.eos_token_id]
+            for stop in stop_sequences:
+                tokens = self.tokenizer.encode(stop, add_special_tokens=False)
+                if len(tokens) == 1 and tokens[0] not in token_ids:
+                    token_ids.append(tokens[0])
+            self._stop_ids[stop_sequences] = token_ids
+        return self._stop_ids[stop_sequences]
+
+    def size_bytes(self):
+        return model_size_bytes(self.model)
+
+
+class OnnxBackend:
+    """
+    moondream2 exported by export_onnx.py and run with ONNX Runtime on CPU: the vision encoder
+    (at its base 378 px resolution), the text decoder (next-token logits plus a KV cache) and the
+    token embedding table as a .npy file. Decoding is greedy, as in answer_question: the prompt
+    is run once, then one token at a time against the cache. precision="int8" loads the
+    dynamically quantized copies written by export_onnx.py --int8.
+
+    Experimental: it only loads once precision_check.py --backend onnx has passed for the
+    export (see ONNX_CHECK_FILE); precision_check itself loads it with checked=False.
+    """
+
+    name = ONNX_BACKEND
+    dtype = None
+
+    def __init__(self, model_dir, model_id, revision, precision=FULL_PRECISION, threads=None, checked=True):
+        if onnxruntime is None:
+            raise ImportError("The ONNX backend needs onnxruntime (pip install onnxruntime)")
+        if precision not in (FULL_PRECISION, INT8_PRECISION):
+            print(f"The ONNX backend has no {precision} model, using {FULL_PRECISION}")
+            precision = FULL_PRECISION
+        self.precision = precision
+        self.model_dir = model_dir
+        if checked and not os.path.exists(self.check_path(model_dir, precision)):
+            raise UncheckedBackendError(
+                f"The {precision} ONNX model in {model_dir} has not been checked against transformers; "
+                f"run python precision_check.py --backend onnx --precision {precision} first"
+            )
+        suffix = "_int8" if precision == INT8_PRECISION else ""
+        self.model_files = [
+            os.path.join(model_dir, f"vision_encoder{suffix}.onnx"),
+            os.path.join(model_dir, f"text_decoder{suffix}.onnx"),
+            os.path.join(model_dir, "token_embeddings.npy"),
+        ]
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        providers = ["CPUExecutionProvider"]
+        self.vision_session = onnxruntime.InferenceSession(self.model_files[0], options, providers=providers)
+        self.decoder_session = onnxruntime.InferenceSession(self.model_files[1], options, providers=providers)
+        # Only the rows of the tokens actually used are read
+        self.token_embeddings = np.load(self.model_files[2], mmap_mode="r")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id, revision=revision)
+        self._stop_ids = {}
+        # KV cache inputs (past_key_i / past_value_i) with their heads and head size
+        self._past = [
+            (decoder_input.name, decoder_input.shape[1], decoder_input.shape[3])
+            for decoder_input in self.decoder_session.get_inputs()
+            if decoder_input.name.startswith("past_")
+        ]
+        if not self._past:
+            raise ValueError(f"{self.model_files[1]} has no KV cache inputs; export it again with export_onnx.py")
+        # Outputs asked for in this order, so present_* line up with the past_* they replace
+        self._decoder_outputs = ["logits"] + [name.replace("past_", "present_", 1) for name, _, _ in self._past]
+
+    @staticmethod
+    def check_path(model_dir, precision):
+        return os.path.join(model_dir, ONNX_CHECK_FILE.format(precision=precision))
+
+    @staticmethod
+    def preprocess(image):
+        """Resize and normalize to [-1, 1] like moondream2's vision encoder, as CHW float32."""
+        image = image.convert("RGB").resize((VISION_INPUT_SIZE, VISION_INPUT_SIZE), Image.BICUBIC)
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+        return ((pixels - 0.5) / 0.5).transpose(2, 0, 1)
+
+    def encode_image(self, images):
+        batch = images if isinstance(images, list) else [images]
+        pixel_values = np.stack([self.preprocess(image) for image in batch])
+        # (batch, patches, hidden); a single image keeps its batch dimension like the torch model
+        return self.vision_session.run(None, {"pixel_values": pixel_values})[0]
+
+    def _tokenize(self, text):
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def _embed_tokens(self, token_ids):
+        return np.asarray(self.token_embeddings[token_ids], dtype=np.float32)
+
+    def answer_question(self, enc_image, question, max_new_tokens=DEFAULT_MAX_NEW_TOKENS, stop_sequences=()):
+        # Same prompt layout as answer_question: BOS, image embeddings, then the question
+        inputs_embeds = np.concatenate([
+            self._embed_tokens([self.tokenizer.bos_token_id]),
+            np.asarray(enc_image, dtype=np.float32).reshape(-1, self.token_embeddings.shape[1]),
+            self._embed_tokens(self._tokenize(f"\n\nQuestion: {question}\n\nAnswer:")),
+        ])
+
+        stop_ids = self._stop_token_ids(tuple(stop_sequences))
+        tokens = []
+        # The first step runs the whole prompt against an empty cache
+        cache = {name: np.zeros((1, heads, 0, head_dim), dtype=np.float32) for name, heads, head_dim in self._past}
+        for _ in range(max_new_tokens):
+            logits, *present = self.decoder_session.run(
+                self._decoder_outputs, {"inputs_embeds": inputs_embeds[None, :, :], **cache}
+            )
+            cache = dict(zip(cache, present))
+            token = int(np.argmax(logits[0]))
+            if token in stop_ids:
+                # Stop sequences stay in the answer, as they do with generate()
+                if token != self.tokenizer.eos_token_id:
+                    tokens.append(token)
+                break
+            tokens.append(token)
+            # Later steps only feed the new token; earlier positions come from the cache
+            inputs_embeds = self._embed_tokens([token])
+        return self.tokenizer.decode(tokens, skip_special_tokens=True).strip()
+
+    def _stop_token_ids(self, stop_sequences):
+        if stop_sequences not in self._stop_ids:
+            token_ids = {self.tokenizer.eos_token_id}
+            for stop in stop_sequences:
+                tokens = self._tokenize(stop)
+                if len(tokens) == 1:
+                    token_ids.add(tokens[0])
+            self._stop_ids[stop_sequences] = token_ids
+        return self._stop_ids[stop_sequences]
+
+    def size_bytes(self):
+        return sum(os.path.getsize(path) for path in self.model_files)
+
+
+# Answers given by the stub backend unless a test passes its own
+DEFAULT_STUB_ANSWERS = {"Product": "Laundry detergent", "Brand": "Ariel", "Quantity": 2}
+
+
+class StubBackend:
+    """
+    Deterministic stand-in for tests: no model is loaded. Embeddings are a tiny thumbnail of
+    the image, so identical images encode identically, and every question gets a fixed answer.
+    """
+
+    name = STUB_BACKEND
+    dtype = None
+    precision = FULL_PRECISION
+
+    def __init__(self, answers=None):
+        self.answers = dict(DEFAULT_STUB_ANSWERS, **(answers or {}))
+
+    @staticmethod
+    def _embed(image):
+        thumbnail = image.convert("RGB").resize((2, 2))
+        return np.asarray(thumbnail, dtype=np.float32).reshape(4, 3) / 255.0
+
+    def encode_image(self, images):
+        batch = images if isinstance(images, list) else [images]
+        return np.stack([self._embed(image) for image in batch])
+
+    def answer_question(self, enc_image, question, max_new_tokens=DEFAULT_MAX_NEW_TOKENS, stop_sequences=()):
+        if "JSON" in question:
+            return json.dumps(self.answers)
+        if "Number of" in question:
+            return str(self.answers["Quantity"])
+        if "brand" in question:
+            return self.answers["Brand"]
+        return self.answers["Product"]
+
+    def size_bytes(self):
+        return 0
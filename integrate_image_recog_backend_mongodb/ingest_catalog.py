@@ -0,0 +1,210 @@
+import argparse
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+from time import perf_counter
+
+from pymongo import UpdateOne
+
+from mongo_connection import LazyCollection
+from product_writes import generate_hash_id, row_hash, write_products
+
+# Rows hashed and upserted together
+INGEST_CHUNK_SIZE = 1000
+# Smaller files are hashed in this process; starting a pool costs more than it saves
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# MongoDB configuration
+collection_name = "products"
+
+
+def iter_csv_rows(path):
+    """Stream the rows of inventory.csv as dicts, one at a time."""
+    with open(path, mode="r", newline="", encoding="utf-8") as file:
+        yield from csv.DictReader(file)  # auto analyze header
+
+
+def catalog_items(rows):
+    """
+    Turn a chunk of CSV rows into catalog items: typed fields, the product's HashID and a
+    RowHash identifying the row's batch, so importing the same row again changes nothing.
+    Runs in the worker processes for large files.
+    """
+    items = []
+    for row in rows:
+        product = row["Product"]
+        brand = row["Brand"]
+        quantity = int(row["Quantity"])  # ensure int for quantity
+        purchase_time = row["PurchaseTime"]
+        expiration_time = row["ExpirationTime"]
+        items.append({
+            "HashID": generate_hash_id(product, brand),
+            "Product": product,
+            "Brand": brand,
+            "Quantity": quantity,
+            "PurchaseTime": purchase_time,
+            "ExpirationTime": expiration_time,
+            "RowHash": row_hash(product, brand, quantity, purchase_time, expiration_time),
+        })
+    return items
+
+
+def iter_catalog_chunks(rows, workers=1, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Yield lists of catalog items, chunk by chunk and in file order. With workers > 1 the
+    chunks are hashed by a process pool, with at most two chunks per worker in flight so
+    memory stays bounded however large the file is.
+    """
+    rows = iter(rows)
+    chunks = iter(lambda: list(islice(rows, chunk_size)), [])
+    if workers <= 1:
+        for chunk in chunks:
+            yield catalog_items(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(catalog_items, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class CatalogExport:
+    """
+    Write catalog items to products.json as they stream past: a JSON array for .json files
+    (same layout csv_json_conversion.py wrote) or one object per line for .ndjson.
+    """
+
+    FIELDS = ("HashID", "Product", "Brand", "Quantity", "PurchaseTime", "ExpirationTime")
+
+    def __init__(self, path):
+        self.path = path
+        self.ndjson = path.lower().endswith((".ndjson", ".jsonl"))
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "w")
+        if not self.ndjson:
+            self._file.write("[")
+        return self
+
+    def write(self, items):
+        for item in items:
+            record = {field: item[field] for field in self.FIELDS}
+            if self.ndjson:
+                self._file.write(json.dumps(record) + "\n")
+            else:
+                separator = "," if self.count else ""
+                self._file.write(separator + "\n    " + json.dumps(record, indent=4).replace("\n", "\n    "))
+            self.count += 1
+
+    def __exit__(self, *exc_info):
+        if not self.ndjson:
+            self._file.write("\n]" if self.count else "]")
+        self._file.close()
+
+
+def default_workers(path):
+    try:
+        large = os.path.getsize(path) >= PARALLEL_MIN_BYTES
+    except OSError:
+        large = False
+    return (os.cpu_count() or 1) if large else 1
+
+
+def ingest(csv_path, collection=None, export_path=None, workers=None, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Stream inventory.csv into MongoDB: rows are read and hashed chunk by chunk and each chunk
+    is written as one bulk write of upserts. A product seen before gets the row as a new
+    batch; a row imported before is skipped. With collection=None nothing is written to the
+    database; export_path additionally writes the items to a JSON or NDJSON file.
+    Returns {status: count} over all rows.
+    """
+    if workers is None:
+        workers = default_workers(csv_path)
+    counts = {}
+    rows = 0
+    start_time = perf_counter()
+    with CatalogExport(export_path) if export_path else nullcontext() as export:
+        for items in iter_catalog_chunks(iter_csv_rows(csv_path), workers, chunk_size):
+            rows += len(items)
+            if export:
+                export.write(items)
+            if collection is not None:
+                for outcome in write_products(collection, items, key_field="RowHash"):
+                    counts[outcome["Status"]] = counts.get(outcome["Status"], 0) + 1
+
+    seconds = perf_counter() - start_time
+    print(
+        f"Ingested {rows} rows from {csv_path} in {seconds:.2f} seconds "
+        f"({rows / seconds if seconds else 0:.0f} rows/s, {workers} hashing worker(s))"
+    )
+    if counts:
+        print("Products: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    if export:
+        print(f"JSON file '{export_path}' generated successfully!")
+    return counts
+
+
+def backfill_row_hashes(collection, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Give the batches loaded from products.json before they carried a RowHash the RowHash of
+    their row, so ingesting the same CSV afterwards skips those rows instead of adding their
+    quantity a second time. Batches from recognized images (ImageHash) are left alone.
+    Returns the number of products updated.
+    """
+    query = {"Batches": {"$elemMatch": {"RowHash": {"$exists": False}, "ImageHash": {"$exists": False}}}}
+    updated = 0
+    operations = []
+    for product in collection.find(query, {"_id": 1, "Product": 1, "Brand": 1, "Batches": 1}):
+        batches = [
+            batch if "RowHash" in batch or "ImageHash" in batch else {**batch, "RowHash": row_hash(
+                product["Product"], product["Brand"], batch["Quantity"], batch["PurchaseTime"], batch["ExpirationTime"],
+            )}
+            for batch in product["Batches"]
+        ]
+        # Matching the old array keeps a batch added in the meantime from being overwritten
+        operations.append(UpdateOne({"_id": product["_id"], "Batches": product["Batches"]}, {"$set": {"Batches": batches}}))
+        if len(operations) >= chunk_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+    print(f"Added row hashes to the batches of {updated} products")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import inventory.csv straight into MongoDB.")
+    parser.add_argument("csv_file", nargs="?", default="inventory.csv")
+    parser.add_argument("--export", metavar="PATH", help="also write the rows to a .json (array) or .ndjson file")
+    parser.add_argument("--no-db", action="store_true", help="only export, don't write to MongoDB")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"hashing processes (default: all cores for files over {PARALLEL_MIN_BYTES // 2 ** 20} MB, else 1)")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE, help="rows per bulk write")
+    parser.add_argument("--backfill-row-hashes", action="store_true",
+                        help="first add RowHash to batches loaded by an older create_db_with_json.py")
+    args = parser.parse_args()
+    if args.no_db and not args.export:
+        parser.error("--no-db needs --export")
+    if args.no_db and args.backfill_row_hashes:
+        parser.error("--backfill-row-hashes writes to MongoDB and cannot be combined with --no-db")
+
+    collection = None
+    if not args.no_db:
+        collection = LazyCollection(collection_name)
+        if args.backfill_row_hashes:
+            backfill_row_hashes(collection, args.chunk_size)
+    ingest(args.csv_file, collection, args.export, args.workers, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,521 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from PIL import Image
 from time import time
-from pymongo import MongoClient
 import hashlib
-from datetime import datetime, timedelta
+import io
 import os
+import argparse
+from itertools import islice
+from contextlib import nullcontext
+
+from answer_parsing import parse_structured_answer, parse_quantity
+from result_cache import ResultCache, file_sha256
+from embedding_store import EmbeddingStore
+from image_prefetch import ImagePrefetcher, load_image
+from image_ledger import IMAGE_EXTENSIONS, ImageLedger
+from product_index import ProductIndex
+from tiling import DEFAULT_TILE_SIZE, DEFAULT_OVERLAP, make_tiles, merge_tile_answers
+from precision import FULL_PRECISION, PRECISIONS
+from mongo_connection import LazyCollection
+from product_writes import (
+    WRITE_CHUNK_SIZE, WRITTEN_STATUSES, generate_hash_id, iter_chunks, write_products, written_products,
+)
+from inference_backend import BACKENDS, TRANSFORMERS_BACKEND, create_backend, default_backend_name
+
+# Extraction modes: one structured prompt per image, or the original three questions
+STRUCTURED_EXTRACTION = "structured"
+QUESTION_EXTRACTION = "questions"
+
+STRUCTURED_PROMPT = (
+    "Describe the product in the picture as JSON with the keys "
+    "\"Product\" (product type), \"Brand\" (brand name) and \"Quantity\" (number of items). "
+    "Answer with the JSON object only."
+)
+PRODUCT_TYPE_QUESTION = "Fill in the blank - Product Type in the picture is  _______."
+BRAND_QUESTION = "Fill in the blank - Product brand name in the picture is  _______."
+QUANTITY_QUESTION = "Fill in the blank - Number of {brand} in the picture is  _______."
+
+# Stage names used when timing answer_question calls (the quantity question is formatted per brand)
+QUESTION_STAGES = {
+    STRUCTURED_PROMPT: "answer_structured",
+    PRODUCT_TYPE_QUESTION: "answer_product_type",
+    BRAND_QUESTION: "answer_brand",
+}
+QUANTITY_STAGE = "answer_quantity"
+
+# Generation budget per prompt: (max new tokens, stop sequences). Short answers stop at the
+# first newline instead of running to the model's default 256-token limit.
+GENERATION_BUDGETS = {
+    "answer_structured": (64, ("}", "\"}", "\n\n")),
+    "answer_product_type": (16, ("\n", "\n\n")),
+    "answer_brand": (16, ("\n", "\n\n")),
+    QUANTITY_STAGE: (8, ("\n", "\n\n", ".")),
+}
+
+# Identifies the current prompts so cached answers to older prompts aren't reused
+PROMPT_VERSION = hashlib.sha256(
+    "|".join([STRUCTURED_PROMPT, PRODUCT_TYPE_QUESTION, BRAND_QUESTION, QUANTITY_QUESTION]).encode()
+).hexdigest()[:12]
+
+
+def list_image_files(inventory_folder):
+    folder_dir = os.path.join(os.curdir, inventory_folder)
+    return [
+        os.path.join(inventory_folder, image_file)
+        for image_file in os.listdir(folder_dir)
+        if image_file.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
 
 class ProductImageProcessor:
-    def __init__(self, model_id, revision, inventory_folder="inventory_images"):
+    def __init__(self, model_id, revision, inventory_folder="inventory_images", batch_size=1,
+                 extraction_mode=STRUCTURED_EXTRACTION, result_cache=None, embedding_store=None,
+                 prefetch_workers=2, precision=FULL_PRECISION, stage_timer=None, product_index=None,
+                 backend=None):
         self.model_id = model_id
         self.revision = revision
         self.inventory_folder = inventory_folder
-        self.tokenizer = AutoTokenizer.from_pretrained(model_id, revision=revision)
-        self.model = AutoModelForCausalLM.from_pretrained(model_id, trust_remote_code=True, revision=revision)
+        # Number of images encoded per vision-encoder forward pass
+        self.batch_size = batch_size
+        self.extraction_mode = extraction_mode
+        # Optional ResultCache; hits skip the model entirely
+        self.result_cache = result_cache
+        # Optional EmbeddingStore; hits skip the vision encoder
+        self.embedding_store = embedding_store
+        # Optional ProductIndex; a near match to a known product only needs the quantity question
+        self.product_index = product_index
+        # Threads decoding upcoming images while the model works (0 decodes inline)
+        self.prefetch_workers = prefetch_workers
+        # Optional StageTimer collecting per-stage timings for benchmark.py
+        self.stage_timer = stage_timer
+        # Quantity answers seen and how many of them had no recognizable count
+        self.quantity_answers = 0
+        self.quantity_parse_failures = 0
+        # "transformers", "onnx" or "stub" (see inference_backend.py), or a backend object;
+        # defaults to the INFERENCE_BACKEND variable
+        if backend is None or isinstance(backend, str):
+            backend = create_backend(backend or default_backend_name(), model_id, revision, precision)
+        self.backend = backend
+        # fp32, bf16 or int8 as actually loaded; see precision_check.py
+        self.precision = backend.precision
+        # The transformers model and tokenizer (None for backends without them)
+        self.model = getattr(backend, "model", None)
+        self.tokenizer = getattr(backend, "tokenizer", None)
 
-    def process_images(self):
-        folder_dir = os.path.join(os.curdir, self.inventory_folder)
-        results = []
-        for image_file in os.listdir(folder_dir):
-            if image_file.lower().endswith((".png", ".jpg", ".jpeg")):
-                image_path = os.path.join(self.inventory_folder, image_file)
+    def list_images(self, inventory_folder=None):
+        return list_image_files(inventory_folder or self.inventory_folder)
+
+    def process_images(self, inventory_folder=None, batch_size=None):
+        # The folder is a per-call argument so one loaded model can serve many folders
+        return [
+            response
+            for _, response in self.iter_process_images(inventory_folder, batch_size)
+            if response
+        ]
+
+    def iter_process_images(self, inventory_folder=None, batch_size=None, image_paths=None):
+        """
+        Generator variant of process_images: yields (image_path, response) as soon as each
+        image is done, so callers can write to the database and report progress while the
+        rest of the folder is still being processed. response is None for failed images.
+        image_paths restricts the run to those files instead of the whole folder.
+        """
+        batch_size = batch_size or self.batch_size
+        if image_paths is None:
+            image_paths = self.list_images(inventory_folder)
+        cache_stats = self.result_cache.stats() if self.result_cache else None
+        embedding_stats = self.embedding_store.stats() if self.embedding_store else None
+        index_stats = self.product_index.stats() if self.product_index else None
+        parse_stats = self.parse_stats()
+        recognized = 0
+        # Decode and downscale upcoming images in the background while the model is busy
+        images = iter(ImagePrefetcher(
+            image_paths, workers=self.prefetch_workers, depth=max(2 * batch_size, 4), stage_timer=self.stage_timer
+        ))
+        if batch_size <= 1:
+            for image_path, image, error in images:
                 print(f"Processing image: {image_path}")
-                response = self._process_image(image_path)
-                if response:
-                    results.append(response)
+                if error:
+                    print(f"Error processing image {image_path}: {error}")
+                    response = None
+                else:
+                    response = self._process_image(image_path, image)
+                recognized += bool(response)
+                yield image_path, response
+        else:
+            while True:
+                batch = list(islice(images, batch_size))
+                if not batch:
+                    break
+                for image_path, response in self._process_batch(batch):
+                    recognized += bool(response)
+                    yield image_path, response
+
+        print(f"Processed {len(image_paths)} images, recognized {recognized} products")
+        current = self.parse_stats()
+        answers = current["quantity_answers"] - parse_stats["quantity_answers"]
+        if answers:
+            failures = current["quantity_parse_failures"] - parse_stats["quantity_parse_failures"]
+            print(f"Quantity answers: {answers}, unparseable: {failures} ({failures / answers:.0%})")
+        if cache_stats:
+            # Report this run's share of the cache counters
+            current = self.result_cache.stats()
+            print(
+                f"Result cache: {current['hits'] - cache_stats['hits']} hits "
+                f"({current['near_hits'] - cache_stats['near_hits']} near-duplicate), "
+                f"{current['misses'] - cache_stats['misses']} misses"
+            )
+        if embedding_stats:
+            current = self.embedding_store.stats()
+            print(
+                f"Embedding store: {current['hits'] - embedding_stats['hits']} hits, "
+                f"{current['misses'] - embedding_stats['misses']} misses"
+            )
+        if index_stats:
+            current = self.product_index.stats()
+            print(
+                f"Product index: {current['hits'] - index_stats['hits']} known products, "
+                f"{current['misses'] - index_stats['misses']} new"
+            )
+
+    def iter_process_shelf_images(self, inventory_folder=None, image_paths=None,
+                                  tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP):
+        """
+        Multi-product mode for shelf-wide photos: each image is cut into overlapping tiles,
+        the tiles are encoded as one batch and described one by one, and the per-tile answers
+        are merged into one record per product. Yields (image_path, [response, ...]).
+        """
+        if image_paths is None:
+            image_paths = self.list_images(inventory_folder)
+        # Tiles are cut from the full-resolution image, so it isn't downscaled on load
+        images = ImagePrefetcher(image_paths, workers=self.prefetch_workers, max_size=None, stage_timer=self.stage_timer)
+        for image_path, image, error in images:
+            print(f"Processing shelf image: {image_path}")
+            if error:
+                print(f"Error processing image {image_path}: {error}")
+                yield image_path, []
+                continue
+            yield image_path, self._process_shelf_image(image_path, image, tile_size, overlap)
+
+    def _process_shelf_image(self, image_path, image, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP):
+        tiles = make_tiles(image, tile_size, overlap)
+        try:
+            enc_tiles = self.encode_images([tile for _, tile in tiles], batch_size=len(tiles))
+        except Exception as e:
+            print(f"Error processing image {image_path}: {e}")
+            return []
+        tile_answers = []
+        for i, ((box, _), enc_tile) in enumerate(zip(tiles, enc_tiles)):
+            tile_answers.append((box, self._describe_image(
+                enc_tile, f"{image_path} (tile {i + 1}/{len(tiles)})", index_key=image_path,
+            )))
+        records = merge_tile_answers(tile_answers)
+        print(f"Found {len(records)} products in {len(tiles)} tiles of {image_path}")
+        return records
+
+    def encode_images(self, images, batch_size=None):
+        """
+        Encode PIL images with one vision-encoder forward pass per batch of batch_size images.
+        The encoder resizes every image to the same input size, so a batch only needs padding
+        in the sense that the last one may be shorter. Returns one embedding per image.
+        """
+        batch_size = batch_size or self.batch_size
+        embeddings = []
+        for i in range(0, len(images), batch_size):
+            batch = images[i:i + batch_size]
+            if len(batch) == 1:
+                with self._timed("encode_image"):
+                    embeddings.append(self.backend.encode_image(batch[0]))
+                continue
+            with self._timed("encode_image", len(batch)):
+                enc_images = self.backend.encode_image(batch)
+            # Keep the batch dimension so each slice can be passed to answer_question
+            embeddings.extend(enc_images[j:j + 1] for j in range(len(batch)))
+        return embeddings
+
+    def _process_batch(self, batch):
+        # batch holds prefetched (image_path, image, error) triples.
+        # Returns (image_path, response) pairs; response is None for failed images
+        results = []
+        keys = {}
+        encoded = {}
+        images = []
+        loaded_paths = []
+        for image_path, image, error in batch:
+            print(f"Processing image: {image_path}")
+            if error:
+                # Unreadable files are reported and left out of the batch
+                print(f"Error processing image {image_path}: {error}")
+                results.append((image_path, None))
+                continue
+            content_hash = self._content_hash(image_path)
+            cached, cache_key = self._cache_lookup(image_path, content_hash)
+            if cached:
+                results.append((image_path, cached))
+                continue
+            enc_image, embedding_key = self._embedding_lookup(image_path, content_hash)
+            keys[image_path] = (cache_key, embedding_key)
+            if enc_image is not None:
+                encoded[image_path] = enc_image
+                continue
+            images.append(image)
+            loaded_paths.append(image_path)
+
+        enc_images = None
+        if images:
+            try:
+                enc_images = self.encode_images(images, batch_size=len(images))
+            except Exception as e:
+                # Fall back to one image at a time so a single bad image doesn't sink the batch
+                print(f"Batched encoding failed ({e}), encoding images one at a time")
+        if enc_images is not None:
+            for image_path, enc_image in zip(loaded_paths, enc_images):
+                encoded[image_path] = enc_image
+                self._embedding_save(keys[image_path][1], enc_image, image_path)
+
+        for image_path, (cache_key, embedding_key) in keys.items():
+            enc_image = encoded.get(image_path)
+            if enc_image is None:
+                try:
+                    image = images[loaded_paths.index(image_path)]
+                    enc_image = self._encode_image_file(image_path, embedding_key, image)
+                except Exception as e:
+                    print(f"Error processing image {image_path}: {e}")
+                    results.append((image_path, None))
+                    continue
+            response = self._describe_image(enc_image, image_path)
+            if response:
+                self._cache_store(cache_key, response, image_path)
+            results.append((image_path, response))
         return results
 
-    def _process_image(self, image_path):
+    def _process_image(self, image_path, image=None):
+        content_hash = self._content_hash(image_path)
+        cached, cache_key = self._cache_lookup(image_path, content_hash)
+        if cached:
+            return cached
+        response = self._run_model(image_path, content_hash, image)
+        if response:
+            self._cache_store(cache_key, response, image_path)
+        return response
+
+    def process_image_data(self, data, name="upload"):
+        """
+        Recognize an image held in memory (e.g. an upload) without writing it to disk.
+        Returns (content_hash, response); the hash keys the result cache and embedding store
+        the same way as a file with these bytes, and a cache hit skips decoding entirely.
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        cached, cache_key = self._cache_lookup(name, content_hash)
+        if cached:
+            return content_hash, cached
         try:
-            image = Image.open(image_path)
-            enc_image = self.model.encode_image(image)
+            with self._timed("decode"):
+                image = load_image(io.BytesIO(data))
+        except Exception as e:
+            print(f"Error processing image {name}: {e}")
+            return content_hash, None
+        # New products are staged in the product index under the content hash; see ProductIndex.commit
+        response = self._run_model(name, content_hash, image, index_key=content_hash)
+        if response:
+            self._cache_store(cache_key, response, name)
+        return content_hash, response
 
-            product_type = self._answer_question(
-                enc_image,
-                "Fill in the blank - Product Type in the picture is  _______."
-            )
-            product_brand = self._answer_question(
-                enc_image,
-                "Fill in the blank - Product brand name in the picture is  _______."
+    def _run_model(self, image_path, content_hash=None, image=None, index_key=None):
+        enc_image, embedding_key = self._embedding_lookup(image_path, content_hash)
+        try:
+            if enc_image is None:
+                enc_image = self._encode_image_file(image_path, embedding_key, image)
+        except Exception as e:
+            print(f"Error processing image {image_path}: {e}")
+            return None
+        return self._describe_image(enc_image, image_path, index_key)
+
+    def _encode_image_file(self, image_path, embedding_key=None, image=None):
+        if image is None:
+            with self._timed("decode"):
+                image = load_image(image_path)
+        with self._timed("encode_image"):
+            enc_image = self.backend.encode_image(image)
+        self._embedding_save(embedding_key, enc_image, image_path)
+        return enc_image
+
+    def _content_hash(self, image_path):
+        # Hashed once per image and shared by the result cache and the embedding store
+        if not self.result_cache and not self.embedding_store:
+            return None
+        try:
+            return file_sha256(image_path)
+        except OSError as e:
+            print(f"Could not hash {image_path}: {e}")
+            return None
+
+    def _model_revision(self):
+        # Answers and embeddings from a reduced-precision model or another backend are kept
+        # apart from those of the fp32 transformers model
+        revision = self.revision
+        if self.backend.name != TRANSFORMERS_BACKEND:
+            revision = f"{revision}+{self.backend.name}"
+        if self.precision != FULL_PRECISION:
+            revision = f"{revision}+{self.precision}"
+        return revision
+
+    def _cache_namespace(self):
+        # Prompt changes get their own namespace; the embedding store still skips the encoder
+        return ResultCache.namespace(self.model_id, self._model_revision(), f"{self.extraction_mode}:{PROMPT_VERSION}")
+
+    def _cache_lookup(self, image_path, content_hash=None):
+        if not self.result_cache or content_hash is None:
+            return None, None
+        try:
+            cached, cache_key = self.result_cache.get(image_path, self._cache_namespace(), content_hash)
+        except OSError as e:
+            print(f"Result cache lookup failed for {image_path}: {e}")
+            return None, None
+        if cached:
+            print(f"Cache hit: {cached}")
+        return cached, cache_key
+
+    def _cache_store(self, cache_key, response, image_path):
+        if not self.result_cache or cache_key is None:
+            return
+        try:
+            self.result_cache.put(cache_key, response, image_path, self._cache_namespace())
+        except OSError as e:
+            print(f"Could not cache result for {image_path}: {e}")
+
+    def _embedding_lookup(self, image_path, content_hash=None):
+        if not self.embedding_store or content_hash is None:
+            return None, None
+        return self.embedding_store.get(
+            image_path, self.model_id, self._model_revision(), content_hash, dtype=self.backend.dtype
+        )
+
+    def _embedding_save(self, embedding_key, enc_image, image_path):
+        if not self.embedding_store or embedding_key is None:
+            return
+        try:
+            self.embedding_store.put(embedding_key, enc_image)
+        except OSError as e:
+            print(f"Could not store embedding for {image_path}: {e}")
+
+    def _describe_image(self, enc_image, image_path, index_key=None):
+        match, vector = self._index_lookup(enc_image, image_path)
+        if match:
+            response = self._ask_quantity(enc_image, match, image_path)
+            if response:
+                return response
+        if self.extraction_mode == STRUCTURED_EXTRACTION:
+            response = self._extract_structured(enc_image, image_path)
+        else:
+            response = None
+        if not response:
+            response = self._ask_questions(enc_image, image_path)
+        if response and vector is not None and not match:
+            # New product (or a new look of one): once it is written, later images of it skip generation
+            self.product_index.stage(
+                index_key or image_path, vector, response["Product"], response["Brand"], self._index_namespace()
             )
+        return response
+
+    def _index_namespace(self):
+        return ProductIndex.namespace(self.model_id, self._model_revision())
+
+    def _index_lookup(self, enc_image, image_path):
+        if not self.product_index:
+            return None, None
+        try:
+            match, vector = self.product_index.search(enc_image, self._index_namespace())
+        except (ValueError, OSError) as e:
+            print(f"Product index lookup failed for {image_path}: {e}")
+            return None, None
+        if match:
+            print(f"Known product {match['Product']} ({match['Brand']}), similarity {match['similarity']:.3f}")
+        return match, vector
+
+    def _ask_quantity(self, enc_image, match, image_path):
+        # Product and brand come from the index; only the count is generated
+        try:
+            product_quantity = self._answer_question(enc_image, QUANTITY_QUESTION.format(brand=match["Brand"]))
+        except Exception as e:
+            print(f"Error processing image {image_path}: {e}")
+            return None
+        quantity = self._parse_quantity(product_quantity, image_path)
+        if quantity is None:
+            return None
+        response = {
+            "Product": match["Product"],
+            "Brand": match["Brand"],
+            "Quantity": quantity,
+        }
+        print(response)
+        return response
+
+    def _extract_structured(self, enc_image, image_path):
+        # One generation instead of three; None means the caller should fall back
+        try:
+            answer = self._answer_question(enc_image, STRUCTURED_PROMPT)
+        except Exception as e:
+            print(f"Error processing image {image_path}: {e}")
+            return None
+        response = parse_structured_answer(answer)
+        if response is None:
+            print(f"Could not parse structured answer for {image_path}: {answer!r}, asking separate questions")
+            return None
+        print(response)
+        return response
+
+    def _ask_questions(self, enc_image, image_path):
+        try:
+            product_type = self._answer_question(enc_image, PRODUCT_TYPE_QUESTION)
+            product_brand = self._answer_question(enc_image, BRAND_QUESTION)
             product_quantity = self._answer_question(
-                enc_image,
-                f"Fill in the blank - Number of {product_brand} in the picture is  _______."
+                enc_image, QUANTITY_QUESTION.format(brand=product_brand)
             )
-
-            response = {
-                "Product": product_type,
-                "Brand": product_brand,
-                "Quantity": int(product_quantity),
-            }
-            print(response)
-            return response
         except Exception as e:
             print(f"Error processing image {image_path}: {e}")
             return None
 
+        quantity = self._parse_quantity(product_quantity, image_path)
+        if quantity is None:
+            return None
+        response = {
+            "Product": product_type,
+            "Brand": product_brand,
+            "Quantity": quantity,
+        }
+        print(response)
+        return response
+
+    def _parse_quantity(self, answer, image_path):
+        self.quantity_answers += 1
+        quantity = parse_quantity(answer)
+        if quantity is None:
+            self.quantity_parse_failures += 1
+            print(f"Could not parse quantity for {image_path}: {answer!r}")
+        return quantity
+
+    def parse_stats(self):
+        return {
+            "quantity_answers": self.quantity_answers,
+            "quantity_parse_failures": self.quantity_parse_failures,
+        }
+
     def _answer_question(self, enc_image, question):
-        return self.model.answer_question(enc_image, question, self.tokenizer)
+        stage = QUESTION_STAGES.get(question, QUANTITY_STAGE)
+        max_new_tokens, stop_sequences = GENERATION_BUDGETS[stage]
+        with self._timed(stage):
+            return self.backend.answer_question(
+                enc_image, question, max_new_tokens=max_new_tokens, stop_sequences=stop_sequences,
+            )
 
-# MongoDB Functions
-client = MongoClient("mongodb://localhost:27017/")
-db = client["inventory_db"]
-collection = db["products"]
+    def _timed(self, stage, items=1):
+        if self.stage_timer is None:
+            return nullcontext()
+        return self.stage_timer.measure(stage, items)
 
-def generate_hash_id(product, brand):
-    unique_string = f"{product}{brand}"
-    return hashlib.sha256(unique_string.encode()).hexdigest()
+# MongoDB Functions
+collection = LazyCollection("products")
+# Images already written to the inventory, keyed by content hash
+ledger_collection = LazyCollection("processed_images")
 
 # def insert_product(product, brand, quantity, purchase_time, expiration_time):
 #     hash_id = generate_hash_id(product, brand)
@@ -80,63 +530,143 @@ def generate_hash_id(product, brand):
 #     collection.insert_one(product_data)
 #     print(f"Inserted product: {product_data}")
 
-def insert_update_product(product, brand, quantity, purchase_time, expiration_time):
-    hash_id = generate_hash_id(product, brand)
-    
-    # Create the new batch entry
-    new_batch = {
-        "Quantity": quantity,
-        "PurchaseTime": purchase_time,
-        "ExpirationTime": expiration_time,
-    }
-
-    # Check if the HashID already exists
-    existing_product = collection.find_one({"HashID": hash_id})
-    if existing_product:
-        # Add the new batch and update the total quantity
-        collection.update_one(
-            {"HashID": hash_id},
-            {
-                "$push": {"Batches": new_batch},
-                "$inc": {"Quantity": quantity}
-            }
-        )
-        print(f"Updated product: {product} | Added new batch: {new_batch} | Updated TotalQuantity: {existing_product['Quantity'] + quantity}")
-    else:
-        # Insert a new product record
-        product_data = {
-            "HashID": hash_id,
-            "Product": product,
-            "Brand": brand,
-            "Quantity": quantity,
-            "Batches": [new_batch],
-        }
-        collection.insert_one(product_data)
-        print(f"Inserted new product: {product_data}")
+def _write_item(response, image_hash=None, image_path=None):
+    item = {"Product": response["Product"], "Brand": response["Brand"], "Quantity": response["Quantity"]}
+    if image_hash:
+        item["ImageHash"] = image_hash
+    if image_path:
+        item["ImagePath"] = image_path
+    return item
+
+def insert_update_product(product, brand, quantity, purchase_time, expiration_time, image_hash=None):
+    """
+    Add a batch to a product, creating the product on first sight, in one upsert round trip.
+    With image_hash, writing the same image again is a no-op. Returns the write outcome.
+    """
+    item = _write_item({"Product": product, "Brand": brand, "Quantity": quantity}, image_hash)
+    return write_products(collection, [item], purchase_time, expiration_time)[0]
+
+
+def insert_update_products(responses, purchase_time, expiration_time, image_hash=None):
+    """insert_update_product for every product found in one photo, sent as a single bulk write."""
+    items = [_write_item(response, image_hash) for response in responses]
+    return write_products(collection, items, purchase_time, expiration_time)
+
+
+def store_response(response, image_hash=None):
+    """
+    Write one recognition result: a single product, or a list of products from a shelf photo.
+    With image_hash the write is idempotent, so storing the same image again adds nothing.
+    Returns the outcome of each product written.
+    """
+    if not response:
+        return []
+    responses = response if isinstance(response, list) else [response]
+    return write_products(collection, [_write_item(item, image_hash) for item in responses])
+
+
+def write_results(results, ledger=None, target=None, product_index=None):
+    """
+    Write a chunk of (image_path, response) pairs with one bulk write; shelf photos contribute
+    one item per product. With a ledger the images are then recorded as processed, also in one
+    bulk write; an image with a failed write is left out so the next run tries it again.
+    With a product_index, the products staged for each image are added once they are written.
+    Returns {image_path: [outcome, ...]} (empty for unrecognized images).
+    """
+    items = []
+    for image_path, response in results:
+        image_hash = ledger.content_hash(image_path) if ledger else None
+        responses = response if isinstance(response, list) else [response] if response else []
+        items.extend(_write_item(item, image_hash, image_path) for item in responses)
+
+    outcomes = {image_path: [] for image_path, _ in results}
+    for outcome in write_products(collection if target is None else target, items):
+        outcomes[outcome["ImagePath"]].append(outcome)
+    if ledger:
+        ledger.record_many([
+            (image_path, response) for image_path, response in results
+            if all(outcome["Status"] in WRITTEN_STATUSES for outcome in outcomes[image_path])
+        ])
+    if product_index:
+        for image_path, image_outcomes in outcomes.items():
+            product_index.commit(image_path, written_products(image_outcomes))
+    return outcomes
+
+
+def store_results(results, ledger=None, chunk_size=WRITE_CHUNK_SIZE, product_index=None):
+    """
+    DB write stage: results are written in chunks (WRITE_CHUNK_SIZE results, or whatever
+    arrived within WRITE_MAX_WAIT_SECONDS) with one bulk write each and then passed on, so
+    rows land in the inventory while later images are still being recognized.
+    With a ledger, each image is marked as processed only after its batch is written, and
+    with a product_index its new products are added to the index at the same point.
+    """
+    for chunk in iter_chunks(results, chunk_size):
+        write_results(chunk, ledger, product_index=product_index)
+        yield from chunk
 
 
 # Main Function
-def main():
+def main(workers=1, threads_per_worker=None, full=False, retry_failed=False, precision=FULL_PRECISION, tiled=False,
+         backend=None):
     start_time = time()
     
     model_id = "vikhyatk/moondream2"
     revision = "2024-08-26"
+    inventory_folder = "inventory_images"
 
-    processor = ProductImageProcessor(model_id, revision)
-    responses = processor.process_images()
+    if full:
+        ledger = None
+        image_paths = list_image_files(inventory_folder)
+    else:
+        # Only images that are new or changed since the last run go to the model
+        ledger = ImageLedger(ledger_collection)
+        image_paths = ledger.scan(inventory_folder, retry_failed=retry_failed)
+
+    product_index = None
+    if workers == 1 or tiled:
+        # Re-photographed shelves are answered from the on-disk result cache, and
+        # re-processing with new prompts reuses the stored image embeddings
+        product_index = ProductIndex()
+        processor = ProductImageProcessor(
+            model_id, revision, result_cache=ResultCache(), embedding_store=EmbeddingStore(),
+            precision=precision, product_index=product_index, backend=backend,
+        )
+        if tiled:
+            # Shelf photos: several products per image
+            results = processor.iter_process_shelf_images(image_paths=image_paths)
+        else:
+            results = processor.iter_process_images(image_paths=image_paths)
+    else:
+        # Imported here because worker_pool itself imports this module
+        from worker_pool import iter_process_images_parallel
+
+        # workers=None picks workers x threads for this host
+        results = iter_process_images_parallel(
+            image_paths, workers, threads_per_worker,
+            model_id=model_id, revision=revision, precision=precision, backend=backend,
+        )
 
-    for response in responses:
-        product = response["Product"]
-        brand = response["Brand"]
-        quantity = response["Quantity"]
-        purchase_time = datetime.now().strftime("%Y-%m-%d")
-        expiration_time = (datetime.now() + timedelta(days=730)).strftime("%Y-%m-%d")
-        
-        insert_update_product(product, brand, quantity, purchase_time, expiration_time)
+    # Results stream straight into the database; nothing is collected in memory
+    for image_path, response in store_results(results, ledger, product_index=product_index):
+        if not response:
+            print(f"No product recognized in {image_path}")
 
     end_time = time()
     execution_time = end_time - start_time
     print(f"Execution time: {execution_time:.2f} seconds")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Recognize products in inventory_images and update the database.")
+    parser.add_argument("--workers", default="1", help="number of worker processes, or 'auto' to size for this host")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads per worker process")
+    parser.add_argument("--full", action="store_true", help="process every image, ignoring the processed-image ledger")
+    parser.add_argument("--retry-failed", action="store_true", help="process again images where no product was recognized")
+    parser.add_argument("--precision", choices=PRECISIONS, default=FULL_PRECISION, help="model precision on CPU")
+    parser.add_argument("--tiled", action="store_true", help="shelf photos: find several products per image (single process)")
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="inference backend (default: INFERENCE_BACKEND or transformers)")
+    args = parser.parse_args()
+    main(
+        None if args.workers == "auto" else int(args.workers), args.threads, args.full, args.retry_failed,
+        args.precision, args.tiled, args.backend,
+    )
@@ -0,0 +1,146 @@
+import base64
+import json
+
+from batch_dates import start_of_today, to_datetime
+from mongo_connection import ensure_index
+
+# Products per page, and the most a client may ask for
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Fields a page can be sorted by; HashID breaks ties so every product has a unique position
+SORT_FIELDS = ("HashID", "Product", "Brand", "Quantity")
+DEFAULT_SORT = "HashID"
+
+# Batches grows with every purchase, so lists leave it out unless asked for
+LIST_PROJECTION = {"_id": 0, "Batches": 0}
+BATCHES_PROJECTION = {"_id": 0}
+
+# Products without a Batches array (loaded before batches existed) count as no batches
+_BATCHES = {"$ifNull": ["$Batches", []]}
+
+
+class PageRequestError(ValueError):
+    """Invalid page parameters from a request."""
+
+
+def ensure_sort_indexes(collection):
+    """
+    One (field, HashID) index per sort field, created once per collection, so a page is read
+    by walking an index from the cursor position instead of sorting the whole collection.
+    Descending pages walk the same indexes backwards. Pages are still correct without them,
+    just slower on a large catalog.
+    """
+    for field in SORT_FIELDS:
+        if field != "HashID":
+            ensure_index(collection, [(field, 1), ("HashID", 1)])
+
+
+def encode_cursor(product, sort=DEFAULT_SORT):
+    """Opaque position of a product in a page order: its sort value and HashID."""
+    position = [product.get(sort), product["HashID"]]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        value, hash_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise PageRequestError(f"Invalid cursor {cursor!r}") from e
+    return value, hash_id
+
+
+def summary_projection(today=None):
+    """
+    $project stage computing a product's batch summary inside MongoDB: earliest expiration,
+    latest purchase, batch count and live quantity (batches not expired by today), with the
+    Batches array itself left out. Products from before batches fall back to their own dates.
+    """
+    today = to_datetime(today) if today else start_of_today()
+    return {
+        "_id": 0,
+        "HashID": 1,
+        "Product": 1,
+        "Brand": 1,
+        "Quantity": 1,
+        "EarliestExpiration": {"$ifNull": [{"$min": "$Batches.ExpirationTime"}, "$ExpirationTime"]},
+        "LatestPurchase": {"$ifNull": [{"$max": "$Batches.PurchaseTime"}, "$PurchaseTime"]},
+        "BatchCount": {"$size": _BATCHES},
+        "LiveQuantity": {"$cond": [
+            {"$isArray": "$Batches"},
+            {"$sum": {"$map": {
+                "input": {"$filter": {
+                    "input": "$Batches", "as": "batch", "cond": {"$gte": ["$$batch.ExpirationTime", today]},
+                }},
+                "as": "batch",
+                "in": "$$batch.Quantity",
+            }}},
+            {"$cond": [{"$gte": ["$ExpirationTime", today]}, "$Quantity", 0]},
+        ]},
+    }
+
+
+def fetch_page(collection, sort=DEFAULT_SORT, descending=False, after=None, limit=DEFAULT_PAGE_SIZE, batches=False,
+               summary=False, today=None):
+    """
+    One page of products in (sort, HashID) order, starting after the cursor of the previous
+    page. The query seeks straight to the cursor position, so every page costs the same however
+    deep it is, and only limit + 1 documents are read (the extra one tells whether there is a
+    next page). Batches are only included with batches=True; summary=True instead runs the page
+    through an aggregation that returns the summary fields of summary_projection.
+    Returns (products, next_cursor), next_cursor being None on the last page.
+    """
+    if sort not in SORT_FIELDS:
+        raise PageRequestError(f"Cannot sort by {sort!r}, expected one of {', '.join(SORT_FIELDS)}")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise PageRequestError(f"Page size must be between 1 and {MAX_PAGE_SIZE}")
+
+    direction = -1 if descending else 1
+    compare = "$lt" if descending else "$gt"
+    query = {}
+    if after:
+        value, hash_id = decode_cursor(after)
+        if sort == "HashID":
+            query = {"HashID": {compare: hash_id}}
+        else:
+            query = {"$or": [{sort: {compare: value}}, {sort: value, "HashID": {compare: hash_id}}]}
+    order = [("HashID", direction)] if sort == "HashID" else [(sort, direction), ("HashID", direction)]
+
+    ensure_sort_indexes(collection)
+    if summary:
+        # Match, sort and limit come first so the page is still read from the index, and only
+        # its documents are summarized
+        products = list(collection.aggregate([
+            {"$match": query},
+            {"$sort": dict(order)},
+            {"$limit": limit + 1},
+            {"$project": summary_projection(today)},
+        ]))
+    else:
+        projection = BATCHES_PROJECTION if batches else LIST_PROJECTION
+        products = list(collection.find(query, projection, sort=order, limit=limit + 1))
+    if len(products) <= limit:
+        return products, None
+    products = products[:limit]
+    return products, encode_cursor(products[-1], sort)
+
+
+def page_args(args):
+    """
+    fetch_page keyword arguments from request query parameters: sort, order (asc or desc),
+    after (cursor from the previous page), limit, batches=1 and summary=1.
+    """
+    order = args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        raise PageRequestError("order must be asc or desc")
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        raise PageRequestError("limit must be a number") from e
+    return {
+        "sort": args.get("sort", DEFAULT_SORT),
+        "descending": order == "desc",
+        "after": args.get("after") or None,
+        "limit": limit,
+        "batches": args.get("batches") in ("1", "true"),
+        "summary": args.get("summary") in ("1", "true"),
+    }
@@ -0,0 +1,299 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from time import time
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+DEFAULT_MAX_DEPTH = 16
+
+
+class JobQueueFull(Exception):
+    """Raised when the number of queued jobs has reached the configured depth."""
+
+
+class DuplicateJob(Exception):
+    """Raised when the same folder is already queued or running."""
+
+    def __init__(self, job_id):
+        super().__init__(f"Folder is already being processed by job {job_id}")
+        self.job_id = job_id
+
+
+def normalize_folder(folder):
+    return os.path.normcase(os.path.abspath(folder))
+
+
+class InMemoryJobStore:
+    """Jobs kept in this process only; they are lost on restart."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._order = []
+
+    def create(self, folder, max_depth):
+        key = normalize_folder(folder)
+        queued = 0
+        for job in self._jobs.values():
+            if job["status"] in ACTIVE_STATES and job["key"] == key:
+                raise DuplicateJob(job["id"])
+            queued += job["status"] == QUEUED
+        if queued >= max_depth:
+            raise JobQueueFull(f"{queued} jobs are already queued")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "folder": folder,
+            "key": key,
+            "status": QUEUED,
+            "created": time(),
+            "started": None,
+            "finished": None,
+            "total": None,
+            "error": None,
+            "images": [],
+        }
+        self._jobs[job["id"]] = job
+        self._order.append(job["id"])
+        return job["id"]
+
+    def claim_next(self):
+        for job_id in self._order:
+            job = self._jobs[job_id]
+            if job["status"] == QUEUED:
+                job["status"] = RUNNING
+                job["started"] = time()
+                return {"id": job_id, "folder": job["folder"]}
+        return None
+
+    def set_total(self, job_id, total):
+        self._jobs[job_id]["total"] = total
+
+    def record_image(self, job_id, image):
+        self._jobs[job_id]["images"].append(image)
+
+    def finish(self, job_id, error=None):
+        job = self._jobs[job_id]
+        job["status"] = FAILED if error else DONE
+        job["error"] = error
+        job["finished"] = time()
+
+    def get(self, job_id, since=0):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        status = {key: value for key, value in job.items() if key not in ("key", "images")}
+        status["done"] = len(job["images"])
+        status["images"] = job["images"][since:]
+        return status
+
+    def queued_count(self):
+        return sum(job["status"] == QUEUED for job in self._jobs.values())
+
+
+class SQLiteJobStore:
+    """
+    Jobs persisted in a local SQLite file, so queued work survives a restart.
+    Jobs that were running when the process died are queued again on startup.
+    """
+
+    def __init__(self, path="jobs.sqlite3"):
+        self.path = path
+        # One connection shared by the web and worker threads; JobQueue serializes access
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    folder_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    total INTEGER,
+                    error TEXT
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS job_images (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (job_id, seq)
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            # Recover jobs interrupted by a crash or restart
+            self._conn.execute("UPDATE jobs SET status = ?, started = NULL WHERE status = ?", (QUEUED, RUNNING))
+            self._conn.execute(
+                "DELETE FROM job_images WHERE job_id IN (SELECT id FROM jobs WHERE status = ?)", (QUEUED,)
+            )
+
+    def create(self, folder, max_depth):
+        key = normalize_folder(folder)
+        with self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE folder_key = ? AND status IN (?, ?)", (key, *ACTIVE_STATES)
+            ).fetchone()
+            if row:
+                raise DuplicateJob(row["id"])
+            queued = self.queued_count()
+            if queued >= max_depth:
+                raise JobQueueFull(f"{queued} jobs are already queued")
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, folder, folder_key, status, created) VALUES (?, ?, ?, ?, ?)",
+                (job_id, folder, key, QUEUED, time()),
+            )
+        return job_id
+
+    def claim_next(self):
+        with self._conn:
+            row = self._conn.execute(
+                "SELECT id, folder FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (RUNNING, time(), row["id"]))
+        return {"id": row["id"], "folder": row["folder"]}
+
+    def set_total(self, job_id, total):
+        with self._conn:
+            self._conn.execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+
+    def record_image(self, job_id, image):
+        with self._conn:
+            seq = self._conn.execute("SELECT COUNT(*) FROM job_images WHERE job_id = ?", (job_id,)).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO job_images (job_id, seq, data) VALUES (?, ?, ?)", (job_id, seq, json.dumps(image))
+            )
+
+    def finish(self, job_id, error=None):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                (FAILED if error else DONE, error, time(), job_id),
+            )
+
+    def get(self, job_id, since=0):
+        row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        status = {key: row[key] for key in row.keys() if key != "folder_key"}
+        status["done"] = self._conn.execute(
+            "SELECT COUNT(*) FROM job_images WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+        status["images"] = [
+            json.loads(image["data"])
+            for image in self._conn.execute(
+                "SELECT data FROM job_images WHERE job_id = ? AND seq >= ? ORDER BY seq", (job_id, since)
+            )
+        ]
+        return status
+
+    def queued_count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+
+class JobRecorder:
+    """Handed to the job function so it can report progress and per-image timings."""
+
+    def __init__(self, queue, job_id):
+        self._queue = queue
+        self.job_id = job_id
+
+    def set_total(self, total):
+        with self._queue._lock:
+            self._queue.store.set_total(self.job_id, total)
+
+    def image_done(self, image_path, seconds, product=None, error=None):
+        image = {"image": image_path, "seconds": round(seconds, 3), "product": product, "error": error}
+        with self._queue._lock:
+            self._queue.store.record_image(self.job_id, image)
+
+
+class JobQueue:
+    """
+    Bounded queue of folder-processing jobs drained by local worker threads. The threads share
+    the process's warm model, so no external broker or extra model copies are needed.
+    run_job(folder, recorder) does the actual work; an exception marks the job as failed.
+    Workers start with the first submitted job, or right away when the store already holds
+    queued jobs (such as the ones SQLiteJobStore requeues after a restart).
+    """
+
+    def __init__(self, run_job, store=None, workers=1, max_depth=DEFAULT_MAX_DEPTH):
+        self.run_job = run_job
+        self.store = store if store is not None else InMemoryJobStore()
+        self.workers = workers
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads = []
+        self._stopping = False
+        if self.store.queued_count():
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, folder):
+        """Queue a folder and return the job id; raises DuplicateJob or JobQueueFull."""
+        # Without pending jobs, workers start on first use so importing the app doesn't spawn threads
+        self.start()
+        with self._lock:
+            job_id = self.store.create(folder, self.max_depth)
+            self._wakeup.notify()
+        print(f"Queued job {job_id} for folder {folder}")
+        return job_id
+
+    def status(self, job_id, since=0):
+        with self._lock:
+            return self.store.get(job_id, since)
+
+    def depth(self):
+        with self._lock:
+            return self.store.queued_count()
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                job = self.store.claim_next()
+                while job is None and not self._stopping:
+                    self._wakeup.wait()
+                    job = self.store.claim_next()
+                if self._stopping and job is None:
+                    return
+
+            print(f"Running job {job['id']} for folder {job['folder']}")
+            error = None
+            try:
+                self.run_job(job["folder"], JobRecorder(self, job["id"]))
+            except Exception as e:
+                print(f"Job {job['id']} failed: {e}")
+                error = str(e)
+            with self._lock:
+                self.store.finish(job["id"], error)
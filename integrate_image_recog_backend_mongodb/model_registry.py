@@ -0,0 +1,57 @@
+import threading
+from time import time
+
+from precision import FULL_PRECISION
+
+# Default recognition model
+DEFAULT_MODEL_ID = "vikhyatk/moondream2"
+DEFAULT_REVISION = "2024-08-26"
+
+# One warm processor per (model_id, revision, precision, backend) for the whole process
+_processors = {}
+_lock = threading.Lock()
+
+
+def get_processor(model_id=DEFAULT_MODEL_ID, revision=DEFAULT_REVISION, **options):
+    """
+    Return the shared ProductImageProcessor for a model, loading it on first use.
+    Every caller gets the same instance, so the from_pretrained cost is paid once per process.
+    Extra options (batch_size, result_cache, ...) are passed to the constructor on first load;
+    each precision mode and inference backend gets its own instance.
+    """
+    # The ML stack (transformers, torch) is imported here, on first use, so a process that
+    # never recognizes an image (e.g. a read-only web replica) never pays for it
+    from inference_backend import default_backend_name
+
+    key = (model_id, revision, options.get("precision", FULL_PRECISION), options.get("backend") or default_backend_name())
+    processor = _processors.get(key)
+    if processor is None:
+        with _lock:
+            # Another thread may have finished loading while we waited
+            processor = _processors.get(key)
+            if processor is None:
+                from insert_update_from_image import ProductImageProcessor
+
+                print(f"Loading model {model_id} (revision {revision})...")
+                start_time = time()
+                processor = ProductImageProcessor(model_id, revision, **options)
+                print(f"Model loaded in {time() - start_time:.2f} seconds")
+                _processors[key] = processor
+    return processor
+
+
+def preload(model_id=DEFAULT_MODEL_ID, revision=DEFAULT_REVISION, **options):
+    """Eagerly load a model at startup so the first request doesn't pay for it."""
+    return get_processor(model_id, revision, **options)
+
+
+def is_loaded(model_id=DEFAULT_MODEL_ID, revision=DEFAULT_REVISION, precision=FULL_PRECISION, backend=None):
+    from inference_backend import default_backend_name
+
+    return (model_id, revision, precision, backend or default_backend_name()) in _processors
+
+
+def clear():
+    """Drop all loaded models (mainly for tests)."""
+    with _lock:
+        _processors.clear()
@@ -0,0 +1,116 @@
+import os
+import threading
+
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+
+# Connection settings; each can be overridden with the environment variable of the same name
+DEFAULT_MONGO_URI = "mongodb://localhost:27017/"
+DEFAULT_DATABASE = "inventory_db"
+# Connections per process; size it to the number of threads that talk to MongoDB at once
+DEFAULT_MAX_POOL_SIZE = 100
+DEFAULT_MIN_POOL_SIZE = 0
+# Fail fast when the server is down instead of waiting pymongo's default 20-30 seconds
+DEFAULT_CONNECT_TIMEOUT_MS = 5000
+DEFAULT_SERVER_SELECTION_TIMEOUT_MS = 5000
+# 0 means no timeout on socket reads
+DEFAULT_SOCKET_TIMEOUT_MS = 0
+# Wire compression, e.g. "zstd,snappy,zlib"; zstd and snappy need the zstandard and python-snappy
+# packages (pymongo warns and skips one that is missing). Off by default: on localhost it only costs CPU
+DEFAULT_COMPRESSORS = ""
+
+_client = None
+_lock = threading.Lock()
+# (collection, keys, options) of the indexes ensure_index has already created in this process
+_ensured_indexes = set()
+
+
+def client_options(environ=os.environ):
+    """Keyword arguments for the shared MongoClient, read from the environment."""
+    options = {
+        "host": environ.get("MONGO_URI", DEFAULT_MONGO_URI),
+        "maxPoolSize": int(environ.get("MONGO_MAX_POOL_SIZE", DEFAULT_MAX_POOL_SIZE)),
+        "minPoolSize": int(environ.get("MONGO_MIN_POOL_SIZE", DEFAULT_MIN_POOL_SIZE)),
+        "connectTimeoutMS": int(environ.get("MONGO_CONNECT_TIMEOUT_MS", DEFAULT_CONNECT_TIMEOUT_MS)),
+        "serverSelectionTimeoutMS": int(
+            environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", DEFAULT_SERVER_SELECTION_TIMEOUT_MS)
+        ),
+        "socketTimeoutMS": int(environ.get("MONGO_SOCKET_TIMEOUT_MS", DEFAULT_SOCKET_TIMEOUT_MS)) or None,
+        # No sockets or monitor threads until the first operation
+        "connect": False,
+    }
+    compressors = environ.get("MONGO_COMPRESSORS", DEFAULT_COMPRESSORS)
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+def get_client():
+    """The process's MongoClient, created on first use and shared by every module."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(**client_options())
+    return _client
+
+
+def get_database(name=None):
+    return get_client()[name or os.environ.get("MONGO_DATABASE", DEFAULT_DATABASE)]
+
+
+def ensure_index(collection, keys, **options):
+    """
+    collection.create_index(keys, **options), sent once per process for each collection and
+    index so hot paths can call it on every use. A failure (such as duplicates blocking a
+    unique index) is printed and returns False, and the next call tries again.
+    """
+    name = getattr(collection, "full_name", None)
+    key = (name, repr(keys), repr(sorted(options.items())))
+    if name is not None and key in _ensured_indexes:
+        return True
+    try:
+        collection.create_index(keys, **options)
+    except OperationFailure as e:
+        print(f"Could not create the index {keys!r} on {name}: {e}")
+        return False
+    if name is not None:
+        _ensured_indexes.add(key)
+    return True
+
+
+def _reset_after_fork():
+    # A client inherited from the parent shares its sockets and monitor state, which pymongo
+    # does not support; the child starts its own on first use. The lock may have been held
+    # by another thread at fork time, so it is replaced as well.
+    global _client, _lock
+    _client = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LazyCollection:
+    """
+    Module-level stand-in for a collection. Defining one opens no connection; each use is
+    forwarded to the collection of the current process's client, so a module imported
+    before a pre-forking server forks still gets a client of its own in every worker.
+    """
+
+    def __init__(self, name, database_name=None):
+        self.name = name
+        self.database_name = database_name
+
+    def resolve(self):
+        return get_database(self.database_name)[self.name]
+
+    def __getattr__(self, attribute):
+        # Only reached for attributes the proxy itself lacks; dunders (copy, pickle) stay local
+        if attribute.startswith("__") or attribute in ("name", "database_name"):
+            raise AttributeError(attribute)
+        return getattr(self.resolve(), attribute)
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r}, {self.database_name!r})"
@@ -0,0 +1,63 @@
+import io
+
+# Precision modes for CPU inference
+FULL_PRECISION = "fp32"
+BF16_PRECISION = "bf16"
+INT8_PRECISION = "int8"
+PRECISIONS = (FULL_PRECISION, BF16_PRECISION, INT8_PRECISION)
+
+# CPU flags with native bfloat16 arithmetic; elsewhere bf16 is emulated and slower than fp32
+BF16_CPU_FLAGS = ("avx512_bf16", "amx_bf16")
+
+
+def cpu_supports_bf16():
+    try:
+        with open("/proc/cpuinfo") as file:
+            flags = file.read().split()
+    except OSError:
+        return False
+    return any(flag in flags for flag in BF16_CPU_FLAGS)
+
+
+def resolve_precision(precision):
+    """Validate a precision mode, falling back to fp32 for bf16 on CPUs without bf16 support."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {', '.join(PRECISIONS)}")
+    if precision == BF16_PRECISION and not cpu_supports_bf16():
+        print("This CPU has no native bfloat16 support, using fp32 instead")
+        return FULL_PRECISION
+    return precision
+
+
+def _torch():
+    # Imported on first use: torch costs seconds and hundreds of MB, and is only needed once a
+    # model is actually loaded
+    import torch
+    return torch
+
+
+def load_options(precision):
+    """Extra from_pretrained arguments for a precision mode."""
+    if precision == BF16_PRECISION:
+        torch = _torch()
+        # Load the weights directly in bf16 instead of converting a full-precision copy
+        return {"torch_dtype": torch.bfloat16}
+    return {}
+
+
+def apply_precision(model, precision):
+    """
+    Post-load conversion: int8 replaces every nn.Linear with a dynamically quantized one
+    (int8 weights, activations quantized on the fly), which is where most CPU time goes.
+    """
+    if precision == INT8_PRECISION:
+        torch = _torch()
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def model_size_bytes(model):
+    """Serialized size of the model weights, which also counts packed int8 weights."""
+    buffer = io.BytesIO()
+    _torch().save(model.state_dict(), buffer)
+    return buffer.tell()
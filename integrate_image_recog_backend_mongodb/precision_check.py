@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import sys
+from time import time
+
+from insert_update_from_image import ProductImageProcessor, list_image_files
+from model_registry import DEFAULT_MODEL_ID, DEFAULT_REVISION
+from precision import FULL_PRECISION, INT8_PRECISION, PRECISIONS
+from inference_backend import BACKENDS, DEFAULT_ONNX_MODEL_DIR, ONNX_BACKEND, TRANSFORMERS_BACKEND, OnnxBackend
+
+# Labeled images shipped with the tests
+DEFAULT_IMAGE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests", "test_image")
+LABELS_FILE = "labels.json"
+FIELDS = ("Product", "Brand", "Quantity")
+
+
+def normalize(value):
+    return str(value).strip().lower() if value is not None else None
+
+
+def load_labels(folder):
+    """Expected answers keyed by image file name, or {} when the folder has no labels file."""
+    path = os.path.join(folder, LABELS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def answer_changes(baseline, candidate):
+    """List of (image_path, field, baseline answer, candidate answer) for every answer that differs."""
+    changes = []
+    for image_path, expected in baseline.items():
+        actual = candidate.get(image_path)
+        for field in FIELDS:
+            before = expected.get(field) if expected else None
+            after = actual.get(field) if actual else None
+            if normalize(before) != normalize(after):
+                changes.append((image_path, field, before, after))
+    return changes
+
+
+def label_accuracy(answers, labels):
+    """Fraction of labeled fields answered correctly, or None when no image is labeled."""
+    correct = 0
+    total = 0
+    for image_path, response in answers.items():
+        label = labels.get(os.path.basename(image_path))
+        if not label:
+            continue
+        for field in FIELDS:
+            if field not in label:
+                continue
+            total += 1
+            if response and normalize(response.get(field)) == normalize(label[field]):
+                correct += 1
+    return correct / total if total else None
+
+
+def run_precision(image_paths, precision, model_id=DEFAULT_MODEL_ID, revision=DEFAULT_REVISION, repeats=1,
+                  backend=None):
+    """Load the model in one precision mode and time it over the images (no caches involved)."""
+    start_time = time()
+    processor = ProductImageProcessor(model_id, revision, precision=precision, backend=backend)
+    load_seconds = time() - start_time
+
+    # Warm-up pass so one-off allocation isn't charged to the timed runs
+    list(processor.iter_process_images(image_paths=image_paths[:1]))
+
+    answers = {}
+    start_time = time()
+    for _ in range(repeats):
+        for image_path, response in processor.iter_process_images(image_paths=image_paths):
+            answers[image_path] = response
+    seconds = (time() - start_time) / repeats
+
+    return {
+        "precision": processor.precision,
+        "load_seconds": load_seconds,
+        "seconds": seconds,
+        "model_bytes": processor.backend.size_bytes(),
+        "answers": answers,
+    }
+
+
+def compare(baseline, candidate, labels):
+    """Summary of a candidate run against the fp32 baseline."""
+    return {
+        "baseline": baseline["precision"],
+        "candidate": candidate["precision"],
+        "speedup": baseline["seconds"] / candidate["seconds"] if candidate["seconds"] else None,
+        "memory_saved_bytes": baseline["model_bytes"] - candidate["model_bytes"],
+        "baseline_accuracy": label_accuracy(baseline["answers"], labels),
+        "candidate_accuracy": label_accuracy(candidate["answers"], labels),
+        "changes": answer_changes(baseline["answers"], candidate["answers"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare a reduced-precision model against fp32 on labeled images before switching it on."
+    )
+    parser.add_argument("folder", nargs="?", default=DEFAULT_IMAGE_FOLDER)
+    parser.add_argument("--precision", choices=PRECISIONS, default=INT8_PRECISION,
+                        help=f"precision of the candidate run; {FULL_PRECISION} only with another backend")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="inference backend for the candidate run; the fp32 baseline always uses transformers")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--max-changes", type=int, default=0, help="answer changes allowed before the check fails")
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args()
+    if args.precision == FULL_PRECISION and args.backend in (None, TRANSFORMERS_BACKEND):
+        parser.error(f"{FULL_PRECISION} transformers is the baseline; pick another precision or backend")
+
+    backend = args.backend
+    onnx_dir = os.environ.get("ONNX_MODEL_DIR", DEFAULT_ONNX_MODEL_DIR)
+    if backend == ONNX_BACKEND:
+        # The ONNX backend refuses to load before it has passed this check
+        backend = OnnxBackend(onnx_dir, DEFAULT_MODEL_ID, DEFAULT_REVISION, args.precision, checked=False)
+
+    image_paths = list_image_files(args.folder)
+    labels = load_labels(args.folder)
+    print(f"Checking {args.precision} against {FULL_PRECISION} on {len(image_paths)} images ({len(labels)} labeled)")
+
+    baseline = run_precision(image_paths, FULL_PRECISION, repeats=args.repeats, backend=TRANSFORMERS_BACKEND)
+    candidate = run_precision(image_paths, args.precision, repeats=args.repeats, backend=backend)
+    report = compare(baseline, candidate, labels)
+
+    print(f"{baseline['precision']}: {baseline['seconds']:.2f} s, {baseline['model_bytes'] / 1024 ** 2:.0f} MiB")
+    print(f"{candidate['precision']}: {candidate['seconds']:.2f} s, {candidate['model_bytes'] / 1024 ** 2:.0f} MiB")
+    print(f"Speedup: {report['speedup']:.2f}x, memory saved: {report['memory_saved_bytes'] / 1024 ** 2:.0f} MiB")
+    if report["baseline_accuracy"] is not None:
+        print(f"Label accuracy: {report['baseline_accuracy']:.0%} -> {report['candidate_accuracy']:.0%}")
+    for image_path, field, before, after in report["changes"]:
+        print(f"Changed {field} for {os.path.basename(image_path)}: {before!r} -> {after!r}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, default=str)
+
+    if candidate["precision"] != args.precision:
+        print(f"{args.precision} is not available on this host")
+        sys.exit(1)
+    passed = len(report["changes"]) <= args.max_changes and (
+        report["baseline_accuracy"] is None or report["candidate_accuracy"] >= report["baseline_accuracy"]
+    )
+    print("PASS" if passed else "FAIL")
+    if passed and args.backend == ONNX_BACKEND:
+        # Lets OnnxBackend load this export outside the check
+        with open(OnnxBackend.check_path(onnx_dir, candidate["precision"]), "w") as file:
+            json.dump({key: value for key, value in report.items() if key != "changes"}, file, indent=2, default=str)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
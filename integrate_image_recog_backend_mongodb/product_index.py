@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_INDEX_DIR = ".product_index"
+# Cosine similarity above which an image is taken to show an already known product. Not
+# validated on labeled photos: a false match puts the wrong product name on the new batch,
+# so check it against your own images and raise it if similar packaging gets mixed up.
+DEFAULT_THRESHOLD = 0.95
+# Staged products waiting for their database write; the oldest are dropped beyond this
+MAX_PENDING = 1024
+
+
+def embedding_vector(enc_image):
+    """
+    Mean-pool an encode_image output (patches x features, any leading batch dimension)
+    into one L2-normalized float32 vector.
+    """
+    if hasattr(enc_image, "detach"):
+        # torch tensor, possibly bf16, which NumPy can't represent
+        enc_image = enc_image.detach().float().cpu().numpy()
+    array = np.asarray(enc_image, dtype=np.float32)
+    vector = array.reshape(-1, array.shape[-1]).mean(axis=0)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ProductIndex:
+    """
+    Nearest-neighbor index of image embeddings for recognized products, one per model namespace.
+    Vectors are appended to a raw float32 file and labels to a JSON-lines file, so adding a
+    product writes only the new entry. Search is brute-force cosine similarity with NumPy,
+    which stays in the low milliseconds for tens of thousands of entries.
+    Products from the model are staged first and only added once they have been written to
+    the inventory (commit), so answers that never made it into the database are not reused.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, threshold=DEFAULT_THRESHOLD):
+        self.index_dir = index_dir
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        # namespace -> (vectors array, labels list), loaded on first use
+        self._indexes = {}
+        # key (image path or content hash) -> [(vector, product, brand, namespace), ...]
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def namespace(model_id, revision):
+        return f"{model_id}@{revision}"
+
+    def _paths(self, namespace):
+        directory = os.path.join(self.index_dir, hashlib.sha256(namespace.encode()).hexdigest()[:16])
+        return os.path.join(directory, "vectors.f32"), os.path.join(directory, "labels.jsonl")
+
+    def _load(self, namespace, dim):
+        index = self._indexes.get(namespace)
+        if index is not None:
+            return index
+        vectors_path, labels_path = self._paths(namespace)
+        vectors = np.zeros((0, dim), dtype=np.float32)
+        labels = []
+        if os.path.exists(vectors_path) and os.path.exists(labels_path):
+            vectors = np.fromfile(vectors_path, dtype=np.float32)
+            vectors = vectors[:len(vectors) // dim * dim].reshape(-1, dim)
+            with open(labels_path) as file:
+                labels = [json.loads(line) for line in file if line.strip()]
+            # An interrupted append can leave one file a line ahead of the other
+            count = min(len(vectors), len(labels))
+            vectors, labels = vectors[:count], labels[:count]
+        index = (vectors, labels)
+        self._indexes[namespace] = index
+        return index
+
+    def search(self, enc_image, namespace):
+        """Return (label dict with Product/Brand/similarity or None, query vector)."""
+        vector = embedding_vector(enc_image)
+        with self._lock:
+            vectors, labels = self._load(namespace, len(vector))
+            if not labels:
+                self.misses += 1
+                return None, vector
+            similarities = vectors @ vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, vector
+            self.hits += 1
+        return {**labels[best], "similarity": similarity}, vector
+
+    def add(self, vector, product, brand, namespace):
+        """Append one recognized product image to the index and to disk."""
+        vector = np.asarray(vector, dtype=np.float32)
+        label = {"Product": product, "Brand": brand}
+        with self._lock:
+            vectors, labels = self._load(namespace, len(vector))
+            vectors_path, labels_path = self._paths(namespace)
+            os.makedirs(os.path.dirname(vectors_path), exist_ok=True)
+            with open(labels_path, "a") as file:
+                file.write(json.dumps(label) + "\n")
+            with open(vectors_path, "ab") as file:
+                file.write(vector.tobytes())
+            self._indexes[namespace] = (np.vstack([vectors, vector[None, :]]), labels + [label])
+
+    def stage(self, key, vector, product, brand, namespace):
+        """Hold a newly recognized product under key (usually the image path) until commit."""
+        with self._lock:
+            self._pending.setdefault(key, []).append((vector, product, brand, namespace))
+            self._pending.move_to_end(key)
+            while len(self._pending) > MAX_PENDING:
+                self._pending.popitem(last=False)
+
+    def commit(self, key, written):
+        """
+        Add the products staged under key whose (Product, Brand) is in written, the pairs that
+        were stored in the database, and forget the rest.
+        """
+        with self._lock:
+            staged = self._pending.pop(key, [])
+        for vector, product, brand, namespace in staged:
+            if (product, brand) in written:
+                self.add(vector, product, brand, namespace)
+
+    def size(self, namespace):
+        index = self._indexes.get(namespace)
+        return len(index[1]) if index else 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,276 @@
+import hashlib
+from datetime import timedelta
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+from time import monotonic
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from batch_dates import ensure_expiration_index, format_date, start_of_today, to_datetime
+from mongo_connection import ensure_index
+
+# Results written per bulk_write by the streaming write stage
+WRITE_CHUNK_SIZE = 200
+# A partly filled chunk is written once its oldest result has waited this long
+WRITE_MAX_WAIT_SECONDS = 2.0
+# Shelf life given to new batches
+DEFAULT_SHELF_LIFE_DAYS = 730
+
+DUPLICATE_KEY_ERROR = 11000
+# Outcomes after which a result is in the database
+WRITTEN_STATUSES = ("inserted", "updated", "skipped")
+# Marks the end of the stream read by iter_chunks
+_END = object()
+
+
+def generate_hash_id(product, brand):
+    unique_string = f"{product}{brand}"
+    return hashlib.sha256(unique_string.encode()).hexdigest()
+
+
+def row_hash(product, brand, quantity, purchase_time, expiration_time):
+    """
+    RowHash of a catalog row, the key that makes importing it again a no-op. Dates may be
+    "YYYY-MM-DD" strings or datetimes, so a stored batch hashes the same as its CSV row.
+    """
+    fields = [product, brand, str(int(quantity)), format_date(purchase_time) or "", format_date(expiration_time) or ""]
+    return hashlib.sha256("\x1f".join(fields).encode()).hexdigest()
+
+
+def default_batch_times():
+    """Purchase and expiration dates (datetimes at midnight) for a batch recorded today."""
+    today = start_of_today()
+    return today, today + timedelta(days=DEFAULT_SHELF_LIFE_DAYS)
+
+
+def ensure_hash_index(collection):
+    """
+    Unique index on HashID, created once per collection. Upserts rely on it: two writers
+    inserting the same new product cannot both succeed, and the loser retries its write.
+    With duplicate HashIDs already stored it cannot be built; writes still work, but without
+    that protection.
+    """
+    return ensure_index(collection, "HashID", unique=True)
+
+
+def write_products(collection, items, purchase_time=None, expiration_time=None, key_field="ImageHash"):
+    """
+    Write recognized products with one unordered bulk_write of upserts.
+
+    items are dicts with Product, Brand and Quantity, plus optional ImageHash (makes the write
+    idempotent per image; key_field names another batch field to use instead, e.g. RowHash for
+    catalog imports), PurchaseTime/ExpirationTime overriding the dates given here (dates are
+    stored as datetimes; "YYYY-MM-DD" strings are converted), a
+    precomputed HashID, and ImagePath (passed through to the outcome). Items are merged by
+    HashID and quantities summed in memory, so each product is a single upsert that pushes all
+    of its new batches, increments Quantity and sets Product/Brand only when it creates the
+    record. Returns one outcome per item, in order: the item's fields plus HashID and Status,
+    which is "inserted", "updated", "skipped" (its image is already recorded) or "error".
+    """
+    if purchase_time is None or expiration_time is None:
+        default_purchase, default_expiration = default_batch_times()
+        purchase_time = purchase_time or default_purchase
+        expiration_time = expiration_time or default_expiration
+    purchase_time = to_datetime(purchase_time)
+    expiration_time = to_datetime(expiration_time)
+
+    outcomes = []
+    groups = {}
+    for item in items:
+        hash_id = item.get("HashID") or generate_hash_id(item["Product"], item["Brand"])
+        outcome = {**item, "HashID": hash_id, "Status": None}
+        outcomes.append(outcome)
+        groups.setdefault(hash_id, []).append(outcome)
+    if not outcomes:
+        return outcomes
+
+    recorded = _recorded_batches(collection, groups, key_field)
+
+    operations = []
+    operation_items = []
+    for hash_id, group in groups.items():
+        pending = []
+        image_hashes = set()
+        for outcome in group:
+            image_hash = outcome.get(key_field)
+            if image_hash and ((hash_id, image_hash) in recorded or image_hash in image_hashes):
+                outcome["Status"] = "skipped"
+                continue
+            if image_hash:
+                image_hashes.add(image_hash)
+            pending.append(outcome)
+        if not pending:
+            continue
+
+        batches = []
+        for outcome in pending:
+            batch = {
+                "Quantity": outcome["Quantity"],
+                "PurchaseTime": to_datetime(outcome.get("PurchaseTime", purchase_time)),
+                "ExpirationTime": to_datetime(outcome.get("ExpirationTime", expiration_time)),
+            }
+            if outcome.get(key_field):
+                # Remember which image the batch came from so writing it again is a no-op
+                batch[key_field] = outcome[key_field]
+            batches.append(batch)
+        update_filter = {"HashID": hash_id}
+        if image_hashes:
+            # A batch recorded by a concurrent writer since the lookup makes the filter miss;
+            # the upsert then collides with the unique index (see _bulk_upsert)
+            update_filter[f"Batches.{key_field}"] = {"$nin": sorted(image_hashes)}
+        first = pending[0]
+        operations.append(UpdateOne(
+            update_filter,
+            {
+                "$push": {"Batches": {"$each": batches}},
+                "$inc": {"Quantity": sum(outcome["Quantity"] for outcome in pending)},
+                # HashID comes from the filter's equality match
+                "$setOnInsert": {"Product": first["Product"], "Brand": first["Brand"]},
+            },
+            upsert=True,
+        ))
+        operation_items.append(pending)
+
+    if operations:
+        ensure_hash_index(collection)
+        ensure_expiration_index(collection)
+        results = _bulk_upsert(collection, operations)
+        # A duplicate key means another writer created the product between this upsert's match
+        # and its insert, or the filter missed because the batch is already recorded. The
+        # product exists now, so one retry either pushes the batches or misses again, and only
+        # then are they really recorded already
+        retry = [index for index, (status, _) in enumerate(results) if status == "duplicate"]
+        if retry:
+            for index, result in zip(retry, _bulk_upsert(collection, [operations[index] for index in retry])):
+                results[index] = result
+
+        for (status, error), pending in zip(results, operation_items):
+            if status == "duplicate":
+                status = "skipped"
+            for outcome in pending:
+                outcome["Status"] = status
+                if status == "error":
+                    outcome["Error"] = error
+
+    counts = {}
+    for outcome in outcomes:
+        counts[outcome["Status"]] = counts.get(outcome["Status"], 0) + 1
+    print(
+        f"Wrote {len(outcomes)} results as {len(operations)} upserts in one bulk write: "
+        + ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    )
+    return outcomes
+
+
+def _bulk_upsert(collection, operations):
+    """
+    Run the upserts as one unordered bulk_write. Returns one (status, errmsg) per operation,
+    status being "inserted", "updated", "duplicate" (unique index collision) or "error".
+    """
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        upserted = set(result.upserted_ids)
+        errors = {}
+    except BulkWriteError as e:
+        upserted = {entry["index"] for entry in e.details.get("upserted", [])}
+        errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+    results = []
+    for index in range(len(operations)):
+        error = errors.get(index)
+        if error is None:
+            results.append(("inserted" if index in upserted else "updated", None))
+        elif error.get("code") == DUPLICATE_KEY_ERROR:
+            results.append(("duplicate", error.get("errmsg")))
+        else:
+            results.append(("error", error.get("errmsg")))
+    return results
+
+
+def _recorded_batches(collection, groups, key_field="ImageHash"):
+    """
+    (HashID, key) pairs already in the database, looked up in one query. Only needed
+    when several images of one product are merged into a single upsert; a lone image is
+    handled by the upsert's own filter.
+    """
+    hash_ids = []
+    image_hashes = set()
+    for hash_id, group in groups.items():
+        group_hashes = {outcome.get(key_field) for outcome in group if outcome.get(key_field)}
+        if len(group_hashes) > 1:
+            hash_ids.append(hash_id)
+            image_hashes.update(group_hashes)
+    if not hash_ids:
+        return set()
+
+    recorded = set()
+    query = {"HashID": {"$in": hash_ids}, f"Batches.{key_field}": {"$in": sorted(image_hashes)}}
+    for product in collection.find(query, {"HashID": 1, f"Batches.{key_field}": 1}):
+        for batch in product.get("Batches", []):
+            if batch.get(key_field) in image_hashes:
+                recorded.add((product["HashID"], batch[key_field]))
+    return recorded
+
+
+def written_products(outcomes):
+    """The (Product, Brand) pairs of the outcomes whose write went through."""
+    return {(outcome["Product"], outcome["Brand"]) for outcome in outcomes if outcome["Status"] in WRITTEN_STATUSES}
+
+
+def iter_chunks(results, size=WRITE_CHUNK_SIZE, max_wait=WRITE_MAX_WAIT_SECONDS):
+    """
+    Group a stream into lists of at most size items. A chunk is also closed once its first
+    item has waited max_wait seconds, even while the stream is still working on the next
+    item: the stream is read by a background thread, so results that already arrived are
+    not held back by a slow or idle source. An exception raised by the stream is raised
+    here after the items before it have been passed on.
+    """
+    items = Queue(maxsize=size)
+    stop = Event()
+
+    def put(entry):
+        # Gives up once the caller has stopped iterating, so the thread does not block forever
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def read():
+        try:
+            for result in results:
+                if not put((result, None)):
+                    return
+        except Exception as e:
+            put((_END, e))
+        else:
+            put((_END, None))
+
+    Thread(target=read, name="write-chunks", daemon=True).start()
+    chunk = []
+    deadline = None
+    try:
+        while True:
+            try:
+                result, error = items.get(timeout=max(deadline - monotonic(), 0) if chunk else None)
+            except Empty:
+                yield chunk
+                chunk = []
+                continue
+            if result is _END:
+                break
+            if not chunk:
+                deadline = monotonic() + max_wait
+            chunk.append(result)
+            if len(chunk) >= size or monotonic() >= deadline:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        if error is not None:
+            raise error
+    finally:
+        stop.set()
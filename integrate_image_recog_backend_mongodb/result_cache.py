@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import threading
+
+from PIL import Image
+
+DEFAULT_CACHE_DIR = ".inference_cache"
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Content hash of a file, read in chunks so large photos don't need to fit in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image_path, hash_size=8):
+    """
+    64-bit difference hash (dHash): compare neighbouring pixels of a tiny grayscale thumbnail.
+    Re-shot or re-compressed photos of the same shelf land within a few bits of each other.
+    """
+    with Image.open(image_path) as image:
+        # Let the JPEG decoder downscale while decoding instead of decoding full resolution
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        # One byte per pixel in "L" mode
+        pixels = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).tobytes()
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class ResultCache:
+    """
+    On-disk cache of recognition results keyed by image content hash plus model id/revision.
+    Each entry is a small JSON file; once the directory grows past max_bytes the least
+    recently used entries are evicted. With phash_distance set, an exact miss is retried
+    against stored perceptual hashes and any entry within that many bits is a hit.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, phash_distance=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.phash_distance = phash_distance
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Loaded lazily from disk on first use: key -> {"size", "namespace", "phash"}
+        self._entries = None
+        self._total_bytes = 0
+        # Perceptual hashes computed on a miss, reused when the result is stored
+        self._pending_phash = {}
+
+    @staticmethod
+    def namespace(model_id, revision, mode=""):
+        return f"{model_id}@{revision}/{mode}"
+
+    @staticmethod
+    def make_key(content_hash, namespace):
+        return hashlib.sha256(f"{namespace}|{content_hash}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        self._total_bytes = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            size = entry.stat().st_size
+            self._entries[entry.name[:-5]] = {
+                "size": size,
+                "namespace": data.get("namespace"),
+                "phash": data.get("phash"),
+            }
+            self._total_bytes += size
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                data = json.load(file)
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return data.get("response")
+
+    def get(self, image_path, namespace, content_hash=None):
+        """Return (response or None, key) for an image; key is passed back to put() on a miss."""
+        key = self.make_key(content_hash or file_sha256(image_path), namespace)
+        with self._lock:
+            self._load_index()
+            if key in self._entries:
+                response = self._read(key)
+                if response is not None:
+                    self.hits += 1
+                    return response, key
+
+        # Near-duplicate lookup; the image is decoded outside the lock
+        phash = self._perceptual_hash(image_path) if self.phash_distance is not None else None
+        with self._lock:
+            if phash is not None:
+                near_key = self._find_near_duplicate(phash, namespace)
+                if near_key:
+                    response = self._read(near_key)
+                    if response is not None:
+                        self.hits += 1
+                        self.near_hits += 1
+                        return response, key
+                self._pending_phash[key] = phash
+            self.misses += 1
+            return None, key
+
+    @staticmethod
+    def _perceptual_hash(image_path):
+        try:
+            return perceptual_hash(image_path)
+        except Exception:
+            return None
+
+    def _find_near_duplicate(self, phash, namespace):
+        best_key, best_distance = None, self.phash_distance + 1
+        for entry_key, entry in self._entries.items():
+            if entry["namespace"] != namespace or entry["phash"] is None:
+                continue
+            distance = hamming_distance(phash, entry["phash"])
+            if distance < best_distance:
+                best_key, best_distance = entry_key, distance
+        return best_key
+
+    def put(self, key, response, image_path, namespace):
+        phash = None
+        if self.phash_distance is not None:
+            with self._lock:
+                phash = self._pending_phash.pop(key, None)
+            if phash is None:
+                phash = self._perceptual_hash(image_path)
+        data = {"namespace": namespace, "phash": phash, "response": response}
+
+        with self._lock:
+            self._load_index()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            # Write to a temp file first so readers never see a half-written entry
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(data, file)
+            os.replace(tmp_path, path)
+
+            size = os.path.getsize(path)
+            if key in self._entries:
+                self._total_bytes -= self._entries[key]["size"]
+            self._entries[key] = {"size": size, "namespace": namespace, "phash": phash}
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Oldest modification time first (hits refresh it via os.utime)
+        def last_used(key):
+            try:
+                return os.path.getmtime(self._path(key))
+            except OSError:
+                return 0
+        for key in sorted(self._entries, key=last_used):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self._total_bytes -= self._entries.pop(key)["size"]
+
+    def stats(self):
+        return {"hits": self.hits, "near_hits": self.near_hits, "misses": self.misses}
@@ -1,14 +1,10 @@
-from pymongo import MongoClient
+from mongo_connection import LazyCollection
 
 # MongoDB configuration
-mongo_uri = "mongodb://localhost:27017/"
-database_name = "inventory_db"
 collection_name = "products"
 
-# Connect to MongoDB
-client = MongoClient(mongo_uri)
-db = client[database_name]
-collection = db[collection_name]
+# Connects to MongoDB on first use (MONGO_URI and the other settings in mongo_connection.py)
+collection = LazyCollection(collection_name)
 
 # Create an index on the 'Product' field
 print("Creating an index on the 'Product' field...")
@@ -0,0 +1,56 @@
+import math
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class StageTimer:
+    """
+    Collects the duration of every call to a named pipeline stage (decode, encode_image, ...).
+    Thread-safe, since images are decoded on the prefetch threads.
+    """
+
+    def __init__(self):
+        self._samples = {}
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, items=1):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+            self._items[stage] = self._items.get(stage, 0) + items
+
+    @contextmanager
+    def measure(self, stage, items=1):
+        """Time the body of a with-block; items is the number of images it handled."""
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, perf_counter() - start_time, items)
+
+    def summary(self):
+        """Per-stage call count, total seconds, p50/p95/max seconds per call and items/second."""
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+            items = dict(self._items)
+        summary = {}
+        for stage, values in samples.items():
+            total = sum(values)
+            summary[stage] = {
+                "calls": len(values),
+                "items": items[stage],
+                "total_seconds": total,
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": max(values),
+                "items_per_second": items[stage] / total if total else None,
+            }
+        return summary
@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+from statistics import median
+from time import perf_counter
+
+# Modules the web app must not import until an image is recognized
+ML_MODULES = ("torch", "transformers", "onnxruntime", "insert_update_from_image", "inference_backend")
+
+# Regression limits for app.py started without the model
+MAX_IMPORT_SECONDS = 1.0
+MAX_RSS_MB = 250
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def probe(request_path):
+    """
+    Runs in a fresh interpreter: import app.py, optionally serve one request through the
+    Flask test client, and print the measurements as JSON.
+    """
+    sys.path.insert(0, APP_DIR)
+    start_time = perf_counter()
+    import app
+    report = {"import_seconds": perf_counter() - start_time}
+    if request_path:
+        start_time = perf_counter()
+        response = app.app.test_client().get(request_path)
+        report["first_response_seconds"] = perf_counter() - start_time
+        report["status"] = response.status_code
+    # ru_maxrss is in KB on Linux
+    report["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    report["ml_modules"] = [name for name in ML_MODULES if name in sys.modules]
+    print(json.dumps(report))
+
+
+def measure_startup(request_path="/inventory", repeats=3):
+    """
+    Start app.py in repeats fresh processes and measure each: wall time of the whole process,
+    import time, time to the first response for request_path (None skips the request),
+    peak RSS and any ML module imported on the way. Returns a report with every run and
+    the medians.
+    """
+    runs = []
+    for _ in range(repeats):
+        start_time = perf_counter()
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--probe", request_path or ""],
+            capture_output=True, text=True, check=True, cwd=APP_DIR,
+        ).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        run["process_seconds"] = perf_counter() - start_time
+        runs.append(run)
+
+    metrics = ("process_seconds", "import_seconds", "first_response_seconds", "max_rss_mb")
+    return {
+        "request_path": request_path,
+        "runs": runs,
+        **{metric: median(run[metric] for run in runs) for metric in metrics if metric in runs[0]},
+        "ml_modules": sorted({name for run in runs for name in run["ml_modules"]}),
+    }
+
+
+def check_report(report, max_import_seconds=MAX_IMPORT_SECONDS, max_rss_mb=MAX_RSS_MB):
+    """Return the regressions found in a report, as messages."""
+    problems = []
+    if report["ml_modules"]:
+        problems.append(f"ML stack imported at startup: {', '.join(report['ml_modules'])}")
+    failed = [run["status"] for run in report["runs"] if run.get("status", 200) >= 400]
+    if failed:
+        # e.g. MongoDB not reachable: the response time would not mean anything
+        problems.append(f"{report['request_path']} answered with status {failed[0]}")
+    if report["import_seconds"] > max_import_seconds:
+        problems.append(f"import took {report['import_seconds']:.2f} s (limit {max_import_seconds:.2f} s)")
+    if report["max_rss_mb"] > max_rss_mb:
+        problems.append(f"peak RSS {report['max_rss_mb']:.0f} MB (limit {max_rss_mb} MB)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how fast app.py starts without the model loaded.")
+    parser.add_argument("--path", default="/inventory", help="route requested after the import ('' to skip)")
+    parser.add_argument("--repeats", type=int, default=3, help="fresh processes to measure")
+    parser.add_argument("--max-import-seconds", type=float, default=MAX_IMPORT_SECONDS)
+    parser.add_argument("--max-rss-mb", type=float, default=MAX_RSS_MB)
+    parser.add_argument("--output", default="startup_benchmark.json", help="JSON file the report is written to")
+    parser.add_argument("--probe", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe is not None:
+        probe(args.probe)
+        return
+
+    report = measure_startup(args.path or None, args.repeats)
+    line = f"import {report['import_seconds']:.2f} s, process {report['process_seconds']:.2f} s"
+    if "first_response_seconds" in report:
+        line += f", first {report['request_path']} response {report['first_response_seconds']:.2f} s"
+    print(line + f", peak RSS {report['max_rss_mb']:.0f} MB (median of {args.repeats})")
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Report written to {args.output}")
+
+    problems = check_report(report, args.max_import_seconds, args.max_rss_mb)
+    for problem in problems:
+        print(f"Regression: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Shelf photos are cut into overlapping tiles of this size (pixels at full resolution)
+DEFAULT_TILE_SIZE = 768
+# Fraction of each tile shared with its neighbour, so products on a tile edge are seen whole once
+DEFAULT_OVERLAP = 0.25
+
+
+def _tile_starts(length, tile_size, step):
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, step))
+    # Last tile is aligned to the edge so nothing is cut off
+    starts.append(length - tile_size)
+    return starts
+
+
+def make_tiles(image, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP):
+    """
+    Split a PIL image into overlapping tiles. Returns a list of (box, tile) where box is
+    (left, top, right, bottom). Images no larger than one tile come back as a single tile.
+    """
+    width, height = image.size
+    step = max(1, int(tile_size * (1 - overlap)))
+    tiles = []
+    for top in _tile_starts(height, tile_size, step):
+        for left in _tile_starts(width, tile_size, step):
+            box = (left, top, min(left + tile_size, width), min(top + tile_size, height))
+            tiles.append((box, image.crop(box)))
+    return tiles
+
+
+def boxes_overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def box_area(box):
+    return max(0, box[2] - box[0]) * max(0, box[3] - box[1])
+
+
+def overlap_area(a, b):
+    return box_area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+
+
+def _product_key(response):
+    return response["Product"].strip().lower(), response["Brand"].strip().lower()
+
+
+def merge_tile_answers(tile_answers):
+    """
+    Merge per-tile answers [(box, response or None), ...] into one record per product.
+    The quantities of every tile that found a product add up, minus the items each pair of
+    directly overlapping tiles both counted: the overlap's share of the tile area times the
+    lower of the two tiles' counts per area. Tiles that don't overlap never cancel out, so a
+    product repeated along a wide shelf is counted in full. The result is never below the
+    largest single tile count.
+    """
+    by_product = {}
+    for box, response in tile_answers:
+        if response:
+            by_product.setdefault(_product_key(response), []).append((box, response))
+
+    records = []
+    for found in by_product.values():
+        quantity = sum(response["Quantity"] for _, response in found)
+        for i, (box, response) in enumerate(found):
+            for other_box, other in found[i + 1:]:
+                shared = overlap_area(box, other_box)
+                if shared and box_area(box) and box_area(other_box):
+                    density = min(response["Quantity"] / box_area(box), other["Quantity"] / box_area(other_box))
+                    quantity -= density * shared
+        quantity = max(int(quantity + 0.5), max(response["Quantity"] for _, response in found))
+
+        # Keep the spelling from the first tile that saw the product
+        first = found[0][1]
+        records.append({"Product": first["Product"], "Brand": first["Brand"], "Quantity": quantity})
+    return records
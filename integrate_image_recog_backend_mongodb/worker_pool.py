@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from model_registry import DEFAULT_MODEL_ID, DEFAULT_REVISION, get_processor
+from result_cache import ResultCache
+from embedding_store import EmbeddingStore
+from precision import FULL_PRECISION
+
+# Rough resident size of one moondream2 copy in full precision
+MODEL_MEMORY_BYTES = 4 * 1024 ** 3
+# Matrix multiplies stop scaling well past a handful of threads per process
+DEFAULT_THREADS_PER_WORKER = 4
+
+# Per-process state of a pool worker
+_processor = None
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def total_memory_bytes():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def auto_tune(num_images=None, cores=None, memory_bytes=None, threads_per_worker=DEFAULT_THREADS_PER_WORKER):
+    """
+    Pick (workers, threads_per_worker) for this host. Each worker holds its own model copy,
+    so the worker count is capped by memory as well as by cores and by the number of images.
+    """
+    cores = cores or available_cores()
+    memory_bytes = memory_bytes if memory_bytes is not None else total_memory_bytes()
+
+    threads_per_worker = max(1, min(threads_per_worker, cores))
+    workers = max(1, cores // threads_per_worker)
+    if memory_bytes:
+        # Leave one model's worth of memory for the parent process and the OS
+        workers = min(workers, max(1, memory_bytes // MODEL_MEMORY_BYTES - 1))
+    if num_images:
+        workers = min(workers, num_images)
+    # Hand cores freed up by the caps back to the remaining workers
+    threads_per_worker = max(threads_per_worker, cores // workers)
+    return workers, threads_per_worker
+
+
+def _init_worker(model_id, revision, threads, use_result_cache, use_embedding_store, precision=FULL_PRECISION,
+                 backend=None):
+    global _processor
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Only allowed before any parallel work has started in this process
+            pass
+    except ImportError:
+        pass
+    options = {}
+    if use_result_cache:
+        options["result_cache"] = ResultCache()
+    if use_embedding_store:
+        options["embedding_store"] = EmbeddingStore()
+    if backend:
+        options["backend"] = backend
+    _processor = get_processor(model_id, revision, precision=precision, **options)
+
+
+def _process_in_worker(image_path):
+    print(f"[worker {os.getpid()}] Processing image: {image_path}")
+    return image_path, _processor._process_image(image_path)
+
+
+def iter_process_images_parallel(image_paths, workers=None, threads_per_worker=None,
+                                 model_id=DEFAULT_MODEL_ID, revision=DEFAULT_REVISION,
+                                 use_result_cache=True, use_embedding_store=True, precision=FULL_PRECISION,
+                                 backend=None):
+    """
+    Fan images out to a pool of worker processes, each with its own model copy and a fixed
+    torch intra-op thread count. Yields (image_path, response) in completion order;
+    response is None for images that couldn't be recognized.
+    """
+    image_paths = list(image_paths)
+    if not image_paths:
+        return
+    if workers is None:
+        tuned_workers, tuned_threads = auto_tune(len(image_paths))
+        workers = tuned_workers
+        threads_per_worker = threads_per_worker or tuned_threads
+    elif threads_per_worker is None:
+        # auto_tune's thread count fits its own worker count; share the cores among these
+        threads_per_worker = max(1, available_cores() // workers)
+    print(f"Processing {len(image_paths)} images with {workers} workers x {threads_per_worker} threads")
+
+    # spawn rather than fork: forking a process that has already started torch threads can deadlock
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(model_id, revision, threads_per_worker, use_result_cache, use_embedding_store, precision, backend),
+    ) as executor:
+        futures = {executor.submit(_process_in_worker, image_path): image_path for image_path in image_paths}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                print(f"Error processing image {futures[future]}: {e}")
+                yield futures[future], None
+
+
+def process_images_parallel(image_paths, workers=None, threads_per_worker=None, **options):
+    """List of recognized responses in completion order."""
+    return [
+        response
+        for _, response in iter_process_images_parallel(image_paths, workers, threads_per_worker, **options)
+        if response
+    ]
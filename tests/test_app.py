@@ -5,6 +5,7 @@ from unittest.mock import patch
 from datetime import datetime, timedelta
 import sys
 import os
+import time
 
 # Add parent directory to Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -12,6 +13,7 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
 # Import from the app module
+import integrate_image_recog_backend_mongodb.app as app_module
 from integrate_image_recog_backend_mongodb.app import (
     app,
     generate_hash_id,
@@ -45,14 +47,96 @@ class TestInventoryManagementSystem(unittest.TestCase):
         response = self.client.post('/', data={})
         self.assertIn(b'Please provide a folder path', response.data)
 
+    def wait_for_job(self, job_id, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = self.client.get(f'/jobs/{job_id}').get_json()
+            if status["status"] in ("done", "failed"):
+                return status
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} did not finish")
+
+    @patch('integrate_image_recog_backend_mongodb.app.get_processor')
+    def test_index_post_queues_job(self, mock_get_processor):
+        """Test POST request queues a background job on the shared model"""
+        processor = mock_get_processor.return_value
+        processor.list_images.return_value = ["image.jpg", "blurry.jpg"]
+        processor.iter_process_images.side_effect = lambda folder: iter([
+            ("image.jpg", {"Product": "Test", "Brand": "TestBrand", "Quantity": 1}),
+            ("blurry.jpg", None),
+        ])
+        self.mock_collection.find_one.return_value = None
+
+        response = self.client.post('/', data={'folder_path': parent_dir})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'queued', response.data)
+
+        job_id = app_module.job_queue.store._order[-1]
+        status = self.wait_for_job(job_id)
+        self.assertEqual(status["status"], "done")
+        self.assertEqual(status["total"], 2)
+        self.assertEqual(status["done"], 2)
+        self.assertEqual(status["images"][0]["product"]["Brand"], "TestBrand")
+        self.assertEqual(status["images"][1]["error"], "No product recognized")
+        self.assertIn("seconds", status["images"][0])
+        processor.iter_process_images.assert_called_once_with(parent_dir)
+        # Both results of the job went out in a single bulk write
+        self.mock_collection.bulk_write.assert_called_once()
+        self.assertEqual(status["images"][0]["product"]["Status"], "updated")
+
+    def test_create_job_rejects_duplicates(self):
+        """Test the same folder can't be queued twice while the first job is pending"""
+        with patch.object(app_module.job_queue, 'start'):
+            first = self.client.post('/jobs', json={'folder_path': current_dir})
+            second = self.client.post('/jobs', json={'folder_path': current_dir})
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 409)
+        self.assertEqual(second.get_json()["job_id"], first.get_json()["job_id"])
+        # Finish the pending job so later tests can queue the folder again
+        app_module.job_queue.store.finish(first.get_json()["job_id"])
+
+    def test_create_job_bad_folder(self):
+        """Test queueing a missing folder is rejected"""
+        response = self.client.post('/jobs', json={'folder_path': '/no/such/folder'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/jobs', json={})
+        self.assertEqual(response.status_code, 400)
+
+    @patch('integrate_image_recog_backend_mongodb.app.get_processor')
+    def test_job_events(self, mock_get_processor):
+        """Test a job's per-image progress is streamed as server-sent events"""
+        processor = mock_get_processor.return_value
+        processor.list_images.return_value = ["image.jpg"]
+        processor.iter_process_images.side_effect = lambda folder: iter([
+            ("image.jpg", {"Product": "Test", "Brand": "TestBrand", "Quantity": 1}),
+        ])
+        self.mock_collection.find_one.return_value = None
+
+        job_id = self.client.post('/jobs', json={'folder_path': parent_dir}).get_json()["job_id"]
+        self.wait_for_job(job_id)
+        response = self.client.get(f'/jobs/{job_id}/events')
+        body = response.get_data(as_text=True)
+
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(body.count('event: image'), 1)
+        self.assertIn('"status": "done"', body)
+
+    def test_job_not_found(self):
+        """Test unknown job ids return 404"""
+        self.assertEqual(self.client.get('/jobs/missing').status_code, 404)
+
     def test_view_inventory(self):
         """Test inventory view route"""
-        self.mock_collection.find.return_value = [
-            {"Product": "Test", "Brand": "TestBrand", "Quantity": 1}
+        self.mock_collection.aggregate.return_value = [
+            {"HashID": "a", "Product": "Test", "Brand": "TestBrand", "Quantity": 1, "BatchCount": 1,
+             "LiveQuantity": 1, "LatestPurchase": "2024-01-01", "EarliestExpiration": "2026-01-01"}
         ]
         response = self.client.get('/inventory')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Inventory', response.data)
+        # Batch summaries come from the aggregation, not from loading the batches
+        self.assertIn(b'2026-01-01', response.data)
+        self.mock_collection.find.assert_not_called()
 
     # Database Operation Tests
     def test_generate_hash_id(self):
@@ -70,15 +154,17 @@ class TestInventoryManagementSystem(unittest.TestCase):
             "purchase_time": datetime.now().strftime("%Y-%m-%d"),
             "expiration_time": datetime.now().strftime("%Y-%m-%d")
         }
-        # Mock find_one to return None (product doesn't exist)
-        self.mock_collection.find_one.return_value = None
+        self.mock_collection.bulk_write.return_value.upserted_ids = {0: "new_id"}
 
-        insert_product(**product_data)
+        outcome = insert_product(**product_data)
 
-        self.mock_collection.find_one.assert_called_once_with({
-            "HashID": generate_hash_id("Test", "TestBrand")
-        })
-        self.mock_collection.insert_one.assert_called_once()
+        # One upsert round trip, no lookup first
+        self.mock_collection.find_one.assert_not_called()
+        operations = self.mock_collection.bulk_write.call_args.args[0]
+        self.assertEqual(len(operations), 1)
+        self.assertEqual(operations[0]._filter, {"HashID": generate_hash_id("Test", "TestBrand")})
+        self.assertTrue(operations[0]._upsert)
+        self.assertEqual(outcome["Status"], "inserted")
 
     def test_update_product(self):
         """Test product update"""
@@ -90,8 +176,9 @@ class TestInventoryManagementSystem(unittest.TestCase):
             "purchase_time": datetime.now().strftime("%Y-%m-%d"),
             "expiration_time": datetime.now().strftime("%Y-%m-%d")
         }
-        update_product(**product_data)
-        self.mock_collection.find_one.assert_called_once()
+        outcome = update_product(**product_data)
+        self.mock_collection.bulk_write.assert_called_once()
+        self.assertEqual(outcome["Status"], "updated")
 
     def test_delete_product(self):
         """Test product deletion"""
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from datetime import date, datetime
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_dates import expiring_batches, format_date, migrate_string_dates, serialize_dates, to_datetime
+
+
+class TestConversion(unittest.TestCase):
+    def test_to_datetime(self):
+        self.assertEqual(to_datetime("2026-11-21"), datetime(2026, 11, 21))
+        self.assertEqual(to_datetime(date(2026, 11, 21)), datetime(2026, 11, 21))
+        self.assertEqual(to_datetime(datetime(2026, 11, 21, 8)), datetime(2026, 11, 21, 8))
+        self.assertIsNone(to_datetime(None))
+        with self.assertRaises(ValueError):
+            to_datetime("21.11.2026")
+
+    def test_serialize_dates(self):
+        product = {"HashID": "a", "Batches": [{"Quantity": 2, "ExpirationTime": datetime(2026, 11, 21)}]}
+        self.assertEqual(serialize_dates(product), {"HashID": "a", "Batches": [{"Quantity": 2, "ExpirationTime": "2026-11-21"}]})
+        self.assertEqual(format_date("2026-11-21"), "2026-11-21")
+
+
+class TestQueries(unittest.TestCase):
+    def setUp(self):
+        self.collection = MagicMock()
+        self.collection.full_name = "inventory_db.products"
+        patcher = patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_migration_runs_in_the_server(self):
+        self.collection.update_many.return_value.modified_count = 2
+        self.assertEqual(migrate_string_dates(self.collection), 6)
+
+        batches_call, purchase_call, expiration_call = self.collection.update_many.call_args_list
+        # Only documents that still hold strings are matched, so a second run changes nothing
+        self.assertIn("$elemMatch", batches_call.args[0]["Batches"])
+        self.assertEqual(purchase_call.args[0], {"PurchaseTime": {"$type": "string"}})
+        self.assertEqual(expiration_call.args[0], {"ExpirationTime": {"$type": "string"}})
+        # Update pipelines: the conversion happens in MongoDB, no documents are read
+        self.assertIsInstance(batches_call.args[1], list)
+        self.collection.find.assert_not_called()
+
+    def test_expiring_batches_start_from_the_index(self):
+        self.collection.aggregate.return_value = [{"HashID": "a", "ExpirationTime": datetime(2026, 10, 20)}]
+        rows = expiring_batches(self.collection, days=7, now=date(2026, 10, 18))
+
+        self.assertEqual(rows, [{"HashID": "a", "ExpirationTime": datetime(2026, 10, 20)}])
+        self.collection.create_index.assert_called_with("Batches.ExpirationTime")
+        pipeline = self.collection.aggregate.call_args.args[0]
+        window = {"$gte": datetime(2026, 10, 18), "$lt": datetime(2026, 10, 26)}
+        self.assertEqual(pipeline[0], {"$match": {"Batches.ExpirationTime": window}})
+        self.assertIn({"$unwind": "$Batches"}, pipeline)
+
+    def test_expiring_route(self):
+        import frontend.app as frontend_app
+        client = frontend_app.app.test_client()
+        row = {"HashID": "a", "Product": "Milk", "Brand": "Farm", "Quantity": 2, "ExpirationTime": datetime(2026, 10, 20)}
+        with patch.object(frontend_app, "expiring_batches", return_value=[row]) as mock_expiring:
+            body = client.get("/inventory/expiring?days=3").get_json()
+        self.assertEqual(mock_expiring.call_args.args[1], 3)
+        self.assertEqual(body["batches"][0]["ExpirationTime"], "2026-10-20")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import tempfile
+import shutil
+
+from PIL import Image
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from insert_update_from_image import ProductImageProcessor
+
+
+class FakeEncoding(list):
+    """List of per-image encodings that slices like a batched tensor."""
+
+
+def fake_encode_image(images):
+    if isinstance(images, list):
+        return FakeEncoding(f"enc-{image.size[0]}" for image in images)
+    return [f"enc-{images.size[0]}"]
+
+
+def fake_answer_question(enc_image, question, tokenizer, **generation_options):
+    if "Number" in question:
+        return "2"
+    return enc_image[0]
+
+
+class TestBatchEncoding(unittest.TestCase):
+    def setUp(self):
+        # Three distinguishable images so results can be matched back to their files
+        self.folder = tempfile.mkdtemp()
+        for width in (10, 20, 30):
+            Image.new("RGB", (width, 10)).save(os.path.join(self.folder, f"img_{width}.png"))
+
+        with patch("inference_backend.AutoTokenizer"), \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class:
+            self.model = MagicMock()
+            self.model.encode_image.side_effect = fake_encode_image
+            self.model.answer_question.side_effect = fake_answer_question
+            mock_model_class.from_pretrained.return_value = self.model
+            self.processor = ProductImageProcessor("model", "revision", self.folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_batched_matches_single(self):
+        single = self.processor.process_images(batch_size=1)
+        batched = self.processor.process_images(batch_size=2)
+
+        key = lambda response: response["Product"]
+        self.assertEqual(sorted(single, key=key), sorted(batched, key=key))
+        self.assertEqual(len(batched), 3)
+
+    def test_batch_forward_passes(self):
+        self.processor.process_images(batch_size=2)
+
+        # Three images with batch size 2: one batch of two and a final batch of one
+        calls = [call.args[0] for call in self.model.encode_image.call_args_list]
+        self.assertEqual(len(calls), 2)
+        self.assertIsInstance(calls[0], list)
+        self.assertEqual(len(calls[0]), 2)
+
+    def test_unreadable_image_skipped(self):
+        with open(os.path.join(self.folder, "broken.jpg"), "w") as file:
+            file.write("not an image")
+
+        with patch("builtins.print"):
+            responses = self.processor.process_images(batch_size=4)
+        self.assertEqual(len(responses), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import json
+import tempfile
+import shutil
+
+from PIL import Image
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from stage_timer import StageTimer, percentile
+from benchmark import benchmark_pipeline
+import insert_update_from_image
+from insert_update_from_image import list_image_files
+
+
+class TestStageTimer(unittest.TestCase):
+    def test_percentiles(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(values, 0.5), 50.0)
+        self.assertEqual(percentile(values, 0.95), 95.0)
+        self.assertEqual(percentile([3.0], 0.95), 3.0)
+
+    def test_summary(self):
+        timer = StageTimer()
+        timer.record("encode_image", 2.0, items=4)
+        timer.record("encode_image", 1.0, items=4)
+        with timer.measure("decode"):
+            pass
+
+        summary = timer.summary()
+        self.assertEqual(summary["encode_image"]["calls"], 2)
+        self.assertEqual(summary["encode_image"]["max"], 2.0)
+        self.assertAlmostEqual(summary["encode_image"]["items_per_second"], 8 / 3.0)
+        self.assertEqual(summary["decode"]["calls"], 1)
+
+
+class TestBenchmarkPipeline(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for width in (10, 20, 30):
+            Image.new("RGB", (width, 10)).save(os.path.join(self.folder, f"img_{width}.png"))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_stages_reported(self):
+        model = MagicMock()
+        # Unparseable structured answer, so the three separate questions run as well
+        model.answer_question.side_effect = lambda enc_image, question, tokenizer, **options: "2" if "Number" in question else "Milk"
+        with patch("inference_backend.AutoTokenizer"), \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class, \
+                patch("builtins.print"):
+            mock_model_class.from_pretrained.return_value = model
+            report = benchmark_pipeline(list_image_files(self.folder), db_collection=None)
+
+        stages = report["stages"]
+        for stage in ("model_load", "decode", "encode_image", "answer_structured",
+                      "answer_product_type", "answer_brand", "answer_quantity"):
+            self.assertIn(stage, stages)
+        self.assertEqual(stages["decode"]["calls"], 3)
+        self.assertEqual(stages["answer_quantity"]["calls"], 3)
+        self.assertNotIn("db_write", stages)
+        self.assertEqual(report["images"], 3)
+        self.assertEqual(report["recognized"], 3)
+        # The report is written as JSON
+        json.dumps(report)
+
+    def test_db_write_stage_uses_scratch_collection(self):
+        model = MagicMock()
+        model.answer_question.side_effect = lambda enc_image, question, tokenizer, **options: "2" if "Number" in question else "Milk"
+        with patch("inference_backend.AutoTokenizer"), \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class, \
+                patch("mongo_connection.get_database") as mock_get_database, \
+                patch.object(insert_update_from_image, "collection") as inventory, \
+                patch("builtins.print"):
+            mock_model_class.from_pretrained.return_value = model
+            report = benchmark_pipeline(list_image_files(self.folder), db_collection="benchmark_products")
+
+        scratch = mock_get_database.return_value.__getitem__.return_value
+        mock_get_database.return_value.__getitem__.assert_any_call("benchmark_products")
+        scratch.bulk_write.assert_called()
+        # The scratch collection is dropped; the inventory collection is never used
+        scratch.drop.assert_called_once()
+        self.assertEqual(inventory.mock_calls, [])
+        self.assertEqual(report["stages"]["db_write"]["items"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
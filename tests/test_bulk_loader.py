@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import json
+import tempfile
+import shutil
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from bulk_loader import iter_json_records, load_documents, product_document
+from product_writes import generate_hash_id
+from ingest_catalog import catalog_items
+
+PRODUCTS_JSON = os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb/products.json')
+
+ITEMS = [
+    {"Product": "Milk", "Brand": "Berchtesjäden", "Quantity": 3, "PurchaseTime": "2024-11-21", "ExpirationTime": "2026-11-21"},
+    {"Product": "Nut", "Brand": "Castania, \"Roasted\" [big]", "Quantity": 1, "PurchaseTime": "2024-11-21", "ExpirationTime": "2026-11-21"},
+    {"Product": "Soap", "Brand": "Dove", "Quantity": "2", "PurchaseTime": "2024-11-21", "ExpirationTime": "2026-11-21"},
+]
+
+
+class TestIterJsonRecords(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, name, text):
+        path = os.path.join(self.folder, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+        return path
+
+    def test_array_streamed_across_reads(self):
+        path = self.write("products.json", json.dumps(ITEMS, indent=4))
+        # Tiny reads split records, strings and escapes across buffer boundaries
+        self.assertEqual(list(iter_json_records(path, read_size=7)), ITEMS)
+
+    def test_ndjson(self):
+        path = self.write("products.ndjson", "\n".join(json.dumps(item) for item in ITEMS) + "\n")
+        self.assertEqual(list(iter_json_records(path, read_size=16)), ITEMS)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_records(self.write("empty.json", " [ ]\n"))), [])
+
+    def test_repository_catalog(self):
+        with open(PRODUCTS_JSON) as file:
+            expected = json.load(file)
+        self.assertEqual(list(iter_json_records(PRODUCTS_JSON)), expected)
+
+
+class TestLoadDocuments(unittest.TestCase):
+    def test_product_document(self):
+        document = product_document(ITEMS[2])
+        self.assertEqual(document["HashID"], generate_hash_id("Soap", "Dove"))
+        self.assertEqual(document["Quantity"], 2)
+        # Dates are stored as BSON datetimes
+        batch = {key: value for key, value in document["Batches"][0].items() if key != "RowHash"}
+        self.assertEqual(batch, {"Quantity": 2, "PurchaseTime": datetime(2024, 11, 21), "ExpirationTime": datetime(2026, 11, 21)})
+        # Same key as ingest_catalog.py, so importing the CSV after a JSON load adds nothing
+        self.assertEqual(document["Batches"][0]["RowHash"], catalog_items([ITEMS[2]])[0]["RowHash"])
+
+    def test_chunks_and_already_loaded_products(self):
+        collection = MagicMock()
+        collection.insert_many.side_effect = [
+            MagicMock(inserted_ids=[1, 2]),
+            BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}], "nInserted": 0}),
+        ]
+        documents = (product_document(item) for item in ITEMS)
+        with patch("builtins.print"):
+            inserted, skipped, _ = load_documents(collection, documents, chunk_size=2)
+
+        self.assertEqual((inserted, skipped), (2, 1))
+        self.assertEqual(collection.insert_many.call_count, 2)
+        self.assertFalse(collection.insert_many.call_args.kwargs["ordered"])
+
+    def test_other_write_errors_raised(self):
+        collection = MagicMock()
+        collection.insert_many.side_effect = BulkWriteError({"writeErrors": [{"index": 0, "code": 121}]})
+        with patch("builtins.print"), self.assertRaises(BulkWriteError):
+            load_documents(collection, [product_document(ITEMS[0])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import tempfile
+import shutil
+
+import numpy as np
+from PIL import Image
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from embedding_store import EmbeddingStore
+from insert_update_from_image import ProductImageProcessor, QUESTION_EXTRACTION
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.tmp_dir, "shelf.png")
+        Image.new("RGB", (32, 32), (200, 10, 10)).save(self.image_path)
+        self.store = EmbeddingStore(os.path.join(self.tmp_dir, "store"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        embedding = np.arange(12, dtype=np.float32).reshape(1, 3, 4)
+        missing, key = self.store.get(self.image_path, "model", "revision")
+        self.assertIsNone(missing)
+        self.store.put(key, embedding)
+
+        loaded, _ = self.store.get(self.image_path, "model", "revision")
+        np.testing.assert_array_equal(np.asarray(loaded), embedding)
+        self.assertEqual(self.store.stats(), {"hits": 1, "misses": 1})
+
+    def test_keyed_by_revision(self):
+        _, key = self.store.get(self.image_path, "model", "revision")
+        self.store.put(key, np.zeros((1, 2), dtype=np.float32))
+        loaded, _ = self.store.get(self.image_path, "model", "other-revision")
+        self.assertIsNone(loaded)
+
+
+class TestProcessorEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp_dir, "images")
+        os.makedirs(self.folder)
+        for width in (10, 20):
+            Image.new("RGB", (width, 10)).save(os.path.join(self.folder, f"img_{width}.png"))
+
+        with patch("inference_backend.AutoTokenizer"), \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class:
+            self.model = MagicMock()
+            self.model.encode_image.side_effect = lambda images: np.ones((len(images) if isinstance(images, list) else 1, 4), dtype=np.float32)
+            self.model.answer_question.return_value = '{"Product": "Milk", "Brand": "Oatly", "Quantity": 2}'
+            mock_model_class.from_pretrained.return_value = self.model
+            self.store = EmbeddingStore(os.path.join(self.tmp_dir, "store"))
+            self.processor = ProductImageProcessor("model", "revision", self.folder, embedding_store=self.store)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_reprocessing_skips_encoder(self):
+        with patch("builtins.print"):
+            self.processor.process_images(batch_size=2)
+            self.assertEqual(self.model.encode_image.call_count, 1)
+
+            # Re-ask with a different extraction mode: questions run again, the encoder doesn't
+            self.model.reset_mock()
+            self.model.answer_question.side_effect = ["Milk", "Oatly", "2"] * 2
+            self.processor.extraction_mode = QUESTION_EXTRACTION
+            responses = self.processor.process_images()
+
+        self.model.encode_image.assert_not_called()
+        self.assertEqual(self.model.answer_question.call_count, 6)
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(self.store.stats()["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
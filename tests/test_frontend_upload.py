@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import patch
+from io import BytesIO
+import sys
+import os
+import tempfile
+import shutil
+
+from PIL import Image
+
+# Add parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frontend.app as frontend_app
+from inference_backend import StubBackend
+from insert_update_from_image import ProductImageProcessor
+
+
+def image_bytes(color):
+    buffer = BytesIO()
+    Image.new("RGB", (40, 30), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestUpload(unittest.TestCase):
+    def setUp(self):
+        frontend_app.app.config['TESTING'] = True
+        self.client = frontend_app.app.test_client()
+        self.folder = tempfile.mkdtemp()
+        self.processor = ProductImageProcessor("model", "revision", backend=StubBackend())
+        patches = [
+            patch.object(frontend_app, 'get_processor', return_value=self.processor),
+            patch.object(frontend_app, 'write_products', side_effect=lambda collection, items: [{**item, 'Status': 'inserted'} for item in items]),
+            patch.object(frontend_app, 'upload_folder', self.folder),
+            patch('builtins.print'),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.mock_write = frontend_app.write_products
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_no_image(self):
+        response = self.client.post('/upload', data={})
+        self.assertEqual(response.status_code, 400)
+
+    def test_several_images_in_memory(self):
+        data = {'image': [(BytesIO(image_bytes("red")), "a.png"), (BytesIO(image_bytes("blue")), "b.png")]}
+        response = self.client.post('/upload', data=data, content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual([result['filename'] for result in results], ["a.png", "b.png"])
+        self.assertEqual(results[0]['product']['Brand'], "Ariel")
+        self.assertEqual(results[0]['status'], "inserted")
+        # One bulk write for the request; each item carries its content hash, so re-uploads
+        # don't add stock. Nothing is saved to disk.
+        self.mock_write.assert_called_once()
+        items = self.mock_write.call_args.args[1]
+        self.assertEqual([item['ImageHash'] for item in items], [result['hash'] for result in results])
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_persisted_under_content_hash(self):
+        for _ in range(2):
+            data = {'image': (BytesIO(image_bytes("red")), "IMG_1.PNG"), 'persist': '1'}
+            result = self.client.post('/upload', data=data, content_type='multipart/form-data').get_json()['results'][0]
+
+        self.assertEqual(os.listdir(self.folder), [result['hash'] + ".png"])
+        self.assertEqual(result['path'], os.path.join(self.folder, result['hash'] + ".png"))
+
+
+if __name__ == "__main__":
+    unittest.main()
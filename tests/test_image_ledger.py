@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import patch
+from pymongo import MongoClient
+import os
+import sys
+import tempfile
+import shutil
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from image_ledger import ImageLedger
+
+
+class TestImageLedger(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # MongoDB test configuration
+        cls.client = MongoClient("mongodb://localhost:27017/")
+        cls.database_name = "test_inventory_db"
+        cls.collection = cls.client[cls.database_name]["processed_images"]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.drop_database(cls.database_name)
+        cls.client.close()
+
+    def setUp(self):
+        self.collection.delete_many({})
+        self.tmp_dir = tempfile.mkdtemp()
+        self.write("a.jpg", b"first image")
+        self.write("b.png", b"second image")
+        self.write("notes.txt", b"not an image")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def run_folder(self, ledger, responses=None):
+        paths = ledger.scan(self.tmp_dir)
+        for path in paths:
+            ledger.record(path, (responses or {}).get(path, {"Product": "Milk", "Brand": "Farm", "Quantity": 1}))
+        return [os.path.basename(path) for path in paths]
+
+    def test_rerun_skips_processed_images(self):
+        with patch("builtins.print"):
+            self.assertEqual(self.run_folder(ImageLedger(self.collection)), ["a.jpg", "b.png"])
+            self.assertEqual(self.run_folder(ImageLedger(self.collection)), [])
+
+            self.write("c.jpg", b"third image")
+            self.write("a.jpg", b"first image, edited")
+            self.assertEqual(self.run_folder(ImageLedger(self.collection)), ["a.jpg", "c.jpg"])
+
+    def test_unchanged_files_not_rehashed(self):
+        with patch("builtins.print"):
+            self.run_folder(ImageLedger(self.collection))
+            with patch("image_ledger.file_sha256") as mock_hash:
+                self.assertEqual(ImageLedger(self.collection).scan(self.tmp_dir), [])
+            mock_hash.assert_not_called()
+
+    def test_renamed_file_recognized_by_content(self):
+        with patch("builtins.print"):
+            self.run_folder(ImageLedger(self.collection))
+            os.rename(os.path.join(self.tmp_dir, "a.jpg"), os.path.join(self.tmp_dir, "renamed.jpg"))
+            self.assertEqual(self.run_folder(ImageLedger(self.collection)), [])
+
+    def test_failed_images_retried_on_request(self):
+        failed = os.path.join(self.tmp_dir, "b.png")
+        with patch("builtins.print"):
+            self.run_folder(ImageLedger(self.collection), {failed: None})
+            self.assertEqual(ImageLedger(self.collection).scan(self.tmp_dir), [])
+            self.assertEqual(ImageLedger(self.collection).scan(self.tmp_dir, retry_failed=True), [failed])
+
+    def test_unrecorded_images_processed_again(self):
+        # An image whose result never reached the database (e.g. a crash) stays pending
+        with patch("builtins.print"):
+            ledger = ImageLedger(self.collection)
+            paths = ledger.scan(self.tmp_dir)
+            ledger.record(paths[0], {"Product": "Milk", "Brand": "Farm", "Quantity": 1})
+            self.assertEqual(ImageLedger(self.collection).scan(self.tmp_dir), paths[1:])
+
+
+if __name__ == "__main__":
+    unittest.main()
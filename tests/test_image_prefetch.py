@@ -0,0 +1,83 @@
+import unittest
+import os
+import sys
+import tempfile
+import shutil
+
+from PIL import Image
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from image_prefetch import ImagePrefetcher, load_image
+
+# EXIF orientation tag
+ORIENTATION = 0x0112
+
+
+class TestLoadImage(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_large_jpeg_downscaled(self):
+        path = os.path.join(self.tmp_dir, "large.jpg")
+        Image.new("RGB", (4000, 3000), (10, 120, 200)).save(path, quality=80)
+
+        image = load_image(path, max_size=1024)
+        self.assertEqual(image.mode, "RGB")
+        self.assertEqual(max(image.size), 1024)
+        self.assertEqual(image.size, (1024, 768))
+
+    def test_exif_orientation_applied(self):
+        # A landscape sensor image tagged "rotate 90 degrees" should come out portrait
+        path = os.path.join(self.tmp_dir, "rotated.jpg")
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        Image.new("RGB", (200, 100)).save(path, exif=exif)
+
+        image = load_image(path)
+        self.assertEqual(image.size, (100, 200))
+
+    def test_small_png_unchanged(self):
+        path = os.path.join(self.tmp_dir, "small.png")
+        Image.new("RGBA", (50, 40)).save(path)
+        image = load_image(path)
+        self.assertEqual(image.size, (50, 40))
+        self.assertEqual(image.mode, "RGB")
+
+
+class TestImagePrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for width in range(10, 80, 10):
+            path = os.path.join(self.tmp_dir, f"img_{width}.png")
+            Image.new("RGB", (width, 10)).save(path)
+            self.paths.append(path)
+        self.broken = os.path.join(self.tmp_dir, "broken.jpg")
+        with open(self.broken, "w") as file:
+            file.write("not an image")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_order_preserved(self):
+        for workers in (0, 3):
+            results = list(ImagePrefetcher(self.paths, workers=workers, depth=2))
+            self.assertEqual([path for path, _, _ in results], self.paths)
+            self.assertEqual([image.size[0] for _, image, _ in results], list(range(10, 80, 10)))
+
+    def test_errors_reported_per_image(self):
+        paths = [self.paths[0], self.broken, self.paths[1]]
+        results = list(ImagePrefetcher(paths, workers=2))
+        self.assertIsNone(results[0][2])
+        self.assertIsNone(results[1][1])
+        self.assertIsInstance(results[1][2], Exception)
+        self.assertIsNotNone(results[2][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../i
 
 # Now import the required classes and functions
 from insert_update_from_image import ProductImageProcessor, generate_hash_id, insert_update_product
+from inference_backend import STUB_BACKEND
 
 
 class TestProductImageProcessor(unittest.TestCase):
@@ -31,10 +32,10 @@ class TestProductImageProcessor(unittest.TestCase):
         # Ensure the test image exists in the temporary directory
         assert os.path.exists(cls.image_path), f"Test image not found at: {cls.image_path}"
 
-        # Test processor setup
+        # Test processor setup; the stub backend answers without loading the model
         cls.model_id = "vikhyatk/moondream2"
         cls.revision = "2024-08-26"
-        cls.processor = ProductImageProcessor(cls.model_id, cls.revision, cls.image_path)
+        cls.processor = ProductImageProcessor(cls.model_id, cls.revision, cls.image_path, backend=STUB_BACKEND)
 
     @classmethod
     def tearDownClass(cls):
@@ -68,5 +69,11 @@ class TestProductImageProcessor(unittest.TestCase):
         self.assertEqual(len(responses), 1)  # Only one image is processed
         self.assertEqual(responses[0], mock_process_image.return_value)
 
+    def test_process_images_end_to_end(self):
+        # Decode, encode and answer parsing all run; only the model itself is stubbed
+        with patch("builtins.print"):
+            responses = self.processor.process_images()
+        self.assertEqual(responses, [{"Product": "Laundry detergent", "Brand": "Ariel", "Quantity": 2}])
+
 if __name__ == "__main__":
     unittest.main()
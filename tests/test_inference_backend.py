@@ -0,0 +1,153 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import tempfile
+import shutil
+
+import numpy as np
+from PIL import Image
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from inference_backend import (
+    STUB_BACKEND, VISION_INPUT_SIZE, OnnxBackend, StubBackend, TransformersBackend, UncheckedBackendError,
+    create_backend,
+)
+from insert_update_from_image import ProductImageProcessor, QUESTION_EXTRACTION
+
+
+class TestBackends(unittest.TestCase):
+    def test_unknown_backend_rejected(self):
+        with self.assertRaises(ValueError):
+            create_backend("tensorrt", "model", "revision")
+
+    def test_stub_encoding_is_deterministic(self):
+        backend = StubBackend()
+        red, blue = Image.new("RGB", (50, 40), (255, 0, 0)), Image.new("RGB", (50, 40), (0, 0, 255))
+        batch = backend.encode_image([red, blue])
+        self.assertEqual(batch.shape[0], 2)
+        np.testing.assert_array_equal(batch[0:1], backend.encode_image(red))
+        self.assertFalse(np.array_equal(batch[0], batch[1]))
+
+    def test_transformers_backend_passes_stop_tokens(self):
+        with patch("inference_backend.AutoTokenizer") as mock_tokenizer_class, \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class:
+            tokenizer = mock_tokenizer_class.from_pretrained.return_value
+            tokenizer.eos_token_id = 0
+            tokenizer.encode.side_effect = lambda text, add_special_tokens: [7] if text == "\n" else [8, 9]
+            backend = TransformersBackend("model", "revision")
+            backend.answer_question("enc", "Question?", max_new_tokens=4, stop_sequences=("\n", "\n\n"))
+
+        mock_model_class.from_pretrained.return_value.answer_question.assert_called_once_with(
+            "enc", "Question?", tokenizer, max_new_tokens=4, eos_token_id=[0, 7]
+        )
+
+    def test_onnx_preprocessing(self):
+        pixels = OnnxBackend.preprocess(Image.new("L", (640, 480), 255))
+        self.assertEqual(pixels.shape, (3, VISION_INPUT_SIZE, VISION_INPUT_SIZE))
+        self.assertEqual(pixels.dtype, np.float32)
+        self.assertAlmostEqual(float(pixels.max()), 1.0)
+
+
+class TestOnnxBackend(unittest.TestCase):
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+
+    def load(self, session, checked=False):
+        with patch("inference_backend.onnxruntime") as mock_onnxruntime, \
+                patch("inference_backend.np.load", return_value=np.eye(16, 4, dtype=np.float32)), \
+                patch("inference_backend.AutoTokenizer") as mock_tokenizer_class:
+            mock_onnxruntime.InferenceSession.return_value = session
+            tokenizer = mock_tokenizer_class.from_pretrained.return_value
+            tokenizer.bos_token_id, tokenizer.eos_token_id = 1, 0
+            tokenizer.encode.return_value = [2, 3]
+            tokenizer.decode.side_effect = lambda tokens, skip_special_tokens: " ".join(map(str, tokens))
+            return OnnxBackend(self.model_dir, "model", "revision", checked=checked)
+
+    @staticmethod
+    def decoder_session():
+        # One decoder layer: 2 heads of size 3
+        session = MagicMock()
+        inputs = []
+        for name in ("inputs_embeds", "past_key_0", "past_value_0"):
+            decoder_input = MagicMock(shape=["batch", 2, "past_sequence", 3])
+            decoder_input.name = name
+            inputs.append(decoder_input)
+        session.get_inputs.return_value = inputs
+        return session
+
+    def test_unchecked_export_refused(self):
+        with self.assertRaises(UncheckedBackendError):
+            self.load(self.decoder_session(), checked=True)
+
+        open(OnnxBackend.check_path(self.model_dir, "fp32"), "w").close()
+        self.assertEqual(self.load(self.decoder_session(), checked=True).precision, "fp32")
+
+    def test_export_without_cache_rejected(self):
+        session = MagicMock()
+        session.get_inputs.return_value = []
+        with self.assertRaises(ValueError):
+            self.load(session)
+
+    def test_decoding_uses_kv_cache(self):
+        session = self.decoder_session()
+        feeds = []
+
+        def run(output_names, feed):
+            feeds.append(feed)
+            step = len(feeds)
+            # Answers tokens 5 and 6, then end of sequence; the cache grows by the new positions
+            logits = np.zeros((1, 16), dtype=np.float32)
+            logits[0, {1: 5, 2: 6}.get(step, 0)] = 1.0
+            length = feed["past_key_0"].shape[2] + feed["inputs_embeds"].shape[1]
+            cache = np.full((1, 2, length, 3), step, dtype=np.float32)
+            return [logits, cache, cache]
+
+        session.run.side_effect = run
+        backend = self.load(session)
+        answer = backend.answer_question(np.zeros((1, 2, 4), dtype=np.float32), "Brand?")
+
+        self.assertEqual(answer, "5 6")
+        self.assertEqual(session.run.call_args.args[0], ["logits", "present_key_0", "present_value_0"])
+        # BOS + 2 image positions + 2 question tokens, then one position per generated token
+        self.assertEqual([feed["inputs_embeds"].shape[1] for feed in feeds], [5, 1, 1])
+        self.assertEqual([feed["past_key_0"].shape[2] for feed in feeds], [0, 5, 6])
+        self.assertEqual(float(feeds[2]["past_value_0"][0, 0, 0, 0]), 2.0)
+
+
+class TestProcessorWithStubBackend(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for width in (10, 20):
+            Image.new("RGB", (width, 10)).save(os.path.join(self.folder, f"img_{width}.png"))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_structured_and_question_extraction(self):
+        answers = {"Product": "Milk", "Brand": "Oatly", "Quantity": 3}
+        expected = [answers, answers]
+        with patch("builtins.print"):
+            structured = ProductImageProcessor("model", "revision", self.folder, batch_size=2,
+                                               backend=StubBackend(answers))
+            self.assertEqual(structured.process_images(), expected)
+
+            questions = ProductImageProcessor("model", "revision", self.folder, backend=STUB_BACKEND,
+                                              extraction_mode=QUESTION_EXTRACTION)
+            self.assertEqual(questions.process_images()[0]["Product"], "Laundry detergent")
+
+        self.assertIsNone(structured.model)
+        # Stub answers never share cache entries with the real model
+        self.assertEqual(structured._model_revision(), "revision+stub")
+
+    @patch.dict(os.environ, {"INFERENCE_BACKEND": STUB_BACKEND})
+    def test_backend_from_environment(self):
+        processor = ProductImageProcessor("model", "revision", self.folder)
+        self.assertEqual(processor.backend.name, STUB_BACKEND)
+
+
+if __name__ == "__main__":
+    unittest.main()
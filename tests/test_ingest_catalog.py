@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import json
+import tempfile
+import shutil
+from datetime import datetime
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from ingest_catalog import CatalogExport, backfill_row_hashes, catalog_items, ingest, iter_catalog_chunks, iter_csv_rows
+from bulk_loader import iter_json_records
+from product_writes import generate_hash_id
+
+CATALOG_DIR = os.path.join(os.path.dirname(__file__), '../backend_mongodb')
+INVENTORY_CSV = os.path.join(CATALOG_DIR, 'inventory.csv')
+PRODUCTS_JSON = os.path.join(CATALOG_DIR, 'products.json')
+
+ROW = {"Product": "Soap", "Brand": "Dove", "Quantity": "2", "PurchaseTime": "2024-11-21", "ExpirationTime": "2026-11-21"}
+
+
+class TestCatalogItems(unittest.TestCase):
+    def test_row_fields_and_hashes(self):
+        item, same, other = catalog_items([ROW, dict(ROW), {**ROW, "Quantity": "3"}])
+        self.assertEqual(item["HashID"], generate_hash_id("Soap", "Dove"))
+        self.assertEqual(item["Quantity"], 2)
+        # The row hash identifies the row, not just the product
+        self.assertEqual(item["RowHash"], same["RowHash"])
+        self.assertNotEqual(item["RowHash"], other["RowHash"])
+        self.assertEqual(item["HashID"], other["HashID"])
+
+    def test_chunks_keep_file_order_with_workers(self):
+        rows = [{**ROW, "Quantity": str(i)} for i in range(7)]
+        chunks = list(iter_catalog_chunks(rows, workers=2, chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 2, 1])
+        self.assertEqual([item["Quantity"] for chunk in chunks for item in chunk], list(range(7)))
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        patcher = patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_export_matches_repository_json(self):
+        path = os.path.join(self.folder, "products.json")
+        ingest(INVENTORY_CSV, export_path=path, chunk_size=3)
+        with open(path) as file, open(PRODUCTS_JSON) as expected:
+            self.assertEqual(file.read(), expected.read())
+
+    def test_ndjson_export(self):
+        path = os.path.join(self.folder, "products.ndjson")
+        with CatalogExport(path) as export:
+            export.write(catalog_items(iter_csv_rows(INVENTORY_CSV)))
+        with open(PRODUCTS_JSON) as expected:
+            self.assertEqual(list(iter_json_records(path)), json.load(expected))
+
+    @patch("ingest_catalog.write_products")
+    def test_chunks_written_as_upserts_keyed_by_row(self, mock_write_products):
+        mock_write_products.side_effect = lambda collection, items, **kwargs: [{"Status": "inserted"} for _ in items]
+        collection = MagicMock()
+        counts = ingest(INVENTORY_CSV, collection, chunk_size=5)
+
+        self.assertEqual(counts, {"inserted": 8})
+        self.assertEqual(mock_write_products.call_count, 2)
+        args, kwargs = mock_write_products.call_args
+        self.assertIs(args[0], collection)
+        self.assertEqual(kwargs["key_field"], "RowHash")
+        self.assertTrue(all("RowHash" in item for item in args[1]))
+
+
+class TestBackfillRowHashes(unittest.TestCase):
+    def test_old_catalog_batches_get_their_row_hash(self):
+        old_batch = {"Quantity": 2, "PurchaseTime": datetime(2024, 11, 21), "ExpirationTime": datetime(2026, 11, 21)}
+        image_batch = {**old_batch, "ImageHash": "abc"}
+        collection = MagicMock()
+        collection.find.return_value = [
+            {"_id": 1, "Product": "Soap", "Brand": "Dove", "Batches": [old_batch, image_batch]},
+        ]
+        collection.bulk_write.return_value.modified_count = 1
+        with patch("builtins.print"):
+            self.assertEqual(backfill_row_hashes(collection), 1)
+
+        (operation,), = collection.bulk_write.call_args.args
+        self.assertEqual(operation._filter, {"_id": 1, "Batches": [old_batch, image_batch]})
+        old, image = operation._doc["$set"]["Batches"]
+        self.assertEqual(old["RowHash"], catalog_items([ROW])[0]["RowHash"])
+        self.assertNotIn("RowHash", image)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,7 +9,10 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
 
 # Import required classes and functions
-from insert_update_from_image import ProductImageProcessor, generate_hash_id, insert_update_product, main
+from insert_update_from_image import (
+    ProductImageProcessor, generate_hash_id, insert_update_product, insert_update_products, main,
+)
+from inference_backend import STUB_BACKEND
 
 
 class TestProductImageProcessor(unittest.TestCase):
@@ -79,19 +82,56 @@ class TestProductImageProcessor(unittest.TestCase):
             self.assertEqual(len(updated_product["Batches"]), 2)
             self.assertEqual(updated_product["Batches"][-1]["Quantity"], additional_quantity)
 
-    @patch("insert_update_from_image.collection", new_callable=lambda: None)
-    @patch("insert_update_from_image.ProductImageProcessor.process_images")
-    def test_main_function(self, mock_process_images, mock_collection):
-        # Replace the global `collection` in the main code with the test collection
+    def test_same_image_written_once(self):
+        with patch("insert_update_from_image.collection", self.collection):
+            purchase_time = datetime.now().strftime("%Y-%m-%d")
+            expiration_time = (datetime.now() + timedelta(days=730)).strftime("%Y-%m-%d")
+
+            insert_update_product("Milk", "Farm", 2, purchase_time, expiration_time, image_hash="aaa")
+            insert_update_product("Milk", "Farm", 3, purchase_time, expiration_time, image_hash="bbb")
+            # A rerun after a crash writes the first image again
+            insert_update_product("Milk", "Farm", 2, purchase_time, expiration_time, image_hash="aaa")
+
+            product = self.collection.find_one({"HashID": generate_hash_id("Milk", "Farm")})
+            self.assertEqual(product["Quantity"], 5)
+            self.assertEqual([batch["ImageHash"] for batch in product["Batches"]], ["aaa", "bbb"])
+
+    def test_shelf_products_written_in_one_batch(self):
         with patch("insert_update_from_image.collection", self.collection):
-            # Mock the responses from process_images
-            mock_process_images.return_value = [
-                {"Product": "MockProduct1", "Brand": "MockBrand1", "Quantity": 10},
-                {"Product": "MockProduct2", "Brand": "MockBrand2", "Quantity": 5},
+            purchase_time = datetime.now().strftime("%Y-%m-%d")
+            expiration_time = (datetime.now() + timedelta(days=730)).strftime("%Y-%m-%d")
+            insert_update_product("Milk", "Farm", 2, purchase_time, expiration_time)
+
+            shelf = [
+                {"Product": "Milk", "Brand": "Farm", "Quantity": 3},
+                {"Product": "Soap", "Brand": "Dove", "Quantity": 4},
             ]
+            insert_update_products(shelf, purchase_time, expiration_time, image_hash="shelf")
+            # Writing the same shelf photo again changes nothing
+            insert_update_products(shelf, purchase_time, expiration_time, image_hash="shelf")
 
-            # Run the main function
-            main()
+            milk = self.collection.find_one({"HashID": generate_hash_id("Milk", "Farm")})
+            soap = self.collection.find_one({"HashID": generate_hash_id("Soap", "Dove")})
+            self.assertEqual(milk["Quantity"], 5)
+            self.assertEqual(len(milk["Batches"]), 2)
+            self.assertEqual(soap["Quantity"], 4)
+
+    @patch("insert_update_from_image.collection", new_callable=lambda: None)
+    @patch("insert_update_from_image.ImageLedger.scan", return_value=["image1.jpg", "image2.jpg", "image3.jpg"])
+    @patch("insert_update_from_image.ProductImageProcessor.iter_process_images")
+    def test_main_function(self, mock_process_images, mock_scan, mock_collection):
+        # Replace the global `collection` in the main code with the test collection
+        with patch("insert_update_from_image.collection", self.collection), \
+                patch("insert_update_from_image.ledger_collection", self.db["processed_images"]):
+            # Mock the (image_path, response) pairs streamed by iter_process_images
+            mock_process_images.return_value = iter([
+                ("image1.jpg", {"Product": "MockProduct1", "Brand": "MockBrand1", "Quantity": 10}),
+                ("image2.jpg", {"Product": "MockProduct2", "Brand": "MockBrand2", "Quantity": 5}),
+                ("image3.jpg", None),
+            ])
+
+            # Run the main function; the stub backend keeps it from loading the real model
+            main(backend=STUB_BACKEND)
 
             # Verify the products are inserted
             product1 = self.collection.find_one({"HashID": generate_hash_id("MockProduct1", "MockBrand1")})
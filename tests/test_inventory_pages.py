@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory_pages import (
+    BATCHES_PROJECTION, LIST_PROJECTION, PageRequestError, decode_cursor, encode_cursor, fetch_page, page_args,
+)
+
+PRODUCTS = [
+    {"HashID": "a1", "Product": "Milk", "Brand": "Farm", "Quantity": 3},
+    {"HashID": "b2", "Product": "Soap", "Brand": "Dove", "Quantity": 1},
+    {"HashID": "c3", "Product": "Tea", "Brand": "Leaf", "Quantity": 2},
+]
+
+
+class TestFetchPage(unittest.TestCase):
+    def setUp(self):
+        self.collection = MagicMock()
+        self.collection.full_name = "inventory_db.products"
+
+    def test_first_page(self):
+        self.collection.find.return_value = PRODUCTS
+        products, next_cursor = fetch_page(self.collection, limit=2)
+
+        # One document more than the page tells whether there is a next page
+        self.collection.find.assert_called_once_with({}, LIST_PROJECTION, sort=[("HashID", 1)], limit=3)
+        self.assertEqual(products, PRODUCTS[:2])
+        self.assertEqual(decode_cursor(next_cursor), ("b2", "b2"))
+
+    def test_last_page(self):
+        self.collection.find.return_value = PRODUCTS[2:]
+        products, next_cursor = fetch_page(self.collection, after=encode_cursor(PRODUCTS[1]), limit=2, batches=True)
+        self.collection.find.assert_called_once_with(
+            {"HashID": {"$gt": "b2"}}, BATCHES_PROJECTION, sort=[("HashID", 1)], limit=3
+        )
+        self.assertEqual(products, PRODUCTS[2:])
+        self.assertIsNone(next_cursor)
+
+    def test_seek_on_sort_field(self):
+        self.collection.find.return_value = []
+        fetch_page(self.collection, sort="Quantity", descending=True, after=encode_cursor(PRODUCTS[0], "Quantity"))
+        query = self.collection.find.call_args.args[0]
+        self.assertEqual(query, {"$or": [{"Quantity": {"$lt": 3}}, {"Quantity": 3, "HashID": {"$lt": "a1"}}]})
+        self.assertEqual(self.collection.find.call_args.kwargs["sort"], [("Quantity", -1), ("HashID", -1)])
+
+    def test_summary_aggregation(self):
+        self.collection.aggregate.return_value = [{"HashID": "a1", "BatchCount": 2}]
+        products, next_cursor = fetch_page(self.collection, sort="Product", limit=10, summary=True, today="2026-01-01")
+
+        self.assertEqual(products, [{"HashID": "a1", "BatchCount": 2}])
+        self.assertIsNone(next_cursor)
+        self.collection.find.assert_not_called()
+        match, sort, limit, project = self.collection.aggregate.call_args.args[0]
+        # The page is selected before anything is computed, so only its documents are summarized
+        self.assertEqual(match, {"$match": {}})
+        self.assertEqual(list(sort["$sort"].items()), [("Product", 1), ("HashID", 1)])
+        self.assertEqual(limit, {"$limit": 11})
+        self.assertEqual(project["$project"]["_id"], 0)
+        self.assertNotIn("Batches", project["$project"])
+        self.assertEqual(project["$project"]["EarliestExpiration"]["$ifNull"][0], {"$min": "$Batches.ExpirationTime"})
+
+    def test_invalid_requests(self):
+        with self.assertRaises(PageRequestError):
+            fetch_page(self.collection, sort="Batches")
+        with self.assertRaises(PageRequestError):
+            fetch_page(self.collection, limit=0)
+        with self.assertRaises(PageRequestError):
+            fetch_page(self.collection, after="not a cursor")
+        self.collection.find.assert_not_called()
+
+
+class TestPageArgs(unittest.TestCase):
+    def test_defaults(self):
+        self.assertEqual(page_args({}), {
+            "sort": "HashID", "descending": False, "after": None, "limit": 50, "batches": False, "summary": False,
+        })
+
+    def test_parsed(self):
+        options = page_args({"sort": "Brand", "order": "desc", "limit": "10", "after": "abc", "batches": "1", "summary": "1"})
+        self.assertEqual(options, {
+            "sort": "Brand", "descending": True, "after": "abc", "limit": 10, "batches": True, "summary": True,
+        })
+        with self.assertRaises(PageRequestError):
+            page_args({"limit": "ten"})
+
+
+class TestInventoryRoutes(unittest.TestCase):
+    def test_frontend_json_page(self):
+        import frontend.app as frontend_app
+        client = frontend_app.app.test_client()
+        with patch.object(frontend_app, "collection") as collection:
+            collection.find.return_value = PRODUCTS
+            body = client.get("/inventory?limit=2").get_json()
+            self.assertEqual(body["products"], PRODUCTS[:2])
+            self.assertEqual(client.get(f"/inventory?limit=2&after={body['next']}").status_code, 200)
+            self.assertEqual(client.get("/inventory?sort=Batches").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+import shutil
+import time
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from job_queue import (
+    JobQueue, InMemoryJobStore, SQLiteJobStore, DuplicateJob, JobQueueFull, QUEUED, RUNNING, DONE, FAILED,
+)
+
+
+class JobStoreTests:
+    """Behaviour shared by every job store."""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = self.make_store()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_duplicate_folder_rejected(self):
+        job_id = self.store.create("inventory_images", max_depth=4)
+        with self.assertRaises(DuplicateJob) as context:
+            self.store.create("./inventory_images/", max_depth=4)
+        self.assertEqual(context.exception.job_id, job_id)
+
+        # Once the job has finished the folder can be queued again
+        self.store.claim_next()
+        self.store.finish(job_id)
+        self.store.create("inventory_images", max_depth=4)
+
+    def test_queue_depth_bounded(self):
+        self.store.create("folder_a", max_depth=2)
+        self.store.create("folder_b", max_depth=2)
+        with self.assertRaises(JobQueueFull):
+            self.store.create("folder_c", max_depth=2)
+
+    def test_claim_in_submission_order(self):
+        first = self.store.create("folder_a", max_depth=4)
+        second = self.store.create("folder_b", max_depth=4)
+        self.assertEqual(self.store.claim_next()["id"], first)
+        self.assertEqual(self.store.claim_next()["id"], second)
+        self.assertIsNone(self.store.claim_next())
+        self.assertEqual(self.store.get(first)["status"], RUNNING)
+
+    def test_progress(self):
+        job_id = self.store.create("folder_a", max_depth=4)
+        self.store.claim_next()
+        self.store.set_total(job_id, 2)
+        self.store.record_image(job_id, {"image": "a.jpg", "seconds": 1.5, "product": None, "error": "failed"})
+        self.store.record_image(job_id, {"image": "b.jpg", "seconds": 0.5, "product": {"Product": "Milk"}, "error": None})
+        self.store.finish(job_id)
+
+        status = self.store.get(job_id)
+        self.assertEqual(status["status"], DONE)
+        self.assertEqual(status["total"], 2)
+        self.assertEqual(status["done"], 2)
+        self.assertEqual(status["images"][0]["error"], "failed")
+        self.assertEqual([image["image"] for image in self.store.get(job_id, since=1)["images"]], ["b.jpg"])
+
+
+class TestInMemoryJobStore(JobStoreTests, unittest.TestCase):
+    def make_store(self):
+        return InMemoryJobStore()
+
+
+class TestSQLiteJobStore(JobStoreTests, unittest.TestCase):
+    def make_store(self):
+        return SQLiteJobStore(os.path.join(self.tmp_dir, "jobs.sqlite3"))
+
+    def test_running_jobs_requeued_after_restart(self):
+        job_id = self.store.create("folder_a", max_depth=4)
+        self.store.claim_next()
+        self.store.record_image(job_id, {"image": "a.jpg", "seconds": 1.0, "product": None, "error": None})
+
+        restarted = SQLiteJobStore(os.path.join(self.tmp_dir, "jobs.sqlite3"))
+        status = restarted.get(job_id)
+        self.assertEqual(status["status"], QUEUED)
+        self.assertEqual(status["done"], 0)
+        self.assertEqual(restarted.claim_next()["id"], job_id)
+
+
+class TestJobQueue(unittest.TestCase):
+    def wait_for(self, queue, job_id, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = queue.status(job_id)
+            if status["status"] in (DONE, FAILED):
+                return status
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_jobs_run_in_background(self):
+        def run_job(folder, recorder):
+            recorder.set_total(1)
+            recorder.image_done(f"{folder}/a.jpg", 0.1, product={"Product": "Milk"})
+
+        queue = JobQueue(run_job)
+        with patch("builtins.print"):
+            job_id = queue.submit("folder_a")
+            status = self.wait_for(queue, job_id)
+            queue.stop(timeout=1)
+
+        self.assertEqual(status["status"], DONE)
+        self.assertEqual(status["images"][0]["image"], "folder_a/a.jpg")
+
+    def test_requeued_jobs_drained_at_startup(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        store = SQLiteJobStore(os.path.join(tmp_dir, "jobs.sqlite3"))
+        job_id = store.create("folder_a", max_depth=4)
+        store.claim_next()
+
+        # The process died while the job was running; nothing is submitted after the restart
+        with patch("builtins.print"):
+            queue = JobQueue(lambda folder, recorder: None, store=SQLiteJobStore(store.path))
+            status = self.wait_for(queue, job_id)
+            queue.stop(timeout=1)
+        self.assertEqual(status["status"], DONE)
+
+    def test_no_threads_without_jobs(self):
+        queue = JobQueue(lambda folder, recorder: None)
+        self.assertEqual(queue._threads, [])
+
+    def test_failed_job_reports_error(self):
+        def run_job(folder, recorder):
+            raise FileNotFoundError("no such folder")
+
+        queue = JobQueue(run_job)
+        with patch("builtins.print"):
+            job_id = queue.submit("folder_a")
+            status = self.wait_for(queue, job_id)
+            queue.stop(timeout=1)
+
+        self.assertEqual(status["status"], FAILED)
+        self.assertEqual(status["error"], "no such folder")
+
+
+if __name__ == "__main__":
+    unittest.main()
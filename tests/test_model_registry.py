@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+import model_registry
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        model_registry.clear()
+
+    def tearDown(self):
+        model_registry.clear()
+
+    @patch("insert_update_from_image.ProductImageProcessor")
+    def test_model_loaded_once(self, mock_processor_class):
+        first = model_registry.get_processor()
+        second = model_registry.get_processor()
+
+        # Both callers share one instance and the model is only loaded once
+        self.assertIs(first, second)
+        mock_processor_class.assert_called_once_with(
+            model_registry.DEFAULT_MODEL_ID, model_registry.DEFAULT_REVISION
+        )
+
+    @patch("insert_update_from_image.ProductImageProcessor")
+    def test_separate_revisions(self, mock_processor_class):
+        mock_processor_class.side_effect = lambda model_id, revision: object()
+        first = model_registry.get_processor("model", "rev1")
+        second = model_registry.get_processor("model", "rev2")
+        self.assertIsNot(first, second)
+        self.assertEqual(mock_processor_class.call_count, 2)
+
+    @patch("insert_update_from_image.ProductImageProcessor")
+    def test_separate_precisions(self, mock_processor_class):
+        mock_processor_class.side_effect = lambda model_id, revision, **options: object()
+        full = model_registry.get_processor()
+        quantized = model_registry.get_processor(precision="int8")
+        self.assertIsNot(full, quantized)
+        self.assertIs(model_registry.get_processor(precision="int8"), quantized)
+        self.assertTrue(model_registry.is_loaded(precision="int8"))
+
+    @patch("insert_update_from_image.ProductImageProcessor")
+    def test_separate_backends(self, mock_processor_class):
+        mock_processor_class.side_effect = lambda model_id, revision, **options: object()
+        default = model_registry.get_processor()
+        stub = model_registry.get_processor(backend="stub")
+        self.assertIsNot(default, stub)
+        self.assertTrue(model_registry.is_loaded(backend="stub"))
+
+    @patch("insert_update_from_image.ProductImageProcessor")
+    def test_preload(self, mock_processor_class):
+        self.assertFalse(model_registry.is_loaded())
+        model_registry.preload()
+        self.assertTrue(model_registry.is_loaded())
+        model_registry.get_processor()
+        mock_processor_class.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+from pymongo.errors import OperationFailure
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+import mongo_connection
+from mongo_connection import LazyCollection, client_options, ensure_index, get_client
+
+
+class TestClientOptions(unittest.TestCase):
+    def test_defaults(self):
+        options = client_options({})
+        self.assertEqual(options["host"], "mongodb://localhost:27017/")
+        self.assertEqual(options["maxPoolSize"], 100)
+        self.assertIsNone(options["socketTimeoutMS"])
+        self.assertFalse(options["connect"])
+        self.assertNotIn("compressors", options)
+
+    def test_environment(self):
+        options = client_options({
+            "MONGO_URI": "mongodb://db.example:27017/",
+            "MONGO_MAX_POOL_SIZE": "8",
+            "MONGO_SERVER_SELECTION_TIMEOUT_MS": "1000",
+            "MONGO_COMPRESSORS": "zstd,snappy",
+        })
+        self.assertEqual(options["host"], "mongodb://db.example:27017/")
+        self.assertEqual(options["maxPoolSize"], 8)
+        self.assertEqual(options["serverSelectionTimeoutMS"], 1000)
+        self.assertEqual(options["compressors"], "zstd,snappy")
+
+
+class TestSharedClient(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(mongo_connection, "MongoClient")
+        self.mock_client_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        mongo_connection._reset_after_fork()
+        self.addCleanup(mongo_connection._reset_after_fork)
+
+    def test_created_once_on_first_use(self):
+        collection = LazyCollection("products")
+        self.mock_client_class.assert_not_called()
+
+        collection.find_one({"HashID": "a"})
+        collection.count_documents({})
+        self.assertIs(get_client(), self.mock_client_class.return_value)
+        self.mock_client_class.assert_called_once()
+
+        database = self.mock_client_class.return_value.__getitem__.return_value
+        database.__getitem__.assert_called_with("products")
+        database.__getitem__.return_value.find_one.assert_called_once_with({"HashID": "a"})
+
+    def test_new_client_after_fork(self):
+        self.mock_client_class.side_effect = lambda **options: MagicMock()
+        parent_client = get_client()
+        mongo_connection._reset_after_fork()
+        self.assertIsNot(get_client(), parent_client)
+        self.assertEqual(self.mock_client_class.call_count, 2)
+
+    def test_importing_the_app_opens_no_connection(self):
+        import integrate_image_recog_backend_mongodb.app  # noqa: F401
+        self.assertIsInstance(integrate_image_recog_backend_mongodb.app.collection, LazyCollection)
+        self.mock_client_class.assert_not_called()
+
+
+class TestEnsureIndex(unittest.TestCase):
+    def setUp(self):
+        self.collection = MagicMock()
+        self.collection.full_name = "test_db.ensure_index"
+        patcher = patch.object(mongo_connection, "_ensured_indexes", set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_created_once_per_index(self):
+        self.assertTrue(ensure_index(self.collection, "HashID", unique=True))
+        self.assertTrue(ensure_index(self.collection, "HashID", unique=True))
+        ensure_index(self.collection, [("Product", 1), ("HashID", 1)])
+        self.assertEqual(self.collection.create_index.call_count, 2)
+
+    def test_failure_retried(self):
+        self.collection.create_index.side_effect = [OperationFailure("duplicate key"), None]
+        with patch("builtins.print"):
+            self.assertFalse(ensure_index(self.collection, "HashID", unique=True))
+        self.assertTrue(ensure_index(self.collection, "HashID", unique=True))
+        self.assertEqual(self.collection.create_index.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from precision import resolve_precision, FULL_PRECISION, BF16_PRECISION, INT8_PRECISION
+from precision_check import answer_changes, label_accuracy, load_labels, DEFAULT_IMAGE_FOLDER
+from insert_update_from_image import ProductImageProcessor
+
+
+class TestPrecisionModes(unittest.TestCase):
+    def test_unknown_precision_rejected(self):
+        with self.assertRaises(ValueError):
+            resolve_precision("fp8")
+
+    @patch("precision.cpu_supports_bf16", return_value=False)
+    def test_bf16_falls_back_without_cpu_support(self, mock_supports):
+        with patch("builtins.print"):
+            self.assertEqual(resolve_precision(BF16_PRECISION), FULL_PRECISION)
+        self.assertEqual(resolve_precision(INT8_PRECISION), INT8_PRECISION)
+
+    @patch("inference_backend.apply_precision")
+    def test_processor_applies_precision(self, mock_apply):
+        with patch("inference_backend.AutoTokenizer"), \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class:
+            mock_model_class.from_pretrained.return_value = MagicMock()
+            processor = ProductImageProcessor("model", "revision", precision=INT8_PRECISION)
+
+        mock_apply.assert_called_once_with(mock_model_class.from_pretrained.return_value, INT8_PRECISION)
+        self.assertIs(processor.model, mock_apply.return_value)
+        # Quantized answers must not be served from, or written to, the fp32 cache entries
+        self.assertEqual(processor._model_revision(), "revision+int8")
+
+
+class TestPrecisionCheck(unittest.TestCase):
+    def test_answer_changes(self):
+        baseline = {
+            "a.jpg": {"Product": "Milk", "Brand": "Oatly", "Quantity": 2},
+            "b.jpg": {"Product": "Soap", "Brand": "Dove", "Quantity": 1},
+        }
+        candidate = {
+            "a.jpg": {"Product": "milk ", "Brand": "Oatly", "Quantity": 3},
+            "b.jpg": None,
+        }
+        changes = answer_changes(baseline, candidate)
+        self.assertIn(("a.jpg", "Quantity", 2, 3), changes)
+        self.assertEqual(len([change for change in changes if change[0] == "b.jpg"]), 3)
+        self.assertEqual(len(changes), 4)
+
+    def test_label_accuracy(self):
+        labels = load_labels(DEFAULT_IMAGE_FOLDER)
+        self.assertTrue(labels)
+        image_name = next(iter(labels))
+        answers = {os.path.join("images", image_name): {"Product": "Laundry Detergent", "Brand": "Ariel", "Quantity": 1}}
+        self.assertAlmostEqual(label_accuracy(answers, labels), 2 / 3)
+        self.assertIsNone(label_accuracy({"unlabeled.jpg": None}, labels))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import tempfile
+import shutil
+
+import numpy as np
+from PIL import Image
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from product_index import ProductIndex, embedding_vector
+from insert_update_from_image import ProductImageProcessor, QUESTION_EXTRACTION
+
+NAMESPACE = ProductIndex.namespace("model", "revision")
+
+
+def patches(first, second):
+    # Two-patch "embeddings" (1 x patches x features) dominated by different features
+    enc = np.full((1, 2, 4), 0.01, dtype=np.float32)
+    enc[0, :, first] = 1.0
+    enc[0, :, second] = 0.5
+    return enc
+
+
+class TestProductIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index = ProductIndex(self.tmp_dir, threshold=0.95)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_embedding_vector_normalized(self):
+        vector = embedding_vector(patches(0, 1))
+        self.assertEqual(vector.shape, (4,))
+        self.assertAlmostEqual(float(np.linalg.norm(vector)), 1.0, places=5)
+
+    def test_nearest_known_product(self):
+        match, vector = self.index.search(patches(0, 1), NAMESPACE)
+        self.assertIsNone(match)
+        self.index.add(vector, "Milk", "Oatly", NAMESPACE)
+        _, vector = self.index.search(patches(2, 3), NAMESPACE)
+        self.index.add(vector, "Soap", "Dove", NAMESPACE)
+
+        match, _ = self.index.search(patches(0, 1) * 3, NAMESPACE)
+        self.assertEqual((match["Product"], match["Brand"]), ("Milk", "Oatly"))
+        self.assertGreater(match["similarity"], 0.99)
+
+        # Below the threshold nothing is resolved
+        match, _ = self.index.search(patches(1, 2), NAMESPACE)
+        self.assertIsNone(match)
+        self.assertEqual(self.index.stats(), {"hits": 1, "misses": 3})
+
+    def test_persisted_across_instances(self):
+        _, vector = self.index.search(patches(0, 1), NAMESPACE)
+        self.index.add(vector, "Milk", "Oatly", NAMESPACE)
+
+        reopened = ProductIndex(self.tmp_dir)
+        match, _ = reopened.search(patches(0, 1), NAMESPACE)
+        self.assertEqual(match["Brand"], "Oatly")
+        # Other models keep their own index
+        match, _ = reopened.search(patches(0, 1), ProductIndex.namespace("model", "other"))
+        self.assertIsNone(match)
+
+    def test_staged_until_written(self):
+        _, milk = self.index.search(patches(0, 1), NAMESPACE)
+        _, soap = self.index.search(patches(2, 3), NAMESPACE)
+        self.index.stage("shelf.jpg", milk, "Milk", "Oatly", NAMESPACE)
+        self.index.stage("shelf.jpg", soap, "Soap", "Dove", NAMESPACE)
+        self.assertIsNone(self.index.search(patches(0, 1), NAMESPACE)[0])
+
+        # Only the soap write went through
+        self.index.commit("shelf.jpg", {("Soap", "Dove")})
+        self.assertIsNone(self.index.search(patches(0, 1), NAMESPACE)[0])
+        self.assertEqual(self.index.search(patches(2, 3), NAMESPACE)[0]["Product"], "Soap")
+        self.index.commit("shelf.jpg", {("Milk", "Oatly")})
+        self.assertEqual(self.index.size(NAMESPACE), 1)
+
+    def test_interrupted_append_ignored(self):
+        _, vector = self.index.search(patches(0, 1), NAMESPACE)
+        self.index.add(vector, "Milk", "Oatly", NAMESPACE)
+        _, labels_path = self.index._paths(NAMESPACE)
+        with open(labels_path, "a") as file:
+            file.write('{"Product": "Soap", "Brand": "Dove"}\n')
+
+        reopened = ProductIndex(self.tmp_dir)
+        reopened.search(patches(0, 1), NAMESPACE)
+        self.assertEqual(reopened.size(NAMESPACE), 1)
+
+
+class TestProcessorProductIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp_dir, "images")
+        os.makedirs(self.folder)
+        # Two photos of the same product and one of another
+        for name, color in (("a_milk.png", (250, 250, 250)), ("b_milk.png", (250, 250, 250)), ("c_soap.png", (0, 0, 250))):
+            Image.new("RGB", (16, 16), color).save(os.path.join(self.folder, name))
+
+        def encode_image(image):
+            return patches(0, 1) if image.getpixel((0, 0))[0] > 128 else patches(2, 3)
+
+        def answer_question(enc_image, question, tokenizer, **options):
+            if "Number" in question:
+                return "3"
+            is_milk = enc_image[0, 0, 0] > 0.5
+            if "Type" in question:
+                return "Milk" if is_milk else "Soap"
+            return "Oatly" if is_milk else "Dove"
+
+        with patch("inference_backend.AutoTokenizer"), \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class:
+            self.model = MagicMock()
+            self.model.encode_image.side_effect = encode_image
+            self.model.answer_question.side_effect = answer_question
+            mock_model_class.from_pretrained.return_value = self.model
+            self.processor = ProductImageProcessor(
+                "model", "revision", self.folder, extraction_mode=QUESTION_EXTRACTION,
+                product_index=ProductIndex(os.path.join(self.tmp_dir, "index")),
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def process(self, written=True):
+        # Each result is committed to the index as if its database write had finished
+        responses = {}
+        with patch("builtins.print"):
+            for image_path, response in self.processor.iter_process_images():
+                responses[image_path] = response
+                pairs = {(response["Product"], response["Brand"])} if written else set()
+                self.processor.product_index.commit(image_path, pairs)
+        return responses
+
+    def test_known_product_only_asks_quantity(self):
+        responses = self.process()
+
+        self.assertEqual(responses[os.path.join(self.folder, "b_milk.png")], {"Product": "Milk", "Brand": "Oatly", "Quantity": 3})
+        self.assertEqual(responses[os.path.join(self.folder, "c_soap.png")]["Brand"], "Dove")
+        # Three questions for each new product, one for the repeat
+        self.assertEqual(self.model.answer_question.call_count, 7)
+
+    def test_unwritten_products_not_indexed(self):
+        self.process(written=False)
+        # Nothing reached the database, so the repeat went through the full extraction too
+        self.assertEqual(self.model.answer_question.call_count, 9)
+        self.assertEqual(self.processor.product_index.size(NAMESPACE), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
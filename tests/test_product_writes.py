@@ -0,0 +1,153 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+from datetime import datetime
+from time import monotonic, sleep
+
+from pymongo.errors import BulkWriteError
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from product_writes import generate_hash_id, iter_chunks, write_products
+
+
+class TestWriteProducts(unittest.TestCase):
+    def setUp(self):
+        self.collection = MagicMock()
+        self.collection.find.return_value = []
+        patcher = patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_results_merged_by_hash_id(self):
+        self.collection.bulk_write.return_value.upserted_ids = {1: "soap_id"}
+        items = [
+            {"Product": "Milk", "Brand": "Farm", "Quantity": 2, "ImageHash": "a", "ImagePath": "1.jpg"},
+            {"Product": "Soap", "Brand": "Dove", "Quantity": 1, "ImageHash": "b", "ImagePath": "2.jpg"},
+            {"Product": "Milk", "Brand": "Farm", "Quantity": 3, "ImageHash": "c", "ImagePath": "3.jpg"},
+        ]
+        outcomes = write_products(self.collection, items, "2024-01-01", "2026-01-01")
+
+        # One unordered bulk write with one upsert per product
+        self.collection.bulk_write.assert_called_once()
+        operations = self.collection.bulk_write.call_args.args[0]
+        self.assertFalse(self.collection.bulk_write.call_args.kwargs["ordered"])
+        self.assertEqual(len(operations), 2)
+        milk = operations[0]
+        self.assertTrue(milk._upsert)
+        self.assertEqual(milk._filter, {"HashID": generate_hash_id("Milk", "Farm"), "Batches.ImageHash": {"$nin": ["a", "c"]}})
+        self.assertEqual(milk._doc["$inc"], {"Quantity": 5})
+        self.assertEqual([batch["ImageHash"] for batch in milk._doc["$push"]["Batches"]["$each"]], ["a", "c"])
+        # Date strings are stored as datetimes
+        self.assertEqual(milk._doc["$push"]["Batches"]["$each"][0]["ExpirationTime"], datetime(2026, 1, 1))
+        self.assertEqual(milk._doc["$setOnInsert"], {"Product": "Milk", "Brand": "Farm"})
+
+        self.assertEqual([outcome["Status"] for outcome in outcomes], ["updated", "inserted", "updated"])
+        self.assertEqual(outcomes[1]["ImagePath"], "2.jpg")
+
+    def test_recorded_images_skipped(self):
+        milk_id = generate_hash_id("Milk", "Farm")
+        # Image "a" was written by an earlier run
+        self.collection.find.return_value = [{"HashID": milk_id, "Batches": [{"ImageHash": "a"}]}]
+        # The lone soap image was recorded too: its filter misses and the upsert hits the unique
+        # index, on the first try and on the retry
+        self.collection.bulk_write.side_effect = [
+            BulkWriteError({"writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}], "upserted": []}),
+            BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate key"}], "upserted": []}),
+        ]
+        items = [
+            {"Product": "Milk", "Brand": "Farm", "Quantity": 2, "ImageHash": "a"},
+            {"Product": "Milk", "Brand": "Farm", "Quantity": 3, "ImageHash": "b"},
+            {"Product": "Soap", "Brand": "Dove", "Quantity": 1, "ImageHash": "c"},
+        ]
+        outcomes = write_products(self.collection, items)
+
+        operations = self.collection.bulk_write.call_args_list[0].args[0]
+        self.assertEqual(operations[0]._doc["$inc"], {"Quantity": 3})
+        self.assertEqual([outcome["Status"] for outcome in outcomes], ["skipped", "updated", "skipped"])
+        # Only the colliding soap upsert is retried
+        self.assertEqual(self.collection.bulk_write.call_args.args[0], [operations[1]])
+
+    def test_lost_insert_race_retried(self):
+        # Another writer inserted the new product first: the retry finds it and pushes the batch
+        self.collection.bulk_write.side_effect = [
+            BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate key"}], "upserted": []}),
+            MagicMock(upserted_ids={}),
+        ]
+        outcomes = write_products(self.collection, [{"Product": "Milk", "Brand": "Farm", "Quantity": 2, "ImageHash": "a"}])
+        self.assertEqual(self.collection.bulk_write.call_count, 2)
+        self.assertEqual(outcomes[0]["Status"], "updated")
+
+    def test_other_errors_reported(self):
+        self.collection.bulk_write.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 0, "code": 121, "errmsg": "validation failed"}], "upserted": [],
+        })
+        outcomes = write_products(self.collection, [{"Product": "Milk", "Brand": "Farm", "Quantity": 2}])
+        self.collection.bulk_write.assert_called_once()
+        self.assertEqual((outcomes[0]["Status"], outcomes[0]["Error"]), ("error", "validation failed"))
+
+    def test_nothing_to_write(self):
+        self.assertEqual(write_products(self.collection, []), [])
+        self.collection.bulk_write.assert_not_called()
+
+
+class TestWriteResults(unittest.TestCase):
+    def test_failed_writes_not_recorded(self):
+        import insert_update_from_image
+
+        def outcomes(collection, items):
+            return [{**item, "Status": "error" if item["Product"] == "Soap" else "inserted"} for item in items]
+
+        ledger = MagicMock()
+        product_index = MagicMock()
+        ledger.content_hash.side_effect = lambda image_path: image_path
+        results = [
+            ("milk.jpg", {"Product": "Milk", "Brand": "Farm", "Quantity": 1}),
+            ("soap.jpg", {"Product": "Soap", "Brand": "Dove", "Quantity": 1}),
+            ("blank.jpg", None),
+        ]
+        with patch.object(insert_update_from_image, "write_products", side_effect=outcomes):
+            insert_update_from_image.write_results(results, ledger=ledger, target=MagicMock(), product_index=product_index)
+
+        # The soap image is written again on the next run; unrecognized images are still recorded
+        ledger.record_many.assert_called_once_with([results[0], results[2]])
+        # Only the written product may be resolved from the index later
+        product_index.commit.assert_any_call("milk.jpg", {("Milk", "Farm")})
+        product_index.commit.assert_any_call("soap.jpg", set())
+
+
+class TestIterChunks(unittest.TestCase):
+    def test_chunk_size(self):
+        self.assertEqual(list(iter_chunks(range(5), size=2)), [[0, 1], [2, 3], [4]])
+
+    def test_slow_stream_flushed(self):
+        self.assertEqual(list(iter_chunks(range(3), size=10, max_wait=0)), [[0], [1], [2]])
+
+    def test_idle_stream_flushed(self):
+        def results():
+            yield 0
+            sleep(1.0)
+            yield 1
+
+        start = monotonic()
+        chunks = iter_chunks(results(), size=10, max_wait=0.1)
+        # The first result is passed on while the stream is still busy with the second
+        self.assertEqual(next(chunks), [0])
+        self.assertLess(monotonic() - start, 0.8)
+        self.assertEqual(list(chunks), [[1]])
+
+    def test_stream_error_raised_after_items(self):
+        def results():
+            yield 0
+            raise RuntimeError("model failed")
+
+        chunks = iter_chunks(results(), size=10)
+        self.assertEqual(next(chunks), [0])
+        with self.assertRaises(RuntimeError):
+            next(chunks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import tempfile
+import shutil
+
+from PIL import Image, ImageDraw
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from result_cache import ResultCache, perceptual_hash, hamming_distance
+from insert_update_from_image import ProductImageProcessor
+
+NAMESPACE = ResultCache.namespace("model", "revision", "structured")
+RESPONSE = {"Product": "Milk", "Brand": "Oatly", "Quantity": 2}
+
+
+def make_image(path, shade=0, size=(64, 64)):
+    image = Image.new("RGB", size, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([8, 8, 40, 56], fill=(shade, shade, shade))
+    image.save(path)
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, "cache")
+        self.image_path = os.path.join(self.tmp_dir, "shelf.png")
+        make_image(self.image_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_exact_hit(self):
+        cache = ResultCache(self.cache_dir)
+        response, key = cache.get(self.image_path, NAMESPACE)
+        self.assertIsNone(response)
+        cache.put(key, RESPONSE, self.image_path, NAMESPACE)
+
+        # A fresh cache instance reads the entry back from disk
+        cache = ResultCache(self.cache_dir)
+        response, _ = cache.get(self.image_path, NAMESPACE)
+        self.assertEqual(response, RESPONSE)
+        self.assertEqual(cache.stats(), {"hits": 1, "near_hits": 0, "misses": 0})
+
+    def test_other_model_revision_misses(self):
+        cache = ResultCache(self.cache_dir)
+        _, key = cache.get(self.image_path, NAMESPACE)
+        cache.put(key, RESPONSE, self.image_path, NAMESPACE)
+
+        other = ResultCache.namespace("model", "other-revision", "structured")
+        response, _ = cache.get(self.image_path, other)
+        self.assertIsNone(response)
+
+    def test_near_duplicate_hit(self):
+        cache = ResultCache(self.cache_dir, phash_distance=6)
+        _, key = cache.get(self.image_path, NAMESPACE)
+        cache.put(key, RESPONSE, self.image_path, NAMESPACE)
+
+        # Same scene with slightly different shading and size: different bytes, same perceptual hash
+        reshot_path = os.path.join(self.tmp_dir, "reshot.png")
+        make_image(reshot_path, shade=10, size=(66, 64))
+        self.assertLessEqual(hamming_distance(perceptual_hash(self.image_path), perceptual_hash(reshot_path)), 6)
+
+        response, _ = cache.get(reshot_path, NAMESPACE)
+        self.assertEqual(response, RESPONSE)
+        self.assertEqual(cache.stats()["near_hits"], 1)
+
+    def test_size_based_eviction(self):
+        cache = ResultCache(self.cache_dir, max_bytes=250)
+        keys = []
+        for i in range(5):
+            image_path = os.path.join(self.tmp_dir, f"image_{i}.png")
+            make_image(image_path, shade=i * 40)
+            _, key = cache.get(image_path, NAMESPACE)
+            cache.put(key, RESPONSE, image_path, NAMESPACE)
+            keys.append(key)
+
+        total = sum(entry.stat().st_size for entry in os.scandir(self.cache_dir))
+        self.assertLessEqual(total, 250)
+        # The most recent entry is always kept
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, f"{keys[-1]}.json")))
+
+
+class TestProcessorResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp_dir, "images")
+        os.makedirs(self.folder)
+        make_image(os.path.join(self.folder, "shelf.png"))
+
+        with patch("inference_backend.AutoTokenizer"), \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class:
+            self.model = MagicMock()
+            self.model.answer_question.return_value = '{"Product": "Milk", "Brand": "Oatly", "Quantity": 2}'
+            mock_model_class.from_pretrained.return_value = self.model
+            self.processor = ProductImageProcessor(
+                "model", "revision", self.folder,
+                result_cache=ResultCache(os.path.join(self.tmp_dir, "cache")),
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hit_skips_model(self):
+        with patch("builtins.print"):
+            first = self.processor.process_images()
+            self.model.reset_mock()
+            second = self.processor.process_images(batch_size=4)
+
+        self.assertEqual(first, [RESPONSE])
+        self.assertEqual(second, [RESPONSE])
+        self.model.encode_image.assert_not_called()
+        self.model.answer_question.assert_not_called()
+        self.assertEqual(self.processor.result_cache.stats()["hits"], 1)
+
+    def test_run_summary(self):
+        with patch("builtins.print") as mocked_print:
+            self.processor.process_images()
+        printed = [call.args[0] for call in mocked_print.mock_calls if call.args]
+        self.assertIn("Result cache: 0 hits (0 near-duplicate), 1 misses", printed)
+
+
+if __name__ == "__main__":
+    unittest.main()
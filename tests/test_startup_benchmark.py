@@ -0,0 +1,36 @@
+import unittest
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from startup_benchmark import check_report, measure_startup
+
+
+class TestStartup(unittest.TestCase):
+    def test_app_starts_without_ml_stack(self):
+        # Fresh interpreter, no request: nothing here needs MongoDB or the model
+        report = measure_startup(request_path=None, repeats=1)
+        self.assertEqual(report["ml_modules"], [])
+        self.assertGreater(report["max_rss_mb"], 0)
+        self.assertNotIn("first_response_seconds", report)
+
+    def test_check_report(self):
+        report = {
+            "request_path": "/inventory",
+            "runs": [{"status": 200}, {"status": 500}],
+            "import_seconds": 2.5,
+            "max_rss_mb": 100,
+            "ml_modules": ["torch"],
+        }
+        problems = check_report(report, max_import_seconds=1.0, max_rss_mb=250)
+        self.assertEqual(len(problems), 3)
+        self.assertIn("torch", problems[0])
+
+        report.update(runs=[{"status": 200}], import_seconds=0.3, ml_modules=[])
+        self.assertEqual(check_report(report), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
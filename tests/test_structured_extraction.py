@@ -0,0 +1,136 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from answer_parsing import parse_structured_answer, parse_quantity
+from insert_update_from_image import ProductImageProcessor, QUESTION_EXTRACTION, STRUCTURED_PROMPT, GENERATION_BUDGETS
+
+
+class TestParseStructuredAnswer(unittest.TestCase):
+    def test_json(self):
+        answer = '{"Product": "Laundry detergent", "Brand": "Ariel", "Quantity": 2}'
+        self.assertEqual(
+            parse_structured_answer(answer),
+            {"Product": "Laundry detergent", "Brand": "Ariel", "Quantity": 2},
+        )
+
+    def test_json_wrapped_in_text(self):
+        answer = 'Sure! {"product type": "Milk", "brand name": "Oatly", "quantity": "3"} Hope this helps.'
+        self.assertEqual(
+            parse_structured_answer(answer),
+            {"Product": "Milk", "Brand": "Oatly", "Quantity": 3},
+        )
+
+    def test_key_values(self):
+        answer = "Product: Tea\nBrand: Me&mer\nQuantity: 4."
+        self.assertEqual(
+            parse_structured_answer(answer),
+            {"Product": "Tea", "Brand": "Me&mer", "Quantity": 4},
+        )
+
+    def test_delimited(self):
+        self.assertEqual(
+            parse_structured_answer("Nut | Castania | 1"),
+            {"Product": "Nut", "Brand": "Castania", "Quantity": 1},
+        )
+
+    def test_unparseable(self):
+        self.assertIsNone(parse_structured_answer("A bottle of detergent on a shelf."))
+        self.assertIsNone(parse_structured_answer('{"Product": "Milk", "Brand": "Oatly"}'))
+        self.assertIsNone(parse_structured_answer('{"Product": "Milk", "Brand": "Oatly", "Quantity": "many"}'))
+        self.assertIsNone(parse_structured_answer(""))
+
+
+class TestParseQuantity(unittest.TestCase):
+    def test_numbers_and_units(self):
+        self.assertEqual(parse_quantity("3"), 3)
+        self.assertEqual(parse_quantity("3 bottles"), 3)
+        self.assertEqual(parse_quantity("Number of Ariel in the picture is 2."), 2)
+        self.assertEqual(parse_quantity(4), 4)
+
+    def test_number_words(self):
+        self.assertEqual(parse_quantity("three"), 3)
+        self.assertEqual(parse_quantity("Twenty-one cans"), 21)
+        self.assertEqual(parse_quantity("two dozen eggs"), 24)
+        self.assertEqual(parse_quantity("a bottle"), 1)
+        self.assertEqual(parse_quantity("a total of 4"), 4)
+
+    def test_ranges_use_lower_bound(self):
+        self.assertEqual(parse_quantity("2-3"), 2)
+        self.assertEqual(parse_quantity("between 2 and 3 bottles"), 2)
+        self.assertEqual(parse_quantity("four or five"), 4)
+
+    def test_unparseable(self):
+        self.assertIsNone(parse_quantity("many"))
+        self.assertIsNone(parse_quantity("1.5 liters"))
+        self.assertIsNone(parse_quantity(None))
+        self.assertIsNone(parse_quantity(True))
+
+
+class TestStructuredExtraction(unittest.TestCase):
+    def make_processor(self, **kwargs):
+        with patch("inference_backend.AutoTokenizer"), \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class:
+            self.model = MagicMock()
+            mock_model_class.from_pretrained.return_value = self.model
+            return ProductImageProcessor("model", "revision", **kwargs)
+
+    def test_single_generation(self):
+        processor = self.make_processor()
+        self.model.answer_question.return_value = '{"Product": "Milk", "Brand": "Oatly", "Quantity": 2}'
+
+        with patch("builtins.print"):
+            response = processor._describe_image("enc", "image.jpg")
+
+        self.assertEqual(response, {"Product": "Milk", "Brand": "Oatly", "Quantity": 2})
+        self.model.answer_question.assert_called_once()
+        self.assertEqual(self.model.answer_question.call_args.args[1], STRUCTURED_PROMPT)
+
+    def test_fallback_to_questions(self):
+        processor = self.make_processor()
+        self.model.answer_question.side_effect = ["I am not sure.", "Milk", "Oatly", "2"]
+
+        with patch("builtins.print"):
+            response = processor._describe_image("enc", "image.jpg")
+
+        self.assertEqual(response, {"Product": "Milk", "Brand": "Oatly", "Quantity": 2})
+        self.assertEqual(self.model.answer_question.call_count, 4)
+
+    def test_question_mode(self):
+        processor = self.make_processor(extraction_mode=QUESTION_EXTRACTION)
+        self.model.answer_question.side_effect = ["Milk", "Oatly", "2"]
+
+        with patch("builtins.print"):
+            response = processor._describe_image("enc", "image.jpg")
+
+        self.assertEqual(response, {"Product": "Milk", "Brand": "Oatly", "Quantity": 2})
+        self.assertEqual(self.model.answer_question.call_count, 3)
+
+    def test_quantity_words_and_parse_failures(self):
+        processor = self.make_processor(extraction_mode=QUESTION_EXTRACTION)
+        self.model.answer_question.side_effect = ["Milk", "Oatly", "three cartons", "Soap", "Dove", "lots"]
+
+        with patch("builtins.print"):
+            self.assertEqual(processor._describe_image("enc", "a.jpg")["Quantity"], 3)
+            self.assertIsNone(processor._describe_image("enc", "b.jpg"))
+
+        self.assertEqual(processor.parse_stats(), {"quantity_answers": 2, "quantity_parse_failures": 1})
+
+    def test_generation_budgets(self):
+        processor = self.make_processor(extraction_mode=QUESTION_EXTRACTION)
+        self.model.answer_question.side_effect = ["Milk", "Oatly", "2"]
+
+        with patch("builtins.print"):
+            processor._describe_image("enc", "image.jpg")
+
+        quantity_call = self.model.answer_question.call_args_list[2]
+        self.assertEqual(quantity_call.kwargs["max_new_tokens"], GENERATION_BUDGETS["answer_quantity"][0])
+        self.assertIn(processor.tokenizer.eos_token_id, quantity_call.kwargs["eos_token_id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
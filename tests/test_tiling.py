@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import tempfile
+import shutil
+
+from PIL import Image
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+from tiling import make_tiles, merge_tile_answers
+from insert_update_from_image import ProductImageProcessor, QUESTION_EXTRACTION
+
+
+class TestMakeTiles(unittest.TestCase):
+    def test_tiles_cover_image_with_overlap(self):
+        image = Image.new("RGB", (2000, 1000))
+        tiles = make_tiles(image, tile_size=768, overlap=0.25)
+
+        boxes = [box for box, _ in tiles]
+        self.assertEqual(len(boxes), 4 * 2)
+        self.assertEqual(max(box[2] for box in boxes), 2000)
+        self.assertEqual(max(box[3] for box in boxes), 1000)
+        for box, tile in tiles:
+            self.assertEqual(tile.size, (768, 768))
+        # Neighbouring tiles share a strip
+        self.assertLess(boxes[1][0], boxes[0][2])
+
+    def test_small_image_single_tile(self):
+        tiles = make_tiles(Image.new("RGB", (500, 300)), tile_size=768)
+        self.assertEqual([box for box, _ in tiles], [(0, 0, 500, 300)])
+
+
+class TestMergeTileAnswers(unittest.TestCase):
+    def test_overlapping_tiles_deduplicated(self):
+        milk = {"Product": "Milk", "Brand": "Oatly", "Quantity": 4}
+        tile_answers = [
+            ((0, 0, 100, 100), milk),
+            # A quarter of the tile is seen again by the overlapping neighbour: one carton
+            ((75, 0, 175, 100), {"Product": "milk", "Brand": "OATLY ", "Quantity": 4}),
+            # Far end of the shelf: more of the same product
+            ((300, 0, 400, 100), {"Product": "Milk", "Brand": "Oatly", "Quantity": 4}),
+            ((150, 0, 250, 100), {"Product": "Soap", "Brand": "Dove", "Quantity": 1}),
+            ((225, 0, 325, 100), None),
+        ]
+        records = merge_tile_answers(tile_answers)
+        self.assertEqual(records, [
+            {"Product": "Milk", "Brand": "Oatly", "Quantity": 11},
+            {"Product": "Soap", "Brand": "Dove", "Quantity": 1},
+        ])
+
+    def test_wide_shelf_adds_up(self):
+        # 3x1 grid as make_tiles cuts it: the product is in the two outer tiles only
+        tiles = [box for box, _ in make_tiles(Image.new("RGB", (1920, 768)), tile_size=768)]
+        self.assertEqual(len(tiles), 3)
+        milk = {"Product": "Milk", "Brand": "Oatly", "Quantity": 5}
+        soap = {"Product": "Soap", "Brand": "Dove", "Quantity": 2}
+        records = merge_tile_answers([(tiles[0], milk), (tiles[1], soap), (tiles[2], dict(milk, Quantity=3))])
+        self.assertEqual(records[0], {"Product": "Milk", "Brand": "Oatly", "Quantity": 8})
+
+        # Every tile of a row of 8 sees 5 cartons: only the 7 shared quarters (1.25 each) are removed
+        boxes = [(left, 0, left + 100, 100) for left in range(0, 600, 75)]
+        records = merge_tile_answers([(box, milk) for box in boxes])
+        self.assertEqual(records[0]["Quantity"], 31)
+
+
+class TestShelfProcessing(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        # Left half white (milk), right half blue (soap)
+        shelf = Image.new("RGB", (1600, 700), (250, 250, 250))
+        shelf.paste((0, 0, 250), (800, 0, 1600, 700))
+        shelf.save(os.path.join(self.folder, "shelf.png"))
+
+        def encode_image(images):
+            # One "embedding" per tile: the colour at its centre
+            return [image.getpixel((image.size[0] // 2, image.size[1] // 2)) for image in images]
+
+        def answer_question(enc_image, question, tokenizer, **options):
+            # Batched encodings are sliced per tile, like a tensor's batch dimension
+            red, green, blue = enc_image[0]
+            is_milk = red > 128
+            if "Number" in question:
+                return "2"
+            if "Type" in question:
+                return "Milk" if is_milk else "Soap"
+            return "Oatly" if is_milk else "Dove"
+
+        with patch("inference_backend.AutoTokenizer"), \
+                patch("inference_backend.AutoModelForCausalLM") as mock_model_class:
+            self.model = MagicMock()
+            self.model.encode_image.side_effect = encode_image
+            self.model.answer_question.side_effect = answer_question
+            mock_model_class.from_pretrained.return_value = self.model
+            self.processor = ProductImageProcessor("model", "revision", self.folder, extraction_mode=QUESTION_EXTRACTION)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_several_products_per_image(self):
+        with patch("builtins.print"):
+            results = list(self.processor.iter_process_shelf_images(tile_size=768, overlap=0.25))
+
+        self.assertEqual(len(results), 1)
+        image_path, records = results[0]
+        self.assertEqual(sorted(record["Product"] for record in records), ["Milk", "Soap"])
+        # All tiles go through the vision encoder in one batch
+        self.assertEqual(self.model.encode_image.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
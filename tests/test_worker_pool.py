@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+from concurrent.futures import Future
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../integrate_image_recog_backend_mongodb')))
+
+import worker_pool
+from worker_pool import auto_tune, MODEL_MEMORY_BYTES
+
+GiB = 1024 ** 3
+
+
+class TestAutoTune(unittest.TestCase):
+    def test_large_host(self):
+        # 32 cores with plenty of memory: 8 workers x 4 threads uses every core
+        self.assertEqual(auto_tune(cores=32, memory_bytes=128 * GiB), (8, 4))
+
+    def test_memory_bound(self):
+        # Room for only three model copies next to the parent: the freed cores go to threads
+        workers, threads = auto_tune(cores=32, memory_bytes=4 * MODEL_MEMORY_BYTES)
+        self.assertEqual(workers, 3)
+        self.assertEqual(threads, 10)
+
+    def test_few_images(self):
+        self.assertEqual(auto_tune(num_images=2, cores=32, memory_bytes=128 * GiB), (2, 16))
+
+    def test_small_host(self):
+        self.assertEqual(auto_tune(cores=2, memory_bytes=8 * GiB), (1, 2))
+
+
+class TestWorker(unittest.TestCase):
+    @patch("worker_pool.get_processor")
+    def test_worker_processes_with_own_processor(self, mock_get_processor):
+        mock_get_processor.return_value._process_image.return_value = {"Product": "Milk"}
+
+        worker_pool._init_worker("model", "revision", 2, False, False)
+        with patch("builtins.print"):
+            result = worker_pool._process_in_worker("shelf.jpg")
+
+        mock_get_processor.assert_called_once_with("model", "revision", precision="fp32")
+        self.assertEqual(result, ("shelf.jpg", {"Product": "Milk"}))
+
+
+class TestPoolSize(unittest.TestCase):
+    def run_pool(self, workers, threads_per_worker=None):
+        def submit(function, image_path):
+            future = Future()
+            future.set_result((image_path, None))
+            return future
+
+        with patch("worker_pool.ProcessPoolExecutor") as mock_executor_class, \
+                patch("worker_pool.available_cores", return_value=8), \
+                patch("worker_pool.total_memory_bytes", return_value=128 * GiB), \
+                patch("builtins.print"):
+            mock_executor_class.return_value.__enter__.return_value.submit.side_effect = submit
+            list(worker_pool.iter_process_images_parallel(["a.jpg", "b.jpg"] * 8, workers, threads_per_worker))
+        options = mock_executor_class.call_args.kwargs
+        return options["max_workers"], options["initargs"][2]
+
+    def test_given_workers_share_the_cores(self):
+        # --workers 8 on 8 cores: one thread each instead of auto_tune's 4
+        self.assertEqual(self.run_pool(8), (8, 1))
+        self.assertEqual(self.run_pool(3), (3, 2))
+        self.assertEqual(self.run_pool(8, 2), (8, 2))
+
+    def test_auto_tuned(self):
+        self.assertEqual(self.run_pool(None), (2, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()